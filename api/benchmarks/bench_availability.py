@@ -0,0 +1,181 @@
+"""
+Benchmark of the availability computation over 10k therapists x 1 year of bookings.
+
+Bookings are synthetic and deterministic per (therapist, day): working hours
+are Monday to Friday 09:00-17:00 UTC and each hour is booked with
+--occupancy probability. Without --database-url only the in-memory gap
+algorithm is timed, generating just the days each query needs. With
+--database-url the database is seeded with the full data set and the HTTP
+endpoints are timed in-process through httpx's ASGI transport.
+
+Usage:
+    cd api
+    python benchmarks/bench_availability.py
+    python benchmarks/bench_availability.py --therapists 1000 --days 90 \
+        --database-url sqlite:////tmp/availability.db
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, time as clock, timedelta
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+EPOCH = datetime(2030, 1, 7)
+WEEKLY_HOURS = [(weekday, clock(9), clock(17)) for weekday in range(5)]
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def day_bookings(therapist_id: int, day: int, occupancy: float):
+    date = EPOCH + timedelta(days=day)
+    if date.weekday() >= 5:
+        return []
+    rng = random.Random(therapist_id * 100003 + day)
+    return [
+        (date.replace(hour=hour), date.replace(hour=hour, minute=50))
+        for hour in range(9, 17)
+        if rng.random() < occupancy
+    ]
+
+def busy_between(therapist_id: int, first_day: int, last_day: int, occupancy: float):
+    return [
+        interval
+        for day in range(first_day, last_day)
+        for interval in day_bookings(therapist_id, day, occupancy)
+    ]
+
+def bench_algorithm(args):
+    from src.core.availability import (
+        first_free_slots,
+        free_intervals,
+        therapist_schedules,
+        working_intervals,
+    )
+
+    start, end = EPOCH, EPOCH + timedelta(days=args.days)
+    samples = []
+    for therapist_id in random.sample(range(1, args.therapists + 1), min(args.samples, args.therapists)):
+        busy = busy_between(therapist_id, 0, args.days, args.occupancy)
+        started = time.perf_counter()
+        list(free_intervals(working_intervals(WEEKLY_HOURS, start, end), busy, timedelta(minutes=1)))
+        samples.append(time.perf_counter() - started)
+    print(
+        f"availability of one therapist over {args.days} days: "
+        f"p50 {percentile(samples, 0.5) * 1000:.2f} ms, p99 {percentile(samples, 0.99) * 1000:.2f} ms"
+    )
+
+    # A one-week search late in the year, over every therapist
+    first_day = max(args.days - 7, 0)
+    window_start, window_end = EPOCH + timedelta(days=first_day), EPOCH + timedelta(days=first_day + 7)
+    hours = {therapist_id: WEEKLY_HOURS for therapist_id in range(1, args.therapists + 1)}
+    busy = {
+        therapist_id: busy_between(therapist_id, first_day, first_day + 7, args.occupancy)
+        for therapist_id in hours
+    }
+    samples = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        schedules = therapist_schedules(hours, busy, window_start, window_end)
+        first_free_slots(schedules, timedelta(minutes=60), 10)
+        samples.append(time.perf_counter() - started)
+    print(
+        f"first 10 one-hour slots across {args.therapists} therapists in a week: "
+        f"p50 {percentile(samples, 0.5) * 1000:.1f} ms, p99 {percentile(samples, 0.99) * 1000:.1f} ms"
+    )
+
+def seed(args) -> None:
+    from sqlalchemy import insert
+    from src.infrastructure.database import Base, get_engine
+    from src.infrastructure.models import BookingModel, TherapistModel, WorkingHoursModel
+
+    engine = get_engine()
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    rows = 0
+    with engine.begin() as connection:
+        connection.execute(insert(TherapistModel), [
+            {"id": t, "name": f"Therapist {t}", "email": f"t{t}@example.com", "phone": "+15555550100"}
+            for t in range(1, args.therapists + 1)
+        ])
+        connection.execute(insert(WorkingHoursModel), [
+            {"therapist_id": t, "weekday": weekday, "start_time": opens, "end_time": closes}
+            for t in range(1, args.therapists + 1)
+            for weekday, opens, closes in WEEKLY_HOURS
+        ])
+    for t in range(1, args.therapists + 1):
+        bookings = [
+            {
+                "therapist_id": t,
+                "client_name": "Client",
+                "client_email": "client@example.com",
+                "start_time": start_time,
+                "end_time": end_time,
+                "status": "confirmed",
+            }
+            for start_time, end_time in busy_between(t, 0, args.days, args.occupancy)
+        ]
+        if bookings:
+            with engine.begin() as connection:
+                connection.execute(insert(BookingModel), bookings)
+            rows += len(bookings)
+    print(f"seeded {rows} bookings in {time.perf_counter() - started:.1f} s")
+
+async def bench_endpoints(args):
+    import httpx
+    from src.main import app
+
+    async def timed(client, path, params):
+        started = time.perf_counter()
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    year = {"start": EPOCH.isoformat(), "end": (EPOCH + timedelta(days=args.days)).isoformat()}
+    week_start = EPOCH + timedelta(days=max(args.days - 7, 0))
+    week = {"start": week_start.isoformat(), "end": (week_start + timedelta(days=7)).isoformat()}
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        samples = [
+            await timed(client, f"/therapists/{random.randint(1, args.therapists)}/availability", year)
+            for _ in range(args.samples)
+        ]
+        print(
+            f"GET /therapists/{{id}}/availability over {args.days} days: "
+            f"p50 {percentile(samples, 0.5) * 1000:.2f} ms, p99 {percentile(samples, 0.99) * 1000:.2f} ms"
+        )
+        samples = [
+            await timed(client, "/availability/search", {**week, "duration": 60, "limit": 10})
+            for _ in range(args.repeat)
+        ]
+        print(
+            f"GET /availability/search across {args.therapists} therapists in a week: "
+            f"p50 {percentile(samples, 0.5) * 1000:.1f} ms, p99 {percentile(samples, 0.99) * 1000:.1f} ms"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--therapists", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--occupancy", type=float, default=0.6)
+    parser.add_argument("--samples", type=int, default=200, help="single-therapist queries")
+    parser.add_argument("--repeat", type=int, default=5, help="search queries")
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+    random.seed(0)
+
+    if args.database_url is None:
+        bench_algorithm(args)
+        return
+    # Read when src.infrastructure.database is imported
+    os.environ["DATABASE_URL"] = args.database_url
+    seed(args)
+    asyncio.run(bench_endpoints(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Cold-start profile of the API's Lambda entry point.
+
+Each run starts a fresh interpreter, like a new Lambda container, with
+AWS_LAMBDA_FUNCTION_NAME set and a seeded SQLite database, and times the
+init phase (importing src.main), the first invocation of lambda_handler and
+a warm one. The import-time breakdown (python -X importtime) attributes
+the import of src.main to the packages it pulls in.
+
+Usage:
+    cd api
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --runs 20 --top 25
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EVENT = {
+    "httpMethod": "GET",
+    "path": "/therapists/1",
+    "headers": {"Host": "bench.example.com"},
+    "multiValueQueryStringParameters": None,
+    "body": None,
+    "isBase64Encoded": False,
+}
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def child() -> None:
+    """One cold container: init, first and warm invocation, as JSON."""
+    sys.path.insert(0, API_DIR)
+    started = time.perf_counter()
+    from src.main import lambda_handler
+    init = time.perf_counter() - started
+
+    started = time.perf_counter()
+    response = lambda_handler(EVENT, None)
+    first = time.perf_counter() - started
+    if response["statusCode"] != 200:
+        raise SystemExit(f"Unexpected response: {response}")
+
+    started = time.perf_counter()
+    lambda_handler(EVENT, None)
+    warm = time.perf_counter() - started
+    print(json.dumps({"init": init, "first": first, "warm": warm}))
+
+def seed(env) -> None:
+    script = (
+        "from src.infrastructure.database import Base, SessionLocal, get_engine\n"
+        "from src.infrastructure.models import TherapistModel\n"
+        "Base.metadata.create_all(bind=get_engine())\n"
+        "db = SessionLocal()\n"
+        "db.add(TherapistModel(id=1, name='Therapist', email='t@example.com', phone='+15555550100'))\n"
+        "db.commit()\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=API_DIR, env=env, check=True)
+
+def import_breakdown(env, top: int) -> None:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.main"],
+        cwd=API_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    # Lines are "import time: self [us] | cumulative | name"; self times are
+    # summed per top-level package, and per module for the application
+    packages = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if name == "src.main":
+            total = int(cumulative)
+        key = name if name.startswith("src.") else name.split(".")[0]
+        packages[key] = packages.get(key, 0) + int(own)
+    print(f"import src.main: {total / 1000:.0f} ms, by package (self time):")
+    for name, own in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {name:<40} {own / 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10, help="cold containers to start")
+    parser.add_argument("--top", type=int, default=15, help="packages in the import breakdown")
+    args = parser.parse_args()
+
+    if os.environ.get("BENCH_COLD_START_CHILD"):
+        child()
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            AWS_LAMBDA_FUNCTION_NAME="bench-cold-start",
+            DATABASE_URL=f"sqlite:///{directory}/cold_start.db",
+            OUTBOX_RELAY_ENABLED="false",
+        )
+        seed(env)
+        import_breakdown(env, args.top)
+
+        samples = {"init": [], "first": [], "warm": []}
+        for _ in range(args.runs):
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__)],
+                cwd=API_DIR, env=dict(env, BENCH_COLD_START_CHILD="1"),
+                capture_output=True, text=True, check=True
+            )
+            for phase, seconds in json.loads(result.stdout.splitlines()[-1]).items():
+                samples[phase].append(seconds)
+
+    print(f"{args.runs} cold starts:")
+    for phase, label in (("init", "init (import)"), ("first", "first invocation"), ("warm", "warm invocation")):
+        print(
+            f"  {label:<18} p50 {percentile(samples[phase], 0.5) * 1000:7.1f} ms, "
+            f"p90 {percentile(samples[phase], 0.9) * 1000:7.1f} ms"
+        )
+    cold = [init + first for init, first in zip(samples["init"], samples["first"])]
+    print(f"  {'cold total':<18} p50 {percentile(cold, 0.5) * 1000:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
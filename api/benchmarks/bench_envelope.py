@@ -0,0 +1,100 @@
+"""
+Microbenchmark of the queue message encodings of booking events.
+
+Events are encoded and decoded as one message each in JSON (json.dumps and
+json.loads, then orjson, the version 1 bodies) and in the version 2 msgpack
+envelope, and as batch envelopes of --batch events with and without
+compression. Decoding includes turning the timestamps back into ISO-8601
+strings, which is what the consumer reads. Times and sizes are per event.
+
+Usage:
+    cd api
+    python benchmarks/bench_envelope.py
+    python benchmarks/bench_envelope.py --events 10000 --batch 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+EPOCH = datetime(2030, 1, 7, 9)
+
+def best_per_event(function, events: int, repeat: int) -> float:
+    """Fastest of repeat runs, in microseconds per event."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best / events * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=100, help="events per batch envelope")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    import orjson
+    from booking_events.envelope import decode, encode_batch, encode_event
+    from src.core.serialization import encode_message
+
+    events = [
+        {
+            "event_type": ("booking_created", "booking_confirmed", "booking_cancelled")[n % 3],
+            "booking_id": 100000 + n,
+            "therapist_id": 1 + n % 50,
+            "client_email": f"client{n}@example.com",
+            "start_time": EPOCH + timedelta(hours=n),
+            "end_time": EPOCH + timedelta(hours=n, minutes=50),
+        }
+        for n in range(args.events)
+    ]
+    iso_events = [
+        {**event, "start_time": event["start_time"].isoformat(), "end_time": event["end_time"].isoformat()}
+        for event in events
+    ]
+    chunks = [events[start:start + args.batch] for start in range(0, len(events), args.batch)]
+
+    encodings = {
+        "json": (
+            lambda: [json.dumps(event) for event in iso_events],
+            lambda bodies: [json.loads(body) for body in bodies],
+        ),
+        "orjson": (
+            lambda: [encode_message(event) for event in events],
+            lambda bodies: [orjson.loads(body) for body in bodies],
+        ),
+        "msgpack": (
+            lambda: [encode_event(event) for event in events],
+            lambda bodies: [decode(body) for body in bodies],
+        ),
+        f"msgpack batch of {args.batch}": (
+            lambda: [encode_batch(chunk, compress=False) for chunk in chunks],
+            lambda bodies: [decode(body) for body in bodies],
+        ),
+        f"msgpack batch of {args.batch}, zlib": (
+            lambda: [encode_batch(chunk) for chunk in chunks],
+            lambda bodies: [decode(body) for body in bodies],
+        ),
+    }
+
+    print(f"{args.events} events, per event (best of {args.repeat}):")
+    print(f"  {'encoding':<30} {'encode':>10} {'decode':>10} {'bytes':>7}")
+    for label, (encode, decode_all) in encodings.items():
+        bodies = encode()
+        size = sum(len(body) for body in bodies) / args.events
+        print(
+            f"  {label:<30} "
+            f"{best_per_event(encode, args.events, args.repeat):7.2f} us "
+            f"{best_per_event(lambda: decode_all(bodies), args.events, args.repeat):7.2f} us "
+            f"{size:7.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
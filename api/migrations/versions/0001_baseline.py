@@ -0,0 +1,53 @@
+"""Baseline: the schema of src/infrastructure/schema.sql
+
+Databases created from schema.sql are marked as being at this revision with
+``alembic stamp 0001_baseline`` and brought up to date with ``alembic upgrade
+head``; new databases get it from ``alembic upgrade``. Tables and columns
+added since are later revisions, so neither file changes again.
+
+Revision ID: 0001_baseline
+Revises: 
+Create Date: 2026-10-17 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "therapists",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("email", sa.String(100), nullable=False, unique=True),
+        sa.Column("phone", sa.String(20), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "bookings",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("therapist_id", sa.Integer(), sa.ForeignKey("therapists.id")),
+        sa.Column("client_name", sa.String(100), nullable=False),
+        sa.Column("client_email", sa.String(100), nullable=False),
+        sa.Column("start_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("end_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("idx_bookings_therapist_id", "bookings", ["therapist_id"])
+    op.create_index("idx_bookings_start_time", "bookings", ["start_time"])
+    op.create_index("idx_bookings_status", "bookings", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_table("bookings")
+    op.drop_table("therapists")
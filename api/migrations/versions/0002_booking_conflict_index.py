@@ -0,0 +1,39 @@
+"""Index bookings for the overlap probe of new bookings
+
+With BOOKING_CONFLICT_STRATEGY=exclusion on PostgreSQL, an exclusion
+constraint also rejects overlapping active bookings in the database.
+
+Revision ID: 0002_booking_conflict_index
+Revises: 0001_baseline
+Create Date: 2026-10-17 09:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.infrastructure.database import BOOKING_CONFLICT_STRATEGY
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_booking_conflict_index"
+down_revision: Union[str, None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_bookings_therapist_time", "bookings", ["therapist_id", "start_time", "end_time"])
+    if op.get_bind().dialect.name == "postgresql" and BOOKING_CONFLICT_STRATEGY == "exclusion":
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        op.execute(
+            "ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap "
+            "EXCLUDE USING gist (therapist_id WITH =, tstzrange(start_time, end_time) WITH &&) "
+            "WHERE (status <> 'cancelled')"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap")
+    op.drop_index("ix_bookings_therapist_time", "bookings")
@@ -0,0 +1,34 @@
+"""Add the transactional outbox of booking events
+
+Revision ID: 0003_outbox_messages
+Revises: 0002_booking_conflict_index
+Create Date: 2026-10-17 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_outbox_messages"
+down_revision: Union[str, None] = "0002_booking_conflict_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox_messages",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("available_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_outbox_messages_available_at", "outbox_messages", ["available_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("outbox_messages")
@@ -0,0 +1,36 @@
+"""Add the consumer's table of notifications already sent
+
+The consumer creates the table itself when it is missing (see
+consumer/src/idempotency.py), so it may already exist when this runs.
+
+Revision ID: 0004_processed_notifications
+Revises: 0003_outbox_messages
+Create Date: 2026-10-17 09:15:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_processed_notifications"
+down_revision: Union[str, None] = "0003_outbox_messages"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE TABLE IF NOT EXISTS processed_notifications ("
+        "key VARCHAR(200) NOT NULL PRIMARY KEY, "
+        "expires_at TIMESTAMP WITH TIME ZONE NOT NULL)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_processed_notifications_expires_at "
+        "ON processed_notifications (expires_at)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("processed_notifications")
@@ -0,0 +1,33 @@
+"""Add weekly working hours, the basis of availability
+
+Revision ID: 0005_working_hours
+Revises: 0004_processed_notifications
+Create Date: 2026-10-17 09:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_working_hours"
+down_revision: Union[str, None] = "0004_processed_notifications"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "working_hours",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("therapist_id", sa.Integer(), sa.ForeignKey("therapists.id"), nullable=False),
+        sa.Column("weekday", sa.Integer(), nullable=False),
+        sa.Column("start_time", sa.Time(), nullable=False),
+        sa.Column("end_time", sa.Time(), nullable=False),
+    )
+    op.create_index("ix_working_hours_therapist", "working_hours", ["therapist_id", "weekday"])
+
+
+def downgrade() -> None:
+    op.drop_table("working_hours")
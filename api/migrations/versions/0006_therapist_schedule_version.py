@@ -0,0 +1,28 @@
+"""Add therapists.schedule_version, which invalidates the schedule index
+
+Revision ID: 0006_therapist_schedule_version
+Revises: 0005_working_hours
+Create Date: 2026-10-17 09:25:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_therapist_schedule_version"
+down_revision: Union[str, None] = "0005_working_hours"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "therapists",
+        sa.Column("schedule_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("therapists", "schedule_version")
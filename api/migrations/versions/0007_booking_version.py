@@ -0,0 +1,28 @@
+"""Add bookings.version, checked by If-Match on status changes
+
+Revision ID: 0007_booking_version
+Revises: 0006_therapist_schedule_version
+Create Date: 2026-10-17 09:28:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_booking_version"
+down_revision: Union[str, None] = "0006_therapist_schedule_version"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "bookings",
+        sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("bookings", "version")
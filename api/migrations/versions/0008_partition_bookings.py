@@ -0,0 +1,211 @@
+"""Partition bookings by month of start_time and add bookings_archive
+
+On PostgreSQL, bookings becomes a table range partitioned on start_time,
+with one partition per month from the earliest booking to
+BOOKING_PARTITIONS_AHEAD months ahead and a DEFAULT partition for the rest.
+The primary key becomes (id, start_time), since unique constraints of a
+partitioned table must include the partition key. The existing rows are
+copied, so run it in a maintenance window. The index on (therapist_id,
+start_time, end_time) covers the former single-column indexes, which are
+dropped.
+
+An exclusion constraint cannot span partitions, so the migration refuses to
+run with BOOKING_CONFLICT_STRATEGY=exclusion; switch to advisory first.
+
+Overlap probes only look back BOOKING_MAX_DURATION_HOURS from a new booking
+so that they touch few partitions, and would miss longer bookings. The
+migration refuses to run while active bookings exceed it, on every backend;
+raise the limit or cancel them first.
+
+bookings_archive, partitioned the same way, receives the partitions the
+archival job detaches from bookings (see src/infrastructure/partitions.py).
+Other backends get a plain bookings_archive table.
+
+Revision ID: 0008_partition_bookings
+Revises: 0007_booking_version
+Create Date: 2026-10-17 09:30:00
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from src.infrastructure.database import BOOKING_CONFLICT_STRATEGY, BOOKING_MAX_DURATION_HOURS
+from src.infrastructure.partitions import (
+    BOOKING_PARTITIONS_AHEAD,
+    add_months,
+    month_start,
+    partition_of,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_partition_bookings"
+down_revision: Union[str, None] = "0007_booking_version"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Identical names, types and NOT NULLs in bookings and bookings_archive,
+# which ATTACH PARTITION requires of the partitions moved between them
+COLUMN_TYPES = (
+    ("id", "INTEGER NOT NULL"),
+    ("therapist_id", "INTEGER"),
+    ("client_name", "VARCHAR(100) NOT NULL"),
+    ("client_email", "VARCHAR(100) NOT NULL"),
+    ("start_time", "TIMESTAMP WITH TIME ZONE NOT NULL"),
+    ("end_time", "TIMESTAMP WITH TIME ZONE NOT NULL"),
+    ("status", "VARCHAR(20) NOT NULL"),
+    ("version", "INTEGER NOT NULL"),
+    ("created_at", "TIMESTAMP WITH TIME ZONE"),
+    ("updated_at", "TIMESTAMP WITH TIME ZONE"),
+)
+COLUMN_DEFAULTS = {
+    "id": "nextval('bookings_id_seq')",
+    "status": "'pending'",
+    "version": "1",
+    "created_at": "CURRENT_TIMESTAMP",
+    "updated_at": "CURRENT_TIMESTAMP",
+}
+COLUMNS = ", ".join(name for name, _ in COLUMN_TYPES)
+
+
+def _columns(table: str, defaults: bool) -> str:
+    columns = [
+        f"{name} {type_} DEFAULT {COLUMN_DEFAULTS[name]}" if defaults and name in COLUMN_DEFAULTS
+        else f"{name} {type_}"
+        for name, type_ in COLUMN_TYPES
+    ]
+    return ", ".join([*columns, f"CONSTRAINT {table}_pkey PRIMARY KEY (id, start_time)"])
+
+
+def _check_durations(bind: sa.engine.Connection) -> None:
+    """Refuse to run while active bookings are longer than the maximum duration."""
+    message = (
+        f"Active bookings longer than BOOKING_MAX_DURATION_HOURS={BOOKING_MAX_DURATION_HOURS:g} "
+        "would be missed by overlap checks; raise it or cancel them first"
+    )
+    if bind.dialect.name == "postgresql":
+        # A DO block, so alembic upgrade --sql scripts check it too
+        op.execute(
+            "DO $$ BEGIN IF EXISTS (SELECT 1 FROM bookings WHERE status <> 'cancelled' "
+            f"AND end_time - start_time > interval '{BOOKING_MAX_DURATION_HOURS:g} hours') "
+            f"THEN RAISE EXCEPTION '{message}'; END IF; END $$"
+        )
+    elif bind.dialect.name == "sqlite" and not context.is_offline_mode():
+        too_long = bind.execute(sa.text(
+            "SELECT count(*) FROM bookings WHERE status <> 'cancelled' "
+            "AND (julianday(end_time) - julianday(start_time)) * 24 > :hours"
+        ), {"hours": BOOKING_MAX_DURATION_HOURS}).scalar()
+        if too_long:
+            raise RuntimeError(f"{too_long} {message[0].lower()}{message[1:]}")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    _check_durations(bind)
+    if bind.dialect.name != "postgresql":
+        op.create_table(
+            "bookings_archive",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("therapist_id", sa.Integer()),
+            sa.Column("client_name", sa.String(100), nullable=False),
+            sa.Column("client_email", sa.String(100), nullable=False),
+            sa.Column("start_time", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("end_time", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("status", sa.String(20), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True)),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+        return
+    if BOOKING_CONFLICT_STRATEGY == "exclusion":
+        raise RuntimeError(
+            "An exclusion constraint cannot span partitions of bookings; "
+            "set BOOKING_CONFLICT_STRATEGY=advisory before partitioning"
+        )
+
+    op.execute("ALTER TABLE bookings RENAME TO bookings_unpartitioned")
+    op.execute("ALTER TABLE bookings_unpartitioned RENAME CONSTRAINT bookings_pkey TO bookings_unpartitioned_pkey")
+    op.execute("ALTER TABLE bookings_unpartitioned DROP CONSTRAINT IF EXISTS bookings_no_overlap")
+    op.execute("ALTER TABLE bookings_unpartitioned DROP CONSTRAINT IF EXISTS bookings_therapist_id_fkey")
+    for index in (
+        "idx_bookings_therapist_id",
+        "idx_bookings_start_time",
+        "idx_bookings_status",
+        "ix_bookings_therapist_time",
+        "ix_bookings_id",
+    ):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    # Keeps the sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY NONE")
+
+    op.execute(
+        f"CREATE TABLE bookings ({_columns('bookings', defaults=True)}, "
+        "CONSTRAINT bookings_therapist_id_fkey FOREIGN KEY (therapist_id) REFERENCES therapists (id)) "
+        "PARTITION BY RANGE (start_time)"
+    )
+    op.execute("CREATE INDEX ix_bookings_therapist_time ON bookings (therapist_id, start_time, end_time)")
+
+    # alembic upgrade --sql cannot query, so its script starts at this month
+    earliest = None if context.is_offline_mode() else bind.execute(
+        sa.text("SELECT min(start_time) FROM bookings_unpartitioned")
+    ).scalar()
+    now = datetime.now(timezone.utc)
+    month = month_start(min(earliest, now) if earliest is not None else now)
+    last = add_months(month_start(now), BOOKING_PARTITIONS_AHEAD)
+    while month <= last:
+        op.execute(partition_of("bookings", month))
+        month = add_months(month, 1)
+    op.execute("CREATE TABLE bookings_default PARTITION OF bookings DEFAULT")
+
+    op.execute(f"INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_unpartitioned")
+    op.execute("DROP TABLE bookings_unpartitioned")
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id")
+    op.execute("ANALYZE bookings")
+
+    op.execute(
+        f"CREATE TABLE bookings_archive ({_columns('bookings_archive', defaults=False)}) "
+        "PARTITION BY RANGE (start_time)"
+    )
+    op.execute("CREATE TABLE bookings_archive_default PARTITION OF bookings_archive DEFAULT")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.execute(f"INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_archive")
+        op.drop_table("bookings_archive")
+        return
+
+    op.execute(
+        "CREATE TABLE bookings_unpartitioned ("
+        "id INTEGER NOT NULL DEFAULT nextval('bookings_id_seq') PRIMARY KEY, "
+        "therapist_id INTEGER REFERENCES therapists (id), "
+        "client_name VARCHAR(100) NOT NULL, "
+        "client_email VARCHAR(100) NOT NULL, "
+        "start_time TIMESTAMP WITH TIME ZONE NOT NULL, "
+        "end_time TIMESTAMP WITH TIME ZONE NOT NULL, "
+        "status VARCHAR(20) NOT NULL DEFAULT 'pending', "
+        "version INTEGER NOT NULL DEFAULT 1, "
+        "created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP, "
+        "updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)"
+    )
+    op.execute(
+        f"INSERT INTO bookings_unpartitioned ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM bookings_archive UNION ALL SELECT {COLUMNS} FROM bookings"
+    )
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE bookings_archive")
+    op.execute("DROP TABLE bookings")
+    op.execute("ALTER TABLE bookings_unpartitioned RENAME TO bookings")
+    op.execute("ALTER TABLE bookings RENAME CONSTRAINT bookings_unpartitioned_pkey TO bookings_pkey")
+    op.execute(
+        "ALTER TABLE bookings RENAME CONSTRAINT bookings_unpartitioned_therapist_id_fkey "
+        "TO bookings_therapist_id_fkey"
+    )
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id")
+    op.create_index("idx_bookings_therapist_id", "bookings", ["therapist_id"])
+    op.create_index("idx_bookings_start_time", "bookings", ["start_time"])
+    op.create_index("idx_bookings_status", "bookings", ["status"])
+    op.create_index("ix_bookings_therapist_time", "bookings", ["therapist_id", "start_time", "end_time"])
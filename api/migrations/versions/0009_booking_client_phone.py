@@ -0,0 +1,32 @@
+"""Add the client's phone number to bookings, for text notifications
+
+The column is added to bookings_archive as well, since ATTACH PARTITION
+requires the partitions moved between the two tables to have the same
+columns. On PostgreSQL, adding it to a partitioned table adds it to every
+partition.
+
+Revision ID: 0009_booking_client_phone
+Revises: 0008_partition_bookings
+Create Date: 2026-10-17 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0009_booking_client_phone"
+down_revision: Union[str, None] = "0008_partition_bookings"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ("bookings", "bookings_archive"):
+        op.add_column(table, sa.Column("client_phone", sa.String(20)))
+
+
+def downgrade() -> None:
+    for table in ("bookings", "bookings_archive"):
+        op.drop_column(table, "client_phone")
@@ -9,7 +9,11 @@ setup(
         "uvicorn==0.24.0",
         "sqlalchemy==2.0.23",
         "psycopg2-binary==2.9.9",
+        "asyncpg==0.29.0",
+        "aiosqlite==0.19.0",
         "pydantic[email]==2.5.2",
+        "orjson==3.8.3",
+        "therapist-booking-events==0.1.0",
         "pytest==7.4.3",
         "pytest-asyncio==0.21.1",
         "httpx==0.25.2",
@@ -17,4 +21,7 @@ setup(
         "python-dotenv==1.0.0",
         "alembic==1.12.1",
     ],
+    extras_require={
+        "redis": ["redis==5.0.1"],
+    },
 ) 
\ No newline at end of file
@@ -0,0 +1,165 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from heapq import merge
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .intervals import as_utc_naive
+
+# Longest window a single therapist's availability may be requested for
+MAX_AVAILABILITY_WINDOW = timedelta(days=366)
+# Longest window of a search across therapists
+MAX_SEARCH_WINDOW = timedelta(days=31)
+# Therapists read per page of a search across therapists
+MAX_SEARCH_THERAPISTS = 100
+
+Interval = Tuple[datetime, datetime]
+
+def working_intervals(
+    hours: Iterable[Tuple[int, time, time]],
+    start: datetime,
+    end: datetime
+) -> List[Interval]:
+    """
+    Expand weekly working hours into concrete intervals within [start, end).
+
+    Args:
+        hours: (weekday, start, end) rows, Monday being 0, in UTC
+        start: Window start
+        end: Window end
+
+    Returns:
+        Sorted, merged working intervals clipped to the window
+    """
+    start, end = as_utc_naive(start), as_utc_naive(end)
+    by_weekday: Dict[int, List[Tuple[time, time]]] = defaultdict(list)
+    for weekday, opens, closes in hours:
+        by_weekday[weekday].append((opens, closes))
+    for day_hours in by_weekday.values():
+        day_hours.sort()
+
+    intervals: List[Interval] = []
+    day = start.date()
+    while day <= end.date():
+        for opens, closes in by_weekday.get(day.weekday(), ()):
+            interval_start = max(datetime.combine(day, opens), start)
+            interval_end = min(datetime.combine(day, closes), end)
+            if interval_start < interval_end:
+                intervals.append((interval_start, interval_end))
+        day += timedelta(days=1)
+    return merge_intervals(intervals)
+
+def merge_intervals(intervals: Sequence[Interval]) -> List[Interval]:
+    """
+    Merge overlapping or touching intervals that are sorted by start.
+    """
+    merged: List[Interval] = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def free_intervals(
+    working: Sequence[Interval],
+    busy: Sequence[Interval],
+    min_duration: timedelta = timedelta(0)
+) -> Iterator[Interval]:
+    """
+    Gaps between busy intervals within the working intervals.
+
+    Both inputs are sorted by start, so one merge-like sweep finds every gap
+    in O(len(working) + len(busy)). Busy intervals may overlap each other.
+
+    Args:
+        working: Sorted, non-overlapping working intervals
+        busy: Busy intervals sorted by start
+        min_duration: Shortest gap worth returning
+
+    Returns:
+        Free intervals in order, lazily
+    """
+    position = 0
+    for working_start, working_end in working:
+        while position < len(busy) and busy[position][1] <= working_start:
+            position += 1
+        cursor = working_start
+        scan = position
+        while scan < len(busy) and busy[scan][0] < working_end:
+            busy_start, busy_end = busy[scan]
+            if busy_start > cursor and busy_start - cursor >= min_duration:
+                yield cursor, busy_start
+            cursor = max(cursor, busy_end)
+            scan += 1
+        if cursor < working_end and working_end - cursor >= min_duration:
+            yield cursor, working_end
+
+def slots(free: Iterable[Interval], duration: timedelta) -> Iterator[Interval]:
+    """
+    Consecutive slots of ``duration`` fitting in the free intervals, each
+    interval's first slot starting where the interval starts.
+    """
+    for free_start, free_end in free:
+        slot_start = free_start
+        while slot_start + duration <= free_end:
+            yield slot_start, slot_start + duration
+            slot_start += duration
+
+def earliest_slot_start(working: Sequence[Interval], duration: timedelta) -> Optional[datetime]:
+    """
+    Start of the first slot of ``duration`` within the working intervals,
+    ignoring bookings: no free slot of the therapist starts earlier.
+    """
+    return next((start for start, end in working if end - start >= duration), None)
+
+def therapist_schedules(
+    hours: Dict[int, List[Tuple[int, time, time]]],
+    busy: Dict[int, List[Interval]],
+    start: datetime,
+    end: datetime
+) -> Dict[int, Tuple[List[Interval], List[Interval]]]:
+    """
+    Working and busy intervals of each therapist with working hours.
+
+    Therapists usually share a handful of weekly patterns, so each distinct
+    pattern is expanded over the window once.
+    """
+    expanded: Dict[Tuple, List[Interval]] = {}
+    schedules = {}
+    for therapist_id, weekly in hours.items():
+        pattern = tuple(sorted(weekly))
+        if pattern not in expanded:
+            expanded[pattern] = working_intervals(pattern, start, end)
+        schedules[therapist_id] = (expanded[pattern], busy.get(therapist_id, []))
+    return schedules
+
+def first_free_slots(
+    schedules: Dict[int, Tuple[Sequence[Interval], Sequence[Interval]]],
+    duration: timedelta,
+    limit: int
+) -> List[Tuple[int, datetime, datetime]]:
+    """
+    The earliest ``limit`` slots of ``duration`` across several therapists.
+
+    Each therapist's slots are generated lazily and combined with a k-way
+    heap merge, so only as many gaps are computed as it takes to find the
+    first ``limit`` slots: O(T log T + limit log T) past the input.
+
+    Args:
+        schedules: Therapist ID -> (working intervals, busy intervals)
+        duration: Slot length
+        limit: Number of slots to return
+
+    Returns:
+        (therapist_id, start, end) ordered by start, then therapist ID
+    """
+    def therapist_slots(therapist_id: int, working, busy):
+        for slot_start, slot_end in slots(free_intervals(working, busy, duration), duration):
+            yield slot_start, therapist_id, slot_end
+
+    merged = merge(*(
+        therapist_slots(therapist_id, working, busy)
+        for therapist_id, (working, busy) in sorted(schedules.items())
+    ))
+    return [(therapist_id, start, end) for start, therapist_id, end in islice(merged, limit)]
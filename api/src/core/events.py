@@ -0,0 +1,23 @@
+from typing import Any, Dict
+
+def booking_event(booking: Any, event_type: str) -> Dict[str, Any]:
+    """
+    Build the queue message for a booking event.
+
+    Args:
+        booking: Booking or BookingModel with id, therapist and time fields
+        event_type: Event name, e.g. booking_created
+
+    Returns:
+        Dictionary sent to the notification queue; the times stay datetimes
+        until the message is encoded (see infrastructure.sqs.encode_body)
+    """
+    return {
+        "booking_id": booking.id,
+        "therapist_id": booking.therapist_id,
+        "client_email": booking.client_email,
+        "client_phone": booking.client_phone,
+        "start_time": booking.start_time,
+        "end_time": booking.end_time,
+        "event_type": event_type
+    }
@@ -0,0 +1,42 @@
+from typing import Optional
+
+class BookingConflictError(Exception):
+    """Raised when a booking overlaps an active booking of the same therapist."""
+
+    def __init__(self, conflicting_booking_id: Optional[int] = None):
+        self.conflicting_booking_id = conflicting_booking_id
+        message = "Booking conflicts with an existing booking"
+        if conflicting_booking_id is not None:
+            message = f"{message} ({conflicting_booking_id})"
+        super().__init__(message)
+
+class TherapistNotFoundError(Exception):
+    """Raised when a booking references a therapist that does not exist."""
+
+    def __init__(self, therapist_id: int):
+        self.therapist_id = therapist_id
+        super().__init__("Therapist not found")
+
+class BookingNotFoundError(Exception):
+    """Raised when a booking to change does not exist."""
+
+    def __init__(self, booking_id: int):
+        self.booking_id = booking_id
+        super().__init__("Booking not found")
+
+class BookingVersionMismatchError(Exception):
+    """Raised when a booking changed since the version the caller last read."""
+
+    def __init__(self, booking_id: int, current_version: int):
+        self.booking_id = booking_id
+        self.current_version = current_version
+        super().__init__(f"Booking was modified (current version {current_version})")
+
+class InvalidStatusTransitionError(Exception):
+    """Raised when a booking's status does not allow the requested change."""
+
+    def __init__(self, booking_id: int, status: str, target: str):
+        self.booking_id = booking_id
+        self.status = status
+        self.target = target
+        super().__init__(f"Cannot change a {status} booking to {target}")
@@ -0,0 +1,107 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+from typing import Any, Iterable, List, Optional, Tuple
+
+def as_utc_naive(value: datetime) -> datetime:
+    """
+    Normalize a datetime for comparison with database values.
+
+    Aware values are converted to UTC; naive values are taken to be UTC
+    already, as SQLite returns them and PostgreSQL stores them.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+class IntervalSet:
+    """
+    Sorted set of non-overlapping half-open intervals [start, end).
+
+    Because the intervals never overlap, ordering by start also orders them
+    by end, so overlap checks only need to look at the neighbours of a
+    binary-search position: O(log n) per lookup.
+    """
+
+    def __init__(self, intervals: Optional[List[Tuple[datetime, datetime, Any]]] = None):
+        self._items: List[Tuple[datetime, datetime, Any]] = sorted((
+            (as_utc_naive(start), as_utc_naive(end), value)
+            for start, end, value in (intervals or [])
+        ), key=lambda item: (item[0], item[1]))
+        self._starts = [item[0] for item in self._items]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def overlapping(self, start: datetime, end: datetime) -> Optional[Tuple[datetime, datetime, Any]]:
+        """
+        Return an interval overlapping [start, end), or None.
+        """
+        start, end = as_utc_naive(start), as_utc_naive(end)
+        # The last interval starting before `end` has the latest end of all
+        # intervals that could overlap
+        position = bisect_left(self._starts, end) - 1
+        if position >= 0 and self._items[position][1] > start:
+            return self._items[position]
+        return None
+
+    def between(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime, Any]]:
+        """
+        Intervals overlapping [start, end), in order.
+        """
+        start, end = as_utc_naive(start), as_utc_naive(end)
+        first = bisect_left(self._starts, start)
+        # Only the interval starting just before `start` can reach into the range
+        if first > 0 and self._items[first - 1][1] > start:
+            first -= 1
+        return self._items[first:bisect_left(self._starts, end)]
+
+    def next_free(self, after: datetime, duration: timedelta) -> datetime:
+        """
+        Earliest start at or after ``after`` of a gap at least ``duration`` long.
+
+        O(log n) plus the number of back-to-back intervals skipped.
+        """
+        candidate = as_utc_naive(after)
+        position = bisect_right(self._starts, candidate) - 1
+        if position >= 0 and self._items[position][1] > candidate:
+            candidate = self._items[position][1]
+        position += 1
+        while position < len(self._items) and self._items[position][0] < candidate + duration:
+            candidate = max(candidate, self._items[position][1])
+            position += 1
+        return candidate
+
+    def add(self, start: datetime, end: datetime, value: Any = None) -> None:
+        """
+        Insert an interval; the caller guarantees it overlaps nothing.
+        """
+        item = (as_utc_naive(start), as_utc_naive(end), value)
+        position = bisect_left(self._starts, item[0])
+        self._starts.insert(position, item[0])
+        self._items.insert(position, item)
+
+    def remove(self, value: Any, start: Optional[datetime] = None) -> bool:
+        """
+        Remove the interval carrying ``value``.
+
+        Args:
+            value: Value of the interval
+            start: Its start, if known, to find it by binary search
+
+        Returns:
+            Whether an interval was removed
+        """
+        positions: Iterable[int] = range(len(self._items))
+        if start is not None:
+            # Fall back to a scan only if the interval is not where expected
+            positions = chain([bisect_left(self._starts, as_utc_naive(start))], positions)
+        for position in positions:
+            if position < len(self._items) and self._items[position][2] == value:
+                del self._items[position]
+                del self._starts[position]
+                return True
+        return False
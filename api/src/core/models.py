@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, time
+from typing import List, Optional
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 
 class Therapist(BaseModel):
@@ -18,9 +18,12 @@ class Booking(BaseModel):
     therapist_id: int
     client_name: str = Field(..., min_length=1, max_length=100)
     client_email: EmailStr
+    # Mobile number for text notifications
+    client_phone: Optional[str] = Field(None, min_length=10, max_length=20)
     start_time: datetime
     end_time: datetime
     status: str = Field(default="pending", pattern="^(pending|confirmed|cancelled)$")
+    version: Optional[int] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -34,9 +37,47 @@ class BookingCreate(BaseModel):
     therapist_id: int
     client_name: str = Field(..., min_length=1, max_length=100)
     client_email: EmailStr
+    # Mobile number for text notifications
+    client_phone: Optional[str] = Field(None, min_length=10, max_length=20)
     start_time: datetime
     end_time: datetime
 
     def validate_times(self) -> bool:
         """Validate that end_time is after start_time."""
-        return self.end_time > self.start_time 
\ No newline at end of file
+        return self.end_time > self.start_time
+
+class BookingBatchCreate(BaseModel):
+    items: List[BookingCreate] = Field(..., min_length=1, max_length=1000)
+    all_or_nothing: bool = True
+
+class BookingBatchItemResult(BaseModel):
+    index: int
+    status: str = Field(..., pattern="^(created|rejected|skipped)$")
+    booking: Optional[Booking] = None
+    error: Optional[str] = None
+
+class BookingBatchResult(BaseModel):
+    created: int
+    results: List[BookingBatchItemResult]
+
+class WorkingHours(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    weekday: int = Field(..., ge=0, le=6)
+    start_time: time
+    end_time: time
+
+    def validate_times(self) -> bool:
+        """Validate that end_time is after start_time on the same day."""
+        return self.end_time > self.start_time
+
+class TimeSlot(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+class Availability(BaseModel):
+    therapist_id: int
+    slots: List[TimeSlot]
+
+class AvailableSlot(TimeSlot):
+    therapist_id: int
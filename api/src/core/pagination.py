@@ -0,0 +1,50 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+    etag: Optional[str] = None
+    # Serialized items, when the page is cached pre-rendered
+    body: Optional[bytes] = None
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode the sort key of the last row of a page as an opaque cursor.
+
+    Args:
+        values: Sort key values; datetimes are stored in ISO format
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+def page_etag(body: bytes, next_cursor: Optional[str] = None) -> str:
+    """Strong ETag over the serialized body of a page."""
+    digest = hashlib.sha1(body)
+    digest.update((next_cursor or "").encode())
+    return f'"{digest.hexdigest()}"'
@@ -0,0 +1,36 @@
+from typing import Any, Dict, List, Union
+import orjson
+from pydantic import BaseModel, TypeAdapter
+from .models import Booking, Therapist, WorkingHours
+
+# Bulk validators: one call validates a whole list in pydantic-core instead
+# of a Python-level model construction per item
+booking_list = TypeAdapter(List[Booking])
+therapist_list = TypeAdapter(List[Therapist])
+working_hours_list = TypeAdapter(List[WorkingHours])
+
+# Aware UTC datetimes end in Z, as in Pydantic's JSON output
+_OPTIONS = orjson.OPT_UTC_Z
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(value: Any) -> bytes:
+    """
+    Serialize to JSON bytes with orjson.
+
+    Dicts, lists, datetimes and times are handled natively; Pydantic models
+    are dumped first. The output matches Pydantic's JSON mode for the
+    response models, so rows can be serialized without building models.
+    """
+    return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON with orjson."""
+    return orjson.loads(data)
+
+def encode_message(message: Dict[str, Any]) -> str:
+    """Queue message body of an event."""
+    return dumps(message).decode()
@@ -0,0 +1,207 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from datetime import datetime, time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+from .cache import TTLCache
+from .database import DatabaseSession
+from .repository import (
+    BOOKING_COLUMNS,
+    STREAM_BATCH_SIZE,
+    BookingRepository,
+    TherapistRepository,
+    UnitOfWork,
+    WorkingHoursRepository,
+    known_therapist_ids,
+    therapist_bookings_query,
+    therapist_directory_cache,
+)
+from ..core.models import Booking, BookingBatchItemResult, BookingCreate, Therapist, WorkingHours
+from ..core.pagination import Page
+
+class AsyncUnitOfWork:
+    """
+    ``async with`` form of UnitOfWork for the sessions routes receive.
+
+    Repository calls made through the async facades inside the block share
+    one commit, which runs like they do: through ``run_sync`` with an
+    AsyncSession, on the threadpool with a plain Session.
+    """
+
+    def __init__(self, db: DatabaseSession):
+        self.db = db
+        self._unit = UnitOfWork(db.sync_session if isinstance(db, AsyncSession) else db)
+
+    async def __aenter__(self) -> "AsyncUnitOfWork":
+        self._unit.__enter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if isinstance(self.db, AsyncSession):
+            await self.db.run_sync(lambda session: self._unit.__exit__(exc_type, exc, tb))
+        else:
+            await run_in_threadpool(self._unit.__exit__, exc_type, exc, tb)
+
+async def _cache_call(cache: Any, method: str, *args: Any) -> Any:
+    # An in-process cache answers on the event loop; a shared one (redis) is
+    # a blocking network round-trip, so it is moved to the threadpool
+    if isinstance(cache, TTLCache):
+        return getattr(cache, method)(*args)
+    return await run_in_threadpool(getattr(cache, method), *args)
+
+class _AsyncRepository:
+    """
+    Awaitable facade over a synchronous repository.
+
+    With an AsyncSession the repository code runs through ``run_sync`` so its
+    I/O goes through the asyncio driver without blocking the event loop. With
+    a plain Session the call is moved to the threadpool instead. Either way
+    the query logic lives once, in the synchronous repository.
+    """
+
+    repository_class: Type[Any]
+
+    def __init__(self, db: DatabaseSession):
+        self.db = db
+
+    async def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        if isinstance(self.db, AsyncSession):
+            return await self.db.run_sync(
+                lambda session: getattr(self.repository_class(session), method)(*args, **kwargs)
+            )
+        repository = self.repository_class(self.db)
+        return await run_in_threadpool(getattr(repository, method), *args, **kwargs)
+
+class AsyncBookingRepository(_AsyncRepository):
+    repository_class = BookingRepository
+
+    async def create(self, booking: BookingCreate) -> Booking:
+        return await self._call("create", booking)
+
+    async def create_many(
+        self,
+        bookings: List[BookingCreate],
+        all_or_nothing: bool = True
+    ) -> List[BookingBatchItemResult]:
+        return await self._call("create_many", bookings, all_or_nothing)
+
+    async def transition(
+        self,
+        booking_id: int,
+        target: str,
+        expected_version: Optional[int] = None
+    ) -> Booking:
+        return await self._call("transition", booking_id, target, expected_version)
+
+    async def cancel_range(
+        self,
+        therapist_id: int,
+        start_from: datetime,
+        start_to: datetime
+    ) -> List[Booking]:
+        return await self._call("cancel_range", therapist_id, start_from, start_to)
+
+    async def find_conflict(
+        self,
+        therapist_id: int,
+        start_time: datetime,
+        end_time: datetime
+    ) -> Optional[Booking]:
+        return await self._call("find_conflict", therapist_id, start_time, end_time)
+
+    async def get_by_id(self, booking_id: int) -> Optional[Booking]:
+        return await self._call("get_by_id", booking_id)
+
+    async def get_by_therapist(self, therapist_id: int) -> List[Booking]:
+        return await self._call("get_by_therapist", therapist_id)
+
+    async def page_by_therapist(
+        self,
+        therapist_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+        status: Optional[str] = None
+    ) -> Page:
+        return await self._call(
+            "page_by_therapist", therapist_id, limit, cursor, start_from, start_to, status
+        )
+
+    async def busy_intervals(
+        self,
+        start: datetime,
+        end: datetime,
+        therapist_ids: Optional[List[int]] = None
+    ) -> Dict[int, List[Tuple[datetime, datetime]]]:
+        return await self._call("busy_intervals", start, end, therapist_ids)
+
+    def iter_by_therapist(
+        self,
+        therapist_id: int,
+        cursor: Optional[str] = None,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+        status: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a therapist's bookings as dicts; the cursor is validated before returning.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        if isinstance(self.db, AsyncSession):
+            query = therapist_bookings_query(therapist_id, cursor, start_from, start_to, status)
+            return self._stream(query.with_only_columns(*BOOKING_COLUMNS))
+        rows = BookingRepository(self.db).iter_by_therapist(
+            therapist_id, cursor, start_from, start_to, status
+        )
+        return iterate_in_threadpool(rows)
+
+    async def _stream(self, query) -> AsyncIterator[Dict[str, Any]]:
+        result = await self.db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for row in result.mappings():
+            yield dict(row)
+
+class AsyncTherapistRepository(_AsyncRepository):
+    repository_class = TherapistRepository
+
+    async def create(self, therapist: Therapist) -> Therapist:
+        return await self._call("create", therapist)
+
+    async def get_by_id(self, therapist_id: int) -> Optional[Therapist]:
+        return await self._call("get_by_id", therapist_id)
+
+    async def exists(self, therapist_id: int) -> bool:
+        if await _cache_call(known_therapist_ids, "get", therapist_id):
+            return True
+        found = await self._call("probe", therapist_id)
+        if found:
+            await _cache_call(known_therapist_ids, "set", therapist_id, True)
+        return found
+
+    async def list_all(self) -> List[Therapist]:
+        return await self._call("list_all")
+
+    async def list_page(self, limit: int, cursor: Optional[str] = None) -> Page:
+        # Cache hits are answered on the event loop without a thread hop
+        page = therapist_directory_cache.get((limit, cursor))
+        if page is not None:
+            return page
+        return await self._call("list_page", limit, cursor)
+
+class AsyncWorkingHoursRepository(_AsyncRepository):
+    repository_class = WorkingHoursRepository
+
+    async def replace(self, therapist_id: int, hours: List[WorkingHours]) -> List[WorkingHours]:
+        return await self._call("replace", therapist_id, hours)
+
+    async def get_by_therapist(self, therapist_id: int) -> List[WorkingHours]:
+        return await self._call("get_by_therapist", therapist_id)
+
+    async def weekly_hours(
+        self,
+        therapist_ids: Optional[List[int]] = None,
+        after: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Dict[int, List[Tuple[int, time, time]]]:
+        return await self._call("weekly_hours", therapist_ids, after, limit)
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after ``ttl`` seconds.
+
+    Holds at most ``maxsize`` entries; the least recently used one is evicted
+    first when full.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+class RedisCache:
+    """
+    Cache with the TTLCache interface backed by Redis, shared across processes.
+
+    Values are stored as JSON under ``prefix``. Requires the optional redis
+    package (pip install therapist-booking-api[redis]).
+    """
+
+    def __init__(self, url: str, ttl: float = 60.0, prefix: str = "booking:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis cache backend requires the redis package") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        value = self.client.get(f"{self.prefix}{key}")
+        return default if value is None else json.loads(value)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl_ms = int((self.ttl if ttl is None else ttl) * 1000)
+        self.client.set(f"{self.prefix}{key}", json.dumps(value), px=max(ttl_ms, 1))
+
+    def delete(self, key: Hashable) -> None:
+        self.client.delete(f"{self.prefix}{key}")
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+def create_cache(backend: str, maxsize: int, ttl: float, prefix: str):
+    """
+    Build a cache for the configured backend.
+
+    Args:
+        backend: memory (in-process TTLCache) or redis (REDIS_URL)
+        maxsize: Maximum entries for the in-process backend
+        ttl: Default entry lifetime in seconds
+        prefix: Key prefix for shared backends
+
+    Returns:
+        TTLCache or RedisCache
+    """
+    if backend == "memory":
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if backend == "redis":
+        return RedisCache(os.getenv("REDIS_URL", "redis://localhost:6379/0"), ttl=ttl, prefix=prefix)
+    raise ValueError(f"Unknown cache backend {backend!r}")
@@ -1,24 +1,252 @@
-from sqlalchemy import create_engine
+import asyncio
+from datetime import timedelta
+from fastapi import Depends, Request
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Any, Dict, Optional, Union
 import os
-from dotenv import load_dotenv
+import threading
+from .pool import create_pooled_async_engine, create_pooled_engine, default_pool_profile
+from .replicas import PRIMARY_PIN_COOKIE, ReplicaRouter
+from .settings import load_environment
 
-load_dotenv()
+load_environment()
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
     "postgresql://hugofernandes@localhost:5432/therapist_booking"
 )
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# How overlapping bookings are prevented under concurrent inserts:
+#   advisory  - per-therapist transaction lock plus an index probe (default)
+#   exclusion - PostgreSQL exclusion constraint on tstzrange(start_time, end_time);
+#               unpartitioned bookings only, since a constraint cannot span
+#               partitions: migration 0002 refuses to run with it, and the
+#               engine refuses a bookings table that is already partitioned
+BOOKING_CONFLICT_STRATEGY = os.getenv("BOOKING_CONFLICT_STRATEGY", "advisory")
+
+# Longest booking accepted. Overlap probes only look this far back from a
+# range, which lets PostgreSQL skip the older partitions of bookings
+BOOKING_MAX_DURATION_HOURS = float(os.getenv("BOOKING_MAX_DURATION_HOURS", "24"))
+MAX_BOOKING_DURATION = timedelta(hours=BOOKING_MAX_DURATION_HOURS)
+
+# sync: repositories run on a worker thread with a blocking Session (default)
+# async: repositories run on the event loop through AsyncSession
+DATABASE_MODE = os.getenv("DATABASE_MODE", "sync")
+
+# How create_booking verifies the therapist:
+#   cache       - lookup through a cache of known therapist IDs (default)
+#   foreign_key - no lookup; the bookings.therapist_id foreign key rejects it
+THERAPIST_CHECK_MODE = os.getenv("THERAPIST_CHECK_MODE", "cache")
+
+# How booking events reach SQS:
+#   outbox - written to outbox_messages in the booking's transaction and
+#            relayed in batches by a background task (default)
+#   direct - sent after the response, lost if SQS is unavailable
+EVENT_PUBLISH_MODE = os.getenv("EVENT_PUBLISH_MODE", "outbox")
+
+# Connection pooling profile (server, lambda or pgbouncer), see pool.py
+DB_POOL_PROFILE = default_pool_profile()
+
+# Read replicas for the GET endpoints, comma-separated; reads use the
+# primary when none is set
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+# round_robin or least_connections, see replicas.py
+REPLICA_SELECTION = os.getenv("REPLICA_SELECTION", "round_robin")
+# Replicas lagging more than this many seconds are skipped
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "1"))
+# Seconds a client reads from the primary after one of its writes (0 disables)
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    """Swap the driver of a database URL for its asyncio counterpart."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+def enable_sqlite_foreign_keys(engine: Engine) -> None:
+    """SQLite only enforces foreign keys when asked to on every connection."""
+    if engine.dialect.name == "sqlite":
+        event.listen(
+            engine,
+            "connect",
+            lambda dbapi_connection, record: dbapi_connection.execute("PRAGMA foreign_keys=ON")
+        )
+
+# Engines are built on first use rather than at import, so a cold process
+# (a new Lambda container in particular) pays for the driver import and
+# engine setup only once a request needs the database
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> Engine:
+    """The application engine, created on the first call."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_pooled_engine(DATABASE_URL, DB_POOL_PROFILE)
+                enable_sqlite_foreign_keys(engine)
+                check_conflict_strategy(engine)
+                _engine = engine
+    return _engine
+
+def check_conflict_strategy(engine: Engine) -> None:
+    """
+    Refuse BOOKING_CONFLICT_STRATEGY=exclusion once bookings is partitioned.
+
+    The partitioned table has no exclusion constraint, and the exclusion
+    strategy skips the lock and overlap probe, so nothing would stop
+    overlapping inserts.
+
+    Raises:
+        RuntimeError: If the strategy is exclusion and bookings is partitioned
+    """
+    if BOOKING_CONFLICT_STRATEGY != "exclusion" or engine.dialect.name != "postgresql":
+        return
+    with engine.connect() as connection:
+        partitioned = connection.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('bookings'))"
+        )).scalar()
+    if partitioned:
+        raise RuntimeError(
+            "bookings is partitioned and cannot carry an exclusion constraint; "
+            "set BOOKING_CONFLICT_STRATEGY=advisory"
+        )
+
+def get_async_engine() -> AsyncEngine:
+    """
+    The asyncio engine, created on the first call.
+
+    Only async mode calls this, so sync deployments do not need asyncpg
+    installed.
+    """
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                engine = create_pooled_async_engine(
+                    os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL)),
+                    DB_POOL_PROFILE
+                )
+                enable_sqlite_foreign_keys(engine.sync_engine)
+                _async_engine = engine
+    return _async_engine
+
+def create_replica_engine(url: str) -> Engine:
+    """Engine for a read replica, with the primary's pool profile."""
+    engine = create_pooled_engine(url, DB_POOL_PROFILE)
+    enable_sqlite_foreign_keys(engine)
+    return engine
+
+def create_replica_async_engine(url: str) -> AsyncEngine:
+    """Asyncio engine for a read replica, with the primary's pool profile."""
+    return create_pooled_async_engine(to_async_url(url), DB_POOL_PROFILE)
+
+# Replica engines are created on first use as well
+replica_router: Optional[ReplicaRouter] = ReplicaRouter(
+    DATABASE_REPLICA_URLS,
+    create_replica_engine,
+    create_replica_async_engine,
+    selection=REPLICA_SELECTION,
+    max_lag=REPLICA_MAX_LAG,
+    lag_check_interval=REPLICA_LAG_CHECK_INTERVAL
+) if DATABASE_REPLICA_URLS else None
+
+def replicas_enabled() -> bool:
+    return replica_router is not None
+
+def replica_snapshot() -> Optional[Dict[str, Any]]:
+    """Read replica state, None when reads use the primary only."""
+    return replica_router.snapshot() if replica_router is not None else None
+
+class LazySession(Session):
+    """Session that binds to get_engine() unless given a bind explicitly."""
+
+    def get_bind(self, *args, **kwargs):
+        if self.bind is None:
+            self.bind = get_engine()
+        return super().get_bind(*args, **kwargs)
+
+class LazyAsyncSession(AsyncSession):
+    """AsyncSession that binds to get_async_engine() unless given a bind."""
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_async_engine(), **kwargs)
+
+SessionLocal = sessionmaker(class_=LazySession, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+AsyncSessionLocal = async_sessionmaker(class_=LazyAsyncSession, autoflush=False)
+
+DatabaseSession = Union[Session, AsyncSession]
+
 def get_db():
     """Dependency for getting database session."""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Dependency for getting an async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _reads_from_replica(request: Request) -> bool:
+    # Clients that wrote within READ_YOUR_WRITES_WINDOW stay on the primary
+    return replica_router is not None and PRIMARY_PIN_COOKIE not in request.cookies
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """
+    Dependency for a read-only database session.
+
+    The session is on a replica chosen by replica_router, or the primary
+    session from get_db when no replica is configured or within the lag
+    limit, or the client is pinned to the primary after a write.
+    """
+    replica = replica_router.select() if _reads_from_replica(request) else None
+    if replica is None:
+        yield db
+        return
+    replica_db = SessionLocal(bind=replica.engine)
+    try:
+        yield replica_db
+    finally:
+        replica_db.close()
+
+async def get_async_read_db(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Dependency for a read-only async database session, see get_read_db.
+
+    Lag checks use the replica's blocking engine on a worker thread.
+    """
+    replica = None
+    if _reads_from_replica(request):
+        if replica_router.lag_check_due():
+            await asyncio.to_thread(replica_router.refresh_lag)
+        replica = replica_router.select(refresh=False)
+    if replica is None:
+        yield db
+        return
+    async with AsyncSessionLocal(bind=replica.async_engine) as replica_db:
+        yield replica_db
+
+# Session dependencies used by the routes, selected by DATABASE_MODE
+get_session = get_async_db if DATABASE_MODE == "async" else get_db
+get_read_session = get_async_read_db if DATABASE_MODE == "async" else get_read_db
\ No newline at end of file
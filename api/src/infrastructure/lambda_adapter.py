@@ -0,0 +1,179 @@
+import asyncio
+import base64
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+# Response content types returned as text; everything else is base64 encoded
+TEXT_CONTENT_TYPES = ("text/", "application/json", "application/x-ndjson", "application/xml")
+
+class LambdaAdapter:
+    """
+    Runs an ASGI application behind API Gateway.
+
+    Accepts REST API (payload 1.0) and HTTP API (payload 2.0) proxy events.
+    One event loop is kept for the life of the container, so connection
+    pools and tasks created by the app survive between invocations. The
+    app's startup handlers run on the first invocation; Lambda gives no
+    shutdown signal, so shutdown handlers only run through close().
+    Background tasks finish before the invocation returns, since the frozen
+    container would not run them afterwards.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self._started = False
+        self._lifespan: Optional[asyncio.Task] = None
+        self._lifespan_messages: Optional[asyncio.Queue] = None
+
+    def __call__(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        if not self._started:
+            self.loop.run_until_complete(self._startup())
+            self._started = True
+        scope, body = request_scope(event)
+        status, headers, response_body = self.loop.run_until_complete(self._request(scope, body))
+        return gateway_response(event, status, headers, response_body)
+
+    async def _startup(self) -> None:
+        started = asyncio.Event()
+        messages = self._lifespan_messages = asyncio.Queue()
+        await messages.put({"type": "lifespan.startup"})
+
+        async def send(message: Dict[str, Any]) -> None:
+            if message["type"] == "lifespan.startup.failed":
+                raise RuntimeError(message.get("message", "Application startup failed"))
+            if message["type"] == "lifespan.startup.complete":
+                started.set()
+
+        # The lifespan task stays pending on receive() for the container's life
+        self._lifespan = self.loop.create_task(
+            self.app({"type": "lifespan", "asgi": {"version": "3.0"}}, messages.get, send)
+        )
+        waiter = self.loop.create_task(started.wait())
+        await asyncio.wait([self._lifespan, waiter], return_when=asyncio.FIRST_COMPLETED)
+        if not started.is_set():
+            waiter.cancel()
+            # Raises the startup failure, if any
+            self._lifespan.result()
+
+    def close(self) -> None:
+        """Run the app's shutdown handlers and close the loop (local runs and tests)."""
+        if self._lifespan is not None and not self._lifespan.done():
+            self._lifespan_messages.put_nowait({"type": "lifespan.shutdown"})
+            self.loop.run_until_complete(self._lifespan)
+        self.loop.close()
+
+    async def _request(
+        self,
+        scope: Dict[str, Any],
+        body: bytes
+    ) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        response: Dict[str, Any] = {"status": 500, "headers": [], "body": []}
+        finished = asyncio.Event()
+        request_sent = False
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished.set()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            finished.set()
+        return response["status"], response["headers"], b"".join(response["body"])
+
+def request_scope(event: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+    """
+    ASGI HTTP scope and request body of an API Gateway proxy event.
+    """
+    if event.get("version") == "2.0":
+        http = event["requestContext"]["http"]
+        method = http["method"]
+        path = event["rawPath"]
+        query_string = event.get("rawQueryString", "").encode()
+        headers = {key.lower(): value for key, value in (event.get("headers") or {}).items()}
+        if event.get("cookies"):
+            headers["cookie"] = "; ".join(event["cookies"])
+        header_items = list(headers.items())
+        client_ip = http.get("sourceIp", "")
+    else:
+        method = event["httpMethod"]
+        path = event["path"]
+        multi_query = event.get("multiValueQueryStringParameters")
+        if multi_query:
+            query_string = urlencode(
+                [(key, value) for key, values in multi_query.items() for value in values]
+            ).encode()
+        else:
+            query_string = urlencode(event.get("queryStringParameters") or {}).encode()
+        multi_headers = event.get("multiValueHeaders")
+        if multi_headers:
+            header_items = [
+                (key.lower(), value) for key, values in multi_headers.items() for value in values
+            ]
+        else:
+            header_items = [(key.lower(), value) for key, value in (event.get("headers") or {}).items()]
+        client_ip = event.get("requestContext", {}).get("identity", {}).get("sourceIp", "")
+
+    body = event.get("body") or ""
+    body = base64.b64decode(body) if event.get("isBase64Encoded") else body.encode()
+    host = dict(header_items).get("host", "lambda")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": dict(header_items).get("x-forwarded-proto", "https"),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string,
+        "root_path": "",
+        "headers": [(key.encode("latin-1"), value.encode("latin-1")) for key, value in header_items],
+        "server": (host, 443),
+        "client": (client_ip, 0),
+    }
+    return scope, body
+
+def gateway_response(
+    event: Dict[str, Any],
+    status: int,
+    headers: List[Tuple[bytes, bytes]],
+    body: bytes
+) -> Dict[str, Any]:
+    """
+    API Gateway proxy response, in the payload format of the event.
+    """
+    decoded = [(key.decode("latin-1"), value.decode("latin-1")) for key, value in headers]
+    content_type = dict(decoded).get("content-type", "")
+    is_text = content_type.startswith(TEXT_CONTENT_TYPES)
+    response: Dict[str, Any] = {
+        "statusCode": status,
+        "body": body.decode() if is_text else base64.b64encode(body).decode(),
+        "isBase64Encoded": not is_text,
+    }
+    if event.get("version") == "2.0":
+        response["cookies"] = [value for key, value in decoded if key == "set-cookie"]
+        response["headers"] = {}
+        for key, value in decoded:
+            if key != "set-cookie":
+                previous = response["headers"].get(key)
+                response["headers"][key] = value if previous is None else f"{previous},{value}"
+    else:
+        multi: Dict[str, List[str]] = {}
+        for key, value in decoded:
+            multi.setdefault(key, []).append(value)
+        response["multiValueHeaders"] = multi
+    return response
@@ -0,0 +1,176 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence
+from booking_events.metrics import MetricsRegistry
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-route latency histograms, query timing and Server-Timing headers;
+# false leaves requests and queries uninstrumented
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+db_query_duration = metrics.histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ("operation",)
+)
+db_queries_per_request = metrics.histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ("route",), COUNT_BUCKETS
+)
+sqs_request_duration = metrics.histogram(
+    "sqs_request_duration_seconds", "SQS API call latency", ("operation",)
+)
+sqs_request_failures = metrics.counter(
+    "sqs_request_failures_total", "Failed SQS API calls", ("operation",)
+)
+span_duration = metrics.histogram(
+    "span_duration_seconds", "Time spent in instrumented steps of a request", ("span",)
+)
+
+class RequestTimings:
+    """Time spent per step of the current request, for its Server-Timing header."""
+
+    __slots__ = ("queries", "durations")
+
+    def __init__(self):
+        self.queries = 0
+        self.durations: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        entries = []
+        for name, seconds in self.durations.items():
+            entry = f"{name};dur={seconds * 1000:.2f}"
+            if name == "db":
+                entry += f';desc="{self.queries} queries"'
+            entries.append(entry)
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+# Mutated in place, so worker threads (which run with a copy of the
+# request's context) add to the same object
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+def current_timings() -> Optional[RequestTimings]:
+    return _request_timings.get()
+
+def _record(name: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a step of request handling, into span_duration_seconds and Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        span_duration.observe(elapsed, name)
+        _record(name, elapsed)
+
+@contextmanager
+def sqs_call(operation: str) -> Iterator[None]:
+    """Time an SQS API call, counting it as failed if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        sqs_request_failures.inc(operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        sqs_request_duration.observe(elapsed, operation)
+        _record("sqs", elapsed)
+
+QUERY_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    operation = statement.lstrip()[:6].upper()
+    db_query_duration.observe(elapsed, operation if operation in QUERY_OPERATIONS else "OTHER")
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.add("db", elapsed)
+
+def _handle_error(context):
+    # The failed statement never reaches after_cursor_execute
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+def instrument_queries() -> None:
+    """Time every statement of every engine, including ones created later."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and query count per route.
+
+    Routes are labelled by their path template (unmatched requests share
+    one label, keeping the series bounded), and every response carries a
+    Server-Timing header with the request's database, SQS and span times.
+    """
+
+    def __init__(self, app: Any, routes: Callable[[], Sequence[Any]]):
+        self.app = app
+        self.routes = routes
+        self._templates: Optional[Dict[Any, str]] = None
+
+    def _route(self, scope: Dict[str, Any]) -> str:
+        if self._templates is None:
+            self._templates = {
+                route.endpoint: route.path for route in self.routes() if hasattr(route, "endpoint")
+            }
+        return self._templates.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = timings.server_timing(time.perf_counter() - started).encode()
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = self._route(scope)
+            http_request_duration.observe(elapsed, scope["method"], route)
+            http_requests.inc(scope["method"], route, str(status))
+            db_queries_per_request.observe(timings.queries, route)
+            _request_timings.reset(token)
+
+if METRICS_ENABLED:
+    instrument_queries()
@@ -1,25 +1,108 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Time, ForeignKey, Index, DDL, event
 from sqlalchemy.sql import func
-from .database import Base
+from .database import Base, BOOKING_CONFLICT_STRATEGY
 
 class TherapistModel(Base):
     __tablename__ = "therapists"
+    # Server-generated columns come back in the INSERT's RETURNING clause,
+    # so a created row is complete without a refresh query
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
     email = Column(String(100), unique=True, nullable=False)
     phone = Column(String(20), nullable=False)
+    # Bumped by every booking write for the therapist; see ScheduleIndex
+    schedule_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class BookingModel(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Serves the overlap probe and per-therapist listings ordered by start time
+        Index("ix_bookings_therapist_time", "therapist_id", "start_time", "end_time"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     therapist_id = Column(Integer, ForeignKey("therapists.id"), nullable=False)
     client_name = Column(String(100), nullable=False)
     client_email = Column(String(100), nullable=False)
+    client_phone = Column(String(20))
     start_time = Column(DateTime(timezone=True), nullable=False)
     end_time = Column(DateTime(timezone=True), nullable=False)
     status = Column(String(20), nullable=False, default="pending")
+    # Incremented by every status change; the booking's ETag for If-Match
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ArchivedBookingModel(Base):
+    """
+    Bookings moved out of ``bookings`` by the archival job, see partitions.py.
+
+    Only looked up by ID, so apart from the primary key it has no indexes.
+    """
+
+    __tablename__ = "bookings_archive"
+
+    id = Column(Integer, primary_key=True)
+    therapist_id = Column(Integer)
+    client_name = Column(String(100), nullable=False)
+    client_email = Column(String(100), nullable=False)
+    client_phone = Column(String(20))
+    start_time = Column(DateTime(timezone=True), nullable=False)
+    end_time = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String(20), nullable=False)
+    version = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+
+class WorkingHoursModel(Base):
+    """Weekly working hours of a therapist in UTC; weekday 0 is Monday."""
+
+    __tablename__ = "working_hours"
+    __table_args__ = (
+        Index("ix_working_hours_therapist", "therapist_id", "weekday"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    therapist_id = Column(Integer, ForeignKey("therapists.id"), nullable=False)
+    weekday = Column(Integer, nullable=False)
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+
+class OutboxMessageModel(Base):
+    """Queue message written in the same transaction as the change it announces."""
+
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        Index("ix_outbox_messages_available_at", "available_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    payload = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+def _use_exclusion_constraint(ddl, target, bind, **kw) -> bool:
+    return bind.dialect.name == "postgresql" and BOOKING_CONFLICT_STRATEGY == "exclusion"
+
+event.listen(
+    BookingModel.__table__,
+    "after_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(
+        callable_=_use_exclusion_constraint
+    ),
+)
+event.listen(
+    BookingModel.__table__,
+    "after_create",
+    DDL(
+        "ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap "
+        "EXCLUDE USING gist (therapist_id WITH =, tstzrange(start_time, end_time) WITH &&) "
+        "WHERE (status <> 'cancelled')"
+    ).execute_if(callable_=_use_exclusion_constraint),
+)
@@ -0,0 +1,161 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Sequence
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from . import models
+from .sqs import MAX_BATCH_SIZE, SQSClient, encode_bodies
+
+def enqueue(db: Session, messages: Sequence[Dict[str, Any]]) -> None:
+    """
+    Add queue messages to the outbox as part of the caller's transaction.
+
+    They become visible to the relay only if that transaction commits.
+    Events of one call may share a row, see encode_bodies.
+    """
+    rows = [{"payload": body} for body in encode_bodies(messages)]
+    if rows:
+        db.execute(insert(models.OutboxMessageModel), rows)
+
+def retry_delay(attempts: int, max_delay: float = 300.0) -> float:
+    """Jittered exponential backoff for the given number of failed attempts."""
+    return random.uniform(0, min(max_delay, 2 ** attempts))
+
+class OutboxRelay:
+    """
+    Drains the outbox into SQS with SendMessageBatch.
+
+    Delivered rows are deleted. Rows whose batch entry failed stay in the
+    outbox with a backed-off available_at, so delivery is retried until it
+    succeeds. On PostgreSQL rows are claimed with SKIP LOCKED, so several
+    relays can run side by side without sending a message twice.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        sqs_client: SQSClient,
+        limit: int = 100
+    ):
+        self.session_factory = session_factory
+        self.sqs_client = sqs_client
+        self.limit = limit
+        self._wakeup: Optional[asyncio.Event] = None
+        # Set by notify() until the next drain()
+        self._pending = False
+
+    def drain_once(self) -> int:
+        """
+        Send the messages that are due.
+
+        Returns:
+            Number of messages delivered
+        """
+        db = self.session_factory()
+        try:
+            query = (
+                select(models.OutboxMessageModel)
+                .where(models.OutboxMessageModel.available_at <= func.now())
+                .order_by(models.OutboxMessageModel.id)
+                .limit(self.limit)
+            )
+            if db.get_bind().dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True)
+            pending = db.execute(query).scalars().all()
+
+            delivered = []
+            for start in range(0, len(pending), MAX_BATCH_SIZE):
+                batch = {str(row.id): row for row in pending[start:start + MAX_BATCH_SIZE]}
+                failed = self._send(batch)
+                for entry_id, row in batch.items():
+                    if entry_id in failed:
+                        row.attempts += 1
+                        row.last_error = failed[entry_id]
+                        row.available_at = datetime.now(timezone.utc) + timedelta(
+                            seconds=retry_delay(row.attempts)
+                        )
+                    else:
+                        delivered.append(row.id)
+
+            if delivered:
+                db.execute(
+                    delete(models.OutboxMessageModel)
+                    .where(models.OutboxMessageModel.id.in_(delivered))
+                )
+            db.commit()
+            return len(delivered)
+        finally:
+            db.close()
+
+    def _send(self, batch: Dict[str, Any]) -> Dict[str, str]:
+        """Send one batch and return the error message of each failed entry."""
+        try:
+            # Payloads are sent as stored, without decoding them again
+            response = self.sqs_client.send_message_batch(
+                {entry_id: row.payload for entry_id, row in batch.items()}
+            )
+        except Exception as e:
+            print(f"Failed to relay outbox batch: {str(e)}")
+            return {entry_id: str(e) for entry_id in batch}
+        return {
+            failure["Id"]: failure.get("Message", failure.get("Code", "failed"))
+            for failure in response.get("Failed", [])
+        }
+
+    def drain(self) -> int:
+        """
+        Send every message that is due, in rounds of ``limit``.
+
+        Returns:
+            Number of messages delivered
+        """
+        self._pending = False
+        delivered = 0
+        while True:
+            sent = self.drain_once()
+            delivered += sent
+            if sent < self.limit:
+                return delivered
+
+    @property
+    def pending(self) -> bool:
+        """Whether messages were added since the last drain()."""
+        return self._pending
+
+    def notify(self) -> None:
+        """Wake the running relay loop so new messages go out immediately."""
+        self._pending = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self, interval: float) -> None:
+        """
+        Drain the outbox forever, every ``interval`` seconds or when notified.
+        """
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                if await run_in_threadpool(self.drain_once) >= self.limit:
+                    continue
+            except Exception as e:
+                print(f"Outbox relay error: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, int]:
+    """
+    AWS Lambda entry point for a scheduled drain.
+
+    The API function sends the messages of each write before its invocation
+    returns; this picks up the ones whose sending failed and was backed off,
+    or whose container was reclaimed before it could send them.
+    """
+    from .database import SessionLocal
+    delivered = OutboxRelay(SessionLocal, SQSClient()).drain()
+    print(f"Outbox relay: {delivered} messages delivered")
+    return {"delivered": delivered}
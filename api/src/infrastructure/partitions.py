@@ -0,0 +1,270 @@
+import argparse
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from . import models
+
+# On PostgreSQL, bookings and bookings_archive are range partitioned on
+# start_time, one partition per calendar month (UTC) named
+# <table>_yYYYYmMM, plus a DEFAULT partition for rows outside them; see
+# migrations/versions/0008_partition_bookings.py.
+#
+# maintain() keeps partitions created BOOKING_PARTITIONS_AHEAD months ahead
+# and archives months that ended BOOKING_RETENTION_MONTHS ago: their
+# partitions are detached from bookings, stripped of secondary indexes,
+# rewritten with VACUUM FULL (and moved to ARCHIVE_TABLESPACE when set), and
+# attached to bookings_archive, without copying rows. Unpartitioned tables
+# (SQLite, or PostgreSQL before the migration) have the rows copied instead.
+
+# Months after the current one that get a partition ahead of time
+BOOKING_PARTITIONS_AHEAD = int(os.getenv("BOOKING_PARTITIONS_AHEAD", "12"))
+# Bookings starting before the month this many months back are archived
+BOOKING_RETENTION_MONTHS = int(os.getenv("BOOKING_RETENTION_MONTHS", "12"))
+# Tablespace for archived partitions, e.g. on cheaper storage; empty keeps them in place
+ARCHIVE_TABLESPACE = os.getenv("ARCHIVE_TABLESPACE", "")
+
+BOOKINGS = "bookings"
+ARCHIVE = "bookings_archive"
+
+_PARTITION_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+def month_start(moment: datetime) -> datetime:
+    """First instant (UTC) of the month containing moment; naive values are taken as UTC."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+def default_partition(table: str) -> str:
+    return f"{table}_default"
+
+def _bound(moment: datetime) -> str:
+    # Partition bounds are part of the DDL and cannot be bound parameters
+    return f"'{moment.strftime('%Y-%m-%d %H:%M:%S')}+00'"
+
+def _partition_month(table: str, name: str) -> Optional[datetime]:
+    """Month of a monthly partition of table, None for other names."""
+    match = _PARTITION_NAME.search(name)
+    if match is None:
+        return None
+    month = datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)
+    return month if name == partition_name(table, month) else None
+
+def is_partitioned(connection: Connection, table: str = BOOKINGS) -> bool:
+    """Whether table is a partitioned PostgreSQL table."""
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(connection.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table}
+    ).scalar())
+
+def monthly_partitions(connection: Connection, table: str) -> Dict[datetime, str]:
+    """Month -> name of the monthly partitions attached to table."""
+    names = connection.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": table}
+    ).scalars()
+    months = {name: _partition_month(table, name) for name in names}
+    return {month: name for name, month in months.items() if month is not None}
+
+def _has_default_partition(connection: Connection, table: str) -> bool:
+    return connection.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": default_partition(table)}
+    ).scalar()
+
+def attach_partition(connection: Connection, table: str, name: str, month: datetime) -> None:
+    """
+    Attach the existing table name to table as the partition of month.
+
+    Rows of that month waiting in the DEFAULT partition are moved into it
+    first, since PostgreSQL refuses the new bounds while they are there.
+    """
+    lower, upper = month, add_months(month, 1)
+    if _has_default_partition(connection, table):
+        connection.execute(text(
+            f"WITH moved AS (DELETE FROM {default_partition(table)} "
+            f"WHERE start_time >= {_bound(lower)} AND start_time < {_bound(upper)} RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ))
+    connection.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({_bound(lower)}) TO ({_bound(upper)})"
+    ))
+
+def partition_of(table: str, month: datetime) -> str:
+    """DDL creating the partition of table for month while no DEFAULT partition holds its rows."""
+    return (
+        f"CREATE TABLE {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+    )
+
+def create_partition(connection: Connection, month: datetime, table: str = BOOKINGS) -> str:
+    """
+    Create the partition of table for month.
+
+    Returns:
+        The partition's name
+    """
+    name = partition_name(table, month)
+    # LIKE keeps the parent's column order, so the DEFAULT partition's rows
+    # can be moved with SELECT *; ATTACH adds the indexes and foreign keys
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    attach_partition(connection, table, name, month)
+    return name
+
+def ensure_partitions(
+    connection: Connection,
+    now: Optional[datetime] = None,
+    ahead: int = BOOKING_PARTITIONS_AHEAD
+) -> List[str]:
+    """
+    Create the missing partitions of bookings from the current month to
+    ahead months later.
+
+    Returns:
+        Names of the partitions created
+    """
+    current = month_start(now or datetime.now(timezone.utc))
+    existing = monthly_partitions(connection, BOOKINGS)
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            created.append(create_partition(connection, month))
+    return created
+
+def _detached_partitions(connection: Connection) -> Dict[datetime, str]:
+    """Monthly bookings partitions a failed archival run left attached to no table."""
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_class c "
+        "WHERE c.relkind = 'r' AND c.relname LIKE 'bookings\\_y%' "
+        "AND c.relnamespace = current_schema()::regnamespace "
+        "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)"
+    )).scalars()
+    months = {name: _partition_month(BOOKINGS, name) for name in names}
+    return {month: name for name, month in months.items() if month is not None}
+
+def _archive_partition(engine: Engine, month: datetime, name: str, attached: bool) -> str:
+    """Move one month's partition from bookings to bookings_archive."""
+    with engine.begin() as connection:
+        if attached:
+            connection.execute(text(f"ALTER TABLE {BOOKINGS} DETACH PARTITION {name}"))
+        # Archived bookings are only looked up by ID, through the primary key
+        indexes = connection.execute(
+            text(
+                "SELECT i.indexrelid::regclass::text FROM pg_index i "
+                "WHERE i.indrelid = to_regclass(:name) AND NOT i.indisprimary"
+            ),
+            {"name": name}
+        ).scalars().all()
+        for index in indexes:
+            connection.execute(text(f"DROP INDEX {index}"))
+    # VACUUM cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(f"VACUUM (FULL, ANALYZE) {name}"))
+    archived = partition_name(ARCHIVE, month)
+    with engine.begin() as connection:
+        if ARCHIVE_TABLESPACE:
+            connection.execute(text(f"ALTER TABLE {name} SET TABLESPACE {ARCHIVE_TABLESPACE}"))
+        connection.execute(text(f"ALTER TABLE {name} RENAME TO {archived}"))
+        attach_partition(connection, ARCHIVE, archived, month)
+    return archived
+
+def _archive_rows(connection: Connection, cutoff: datetime) -> int:
+    """Copy bookings starting before cutoff to bookings_archive and delete them."""
+    bookings = models.BookingModel.__table__
+    archive = models.ArchivedBookingModel.__table__
+    columns = [column.name for column in archive.columns]
+    connection.execute(insert(archive).from_select(
+        columns,
+        select(*[bookings.c[column] for column in columns]).where(bookings.c.start_time < cutoff)
+    ))
+    return connection.execute(delete(bookings).where(bookings.c.start_time < cutoff)).rowcount
+
+def archive_bookings(
+    engine: Engine,
+    now: Optional[datetime] = None,
+    retention_months: int = BOOKING_RETENTION_MONTHS
+) -> Dict[str, Any]:
+    """
+    Move bookings starting before the month retention_months back into
+    bookings_archive.
+
+    Returns:
+        The cutoff, names of the archived partitions and the number of rows
+        moved one by one (from unpartitioned tables or DEFAULT partitions)
+    """
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -retention_months)
+    with engine.connect() as connection:
+        partitioned = is_partitioned(connection)
+        if partitioned:
+            attached = monthly_partitions(connection, BOOKINGS)
+            detached = _detached_partitions(connection)
+
+    archived = []
+    if partitioned:
+        due = [(month, name, True) for month, name in attached.items()]
+        due += [(month, name, False) for month, name in detached.items()]
+        for month, name, is_attached in sorted(due):
+            if add_months(month, 1) <= cutoff:
+                archived.append(_archive_partition(engine, month, name, is_attached))
+    # Old rows outside the monthly partitions sit in the DEFAULT partition
+    # and land in the archive's
+    with engine.begin() as connection:
+        rows = _archive_rows(connection, cutoff)
+    return {"cutoff": cutoff.isoformat(), "partitions": archived, "rows": rows}
+
+def maintain(
+    engine: Engine,
+    now: Optional[datetime] = None,
+    ahead: int = BOOKING_PARTITIONS_AHEAD,
+    retention_months: int = BOOKING_RETENTION_MONTHS
+) -> Dict[str, Any]:
+    """
+    Create upcoming partitions of bookings and archive past ones.
+
+    Meant to run daily; see lambda_handler and main.
+
+    Returns:
+        Names of the partitions created, and the archive_bookings() summary
+    """
+    with engine.begin() as connection:
+        created = ensure_partitions(connection, now, ahead) if is_partitioned(connection) else []
+    return {"created": created, "archived": archive_bookings(engine, now, retention_months)}
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """AWS Lambda entry point for a scheduled maintain() run."""
+    from .database import get_engine
+    summary = maintain(get_engine())
+    print(f"Partition maintenance: {summary}")
+    return summary
+
+def main():
+    from .database import get_engine
+    parser = argparse.ArgumentParser(description="Create upcoming bookings partitions and archive past ones")
+    parser.add_argument("--ahead", type=int, default=BOOKING_PARTITIONS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=BOOKING_RETENTION_MONTHS)
+    args = parser.parse_args()
+
+    summary = maintain(get_engine(), ahead=args.ahead, retention_months=args.retention_months)
+    archived = summary["archived"]
+    print(f"Created partitions: {', '.join(summary['created']) or 'none'}")
+    print(
+        f"Archived bookings before {archived['cutoff']}: "
+        f"partitions {', '.join(archived['partitions']) or 'none'}, {archived['rows']} rows"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from typing import Any, Dict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from .settings import running_in_lambda
+
+# Named pooling profiles:
+#   server    - QueuePool tuned by DB_POOL_* for long-running uvicorn workers
+#   lambda    - NullPool, so idle containers hold no connections
+#   pgbouncer - NullPool in front of an external PgBouncer (transaction mode)
+POOL_PROFILES = ("server", "lambda", "pgbouncer")
+
+def default_pool_profile() -> str:
+    """Pool profile from DB_POOL_PROFILE, defaulting to lambda inside Lambda."""
+    if running_in_lambda():
+        return os.getenv("DB_POOL_PROFILE", "lambda")
+    return os.getenv("DB_POOL_PROFILE", "server")
+
+class PoolMetrics:
+    """Thread-safe counters for connection checkouts and open connections."""
+
+    WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.checkout_timeouts = 0
+            self.connections_opened = 0
+            self.connections_closed = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+            self.wait_buckets = [0] * (len(self.WAIT_BUCKETS) + 1)
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            for i, bound in enumerate(self.WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def record(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current counters.
+
+        Returns:
+            Dict with checkout/connection counts, connections currently open
+            and checked out, and the checkout wait distribution in seconds
+        """
+        with self._lock:
+            buckets = {f"le_{bound}": count for bound, count in zip(self.WAIT_BUCKETS, self.wait_buckets)}
+            buckets["le_inf"] = self.wait_buckets[-1]
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "checked_out": self.checkouts - self.checkins,
+                "checkout_timeouts": self.checkout_timeouts,
+                "connections_opened": self.connections_opened,
+                "connections_closed": self.connections_closed,
+                "connections_open": self.connections_opened - self.connections_closed,
+                "checkout_wait_seconds_total": self.wait_seconds_total,
+                "checkout_wait_seconds_max": self.wait_seconds_max,
+                "checkout_wait_buckets": buckets,
+            }
+
+pool_metrics = PoolMetrics()
+
+class _CheckoutTimingMixin:
+    """Records how long callers wait to get a connection from the pool."""
+
+    def connect(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - started, timed_out)
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+class InstrumentedNullPool(_CheckoutTimingMixin, NullPool):
+    pass
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+def engine_options(profile: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Keyword arguments for create_engine / create_async_engine.
+
+    Args:
+        profile: One of POOL_PROFILES
+        is_async: Whether the options are for an asyncio engine
+
+    Returns:
+        Dict of engine keyword arguments
+    """
+    if profile == "server":
+        return {
+            "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", "true"),
+        }
+    if profile == "lambda":
+        return {"poolclass": InstrumentedNullPool}
+    if profile == "pgbouncer":
+        options: Dict[str, Any] = {"poolclass": InstrumentedNullPool}
+        if is_async:
+            # Server-side prepared statements do not survive PgBouncer's
+            # transaction pooling, so asyncpg's statement cache is disabled
+            options["connect_args"] = {"statement_cache_size": 0}
+        return options
+    raise ValueError(f"Unknown pool profile {profile!r}, expected one of {POOL_PROFILES}")
+
+def _instrument(engine: Engine) -> None:
+    event.listen(engine, "connect", lambda *args: pool_metrics.record("connections_opened"))
+    event.listen(engine, "close", lambda *args: pool_metrics.record("connections_closed"))
+    event.listen(engine, "checkout", lambda *args: pool_metrics.record("checkouts"))
+    event.listen(engine, "checkin", lambda *args: pool_metrics.record("checkins"))
+
+def create_pooled_engine(url: str, profile: str) -> Engine:
+    """Create an instrumented engine using the given pool profile."""
+    engine = create_engine(url, **engine_options(profile))
+    _instrument(engine)
+    return engine
+
+def create_pooled_async_engine(url: str, profile: str) -> AsyncEngine:
+    """Create an instrumented asyncio engine using the given pool profile."""
+    if profile == "pgbouncer" and make_url(url).get_backend_name() == "postgresql":
+        url = make_url(url).update_query_dict(
+            {"prepared_statement_cache_size": "0"}
+        ).render_as_string(hide_password=False)
+    engine = create_async_engine(url, **engine_options(profile, is_async=True))
+    _instrument(engine.sync_engine)
+    return engine
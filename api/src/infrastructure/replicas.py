@@ -0,0 +1,217 @@
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Replica selection policies:
+#   round_robin       - rotate through the replicas within the lag limit
+#   least_connections - the replica with the fewest connections checked out
+REPLICA_SELECTIONS = ("round_robin", "least_connections")
+
+# Cookie set on write responses; while present, reads go to the primary
+PRIMARY_PIN_COOKIE = "read_primary"
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# Zero when the standby has replayed everything it received, so an idle
+# primary does not look like lag; NULL (unknown) on a primary
+_POSTGRES_LAG = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+def replica_lag(connection: Connection) -> float:
+    """
+    Replication lag of a replica in seconds.
+
+    Only PostgreSQL standbys report lag; other backends (SQLite files used
+    as stand-ins) are taken as current.
+    """
+    if connection.dialect.name == "postgresql":
+        return float(connection.execute(_POSTGRES_LAG).scalar() or 0)
+    return 0.0
+
+class Replica:
+    """A read replica: its engines, created on first use, and its state."""
+
+    def __init__(
+        self,
+        url: str,
+        engine_factory: Callable[[str], Engine],
+        async_engine_factory: Optional[Callable[[str], AsyncEngine]] = None
+    ):
+        self.url = url
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self._engine_factory = engine_factory
+        self._async_engine_factory = async_engine_factory
+        self._engine: Optional[Engine] = None
+        self._async_engine: Optional[AsyncEngine] = None
+        self._lock = threading.Lock()
+        self.in_use = 0
+        # None until the first lag check, and while the replica is unreachable
+        self.lag: Optional[float] = None
+        self.selected = 0
+
+    def _track(self, engine: Engine) -> None:
+        event.listen(engine, "checkout", lambda *args: self._count(1))
+        event.listen(engine, "checkin", lambda *args: self._count(-1))
+
+    def _count(self, delta: int) -> None:
+        with self._lock:
+            self.in_use += delta
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    engine = self._engine_factory(self.url)
+                    self._track(engine)
+                    self._engine = engine
+        return self._engine
+
+    @property
+    def async_engine(self) -> AsyncEngine:
+        if self._async_engine is None:
+            if self._async_engine_factory is None:
+                raise RuntimeError(f"No async engine factory for replica {self.name}")
+            with self._lock:
+                if self._async_engine is None:
+                    engine = self._async_engine_factory(self.url)
+                    self._track(engine.sync_engine)
+                    self._async_engine = engine
+        return self._async_engine
+
+class ReplicaRouter:
+    """
+    Picks the read replica for a read-only request.
+
+    Replicas whose last measured lag exceeds ``max_lag`` seconds, or that
+    could not be reached, are skipped; with none left the caller falls
+    back to the primary. Lag is measured at most every
+    ``lag_check_interval`` seconds, by one caller while the others keep
+    using the previous measurement.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        engine_factory: Callable[[str], Engine],
+        async_engine_factory: Optional[Callable[[str], AsyncEngine]] = None,
+        selection: str = "round_robin",
+        max_lag: float = 5.0,
+        lag_check_interval: float = 1.0,
+        lag_probe: Callable[[Connection], float] = replica_lag
+    ):
+        if selection not in REPLICA_SELECTIONS:
+            raise ValueError(f"Unknown replica selection {selection!r}, expected one of {REPLICA_SELECTIONS}")
+        self.replicas = [Replica(url, engine_factory, async_engine_factory) for url in urls]
+        self.selection = selection
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.lag_probe = lag_probe
+        self._turn = itertools.count()
+        self._checked_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+        self.primary_fallbacks = 0
+
+    def lag_check_due(self) -> bool:
+        checked_at = self._checked_at
+        return checked_at is None or time.monotonic() - checked_at >= self.lag_check_interval
+
+    def refresh_lag(self) -> None:
+        """Measure the lag of every replica, unless another caller already is."""
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            for replica in self.replicas:
+                try:
+                    with replica.engine.connect() as connection:
+                        replica.lag = self.lag_probe(connection)
+                except Exception as e:
+                    replica.lag = None
+                    print(f"Replica {replica.name} unavailable: {str(e)}")
+            self._checked_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def select(self, refresh: bool = True) -> Optional[Replica]:
+        """
+        Replica to serve a read from.
+
+        Args:
+            refresh: Measure lag first when a check is due; async callers
+                pass False and run refresh_lag() on a worker thread
+
+        Returns:
+            The replica, or None when no replica is within the lag limit
+        """
+        if refresh and self.lag_check_due():
+            self.refresh_lag()
+        candidates = [
+            replica for replica in self.replicas
+            if replica.lag is not None and replica.lag <= self.max_lag
+        ]
+        if not candidates:
+            self.primary_fallbacks += 1
+            return None
+        # Rotating the starting point also spreads ties under least_connections
+        turn = next(self._turn)
+        candidates = candidates[turn % len(candidates):] + candidates[:turn % len(candidates)]
+        if self.selection == "least_connections":
+            replica = min(candidates, key=lambda candidate: candidate.in_use)
+        else:
+            replica = candidates[0]
+        replica.selected += 1
+        return replica
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Selection policy, primary fallbacks and the state of each replica."""
+        replicas: List[Dict[str, Any]] = [
+            {"url": replica.name, "lag": replica.lag, "in_use": replica.in_use, "selected": replica.selected}
+            for replica in self.replicas
+        ]
+        return {
+            "selection": self.selection,
+            "max_lag": self.max_lag,
+            "primary_fallbacks": self.primary_fallbacks,
+            "replicas": replicas,
+        }
+
+class PrimaryPinMiddleware:
+    """
+    ASGI middleware for read-your-writes.
+
+    A successful write response sets a cookie that expires after
+    ``window`` seconds; read dependencies send requests carrying it to the
+    primary, so a client sees its own write even while replicas lag.
+    """
+
+    def __init__(self, app: Any, window: float, enabled: Callable[[], bool]):
+        self.app = app
+        self.window = int(window)
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in WRITE_METHODS
+            or self.window <= 0
+            or not self.enabled()
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        cookie = f"{PRIMARY_PIN_COOKIE}=1; Max-Age={self.window}; Path=/; HttpOnly; SameSite=Lax".encode()
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie)]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
@@ -1,38 +1,778 @@
-from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import List, Optional
-from . import models
-from ..core.models import Booking, BookingCreate, Therapist
+import os
+from collections import defaultdict
+from sqlalchemy import Select, and_, delete, event, insert, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from datetime import datetime, time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from . import models, outbox
+from .cache import TTLCache, create_cache
+from .database import (
+    BOOKING_CONFLICT_STRATEGY,
+    BOOKING_MAX_DURATION_HOURS,
+    EVENT_PUBLISH_MODE,
+    MAX_BOOKING_DURATION,
+)
+from .metrics import span
+from .schedule_index import ScheduleIndex
+from ..core.events import booking_event
+from ..core.exceptions import (
+    BookingConflictError,
+    BookingNotFoundError,
+    BookingVersionMismatchError,
+    InvalidStatusTransitionError,
+    TherapistNotFoundError,
+)
+from ..core.intervals import IntervalSet, as_utc_naive
+from ..core.models import Booking, BookingBatchItemResult, BookingCreate, Therapist, WorkingHours
+from ..core.pagination import Page, decode_cursor, encode_cursor, page_etag
+from ..core.serialization import booking_list, dumps, therapist_list, working_hours_list
+
+# Namespace for pg_advisory_xact_lock(namespace, therapist_id) so booking locks
+# cannot collide with advisory locks taken by other code
+BOOKING_LOCK_NAMESPACE = 1001
+
+# Statuses a booking may move to, and the statuses it may move from
+STATUS_TRANSITIONS = {
+    "confirmed": ("pending",),
+    "cancelled": ("pending", "confirmed"),
+}
+
+# Rows fetched per round trip when streaming from a server-side cursor
+STREAM_BATCH_SIZE = 500
+
+# Read-through cache of therapist directory pages, keyed by (limit, cursor).
+# Cleared by TherapistRepository.create; other processes see new therapists
+# once their entries expire.
+therapist_directory_cache = TTLCache(
+    maxsize=int(os.getenv("THERAPIST_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("THERAPIST_CACHE_TTL", "30"))
+)
+
+# IDs of therapists known to exist. Therapists are never deleted, so only
+# positive lookups are cached and entries can live long. The memory backend
+# is per process; THERAPIST_ID_CACHE_BACKEND=redis shares it across processes.
+known_therapist_ids = create_cache(
+    os.getenv("THERAPIST_ID_CACHE_BACKEND", "memory"),
+    maxsize=int(os.getenv("THERAPIST_ID_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("THERAPIST_ID_CACHE_TTL", "3600")),
+    prefix="therapist-id:"
+)
+
+# In-process index of therapists' bookings (SCHEDULE_INDEX=true). Booking
+# writes check overlaps against it after confirming its version; availability
+# reads accept entries confirmed up to SCHEDULE_INDEX_MAX_STALENESS seconds ago.
+# Versions are only bumped while it is enabled, so set it fleet-wide: writes
+# of a process without the index would go unnoticed by those with it.
+SCHEDULE_INDEX_ENABLED = os.getenv("SCHEDULE_INDEX", "false") == "true"
+schedule_index = ScheduleIndex(
+    maxsize=int(os.getenv("SCHEDULE_INDEX_SIZE", "1000")),
+    max_staleness=float(os.getenv("SCHEDULE_INDEX_MAX_STALENESS", "0"))
+)
+
+def response_columns(model, schema) -> list:
+    """Columns of a table matching the fields of a response model, in field order."""
+    return [model.__table__.c[name] for name in schema.model_fields]
+
+BOOKING_COLUMNS = response_columns(models.BookingModel, Booking)
+THERAPIST_COLUMNS = response_columns(models.TherapistModel, Therapist)
+
+def _is_exclusion_violation(error: IntegrityError) -> bool:
+    return getattr(error.orig, "pgcode", None) == "23P01"
+
+def _is_foreign_key_violation(error: IntegrityError) -> bool:
+    return (
+        getattr(error.orig, "pgcode", None) == "23503"
+        or "FOREIGN KEY constraint failed" in str(error.orig)
+    )
+
+def therapist_bookings_query(
+    therapist_id: int,
+    cursor: Optional[str] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    status: Optional[str] = None
+) -> Select:
+    """
+    Bookings of a therapist in (start_time, id) order, resuming after a cursor.
+
+    Args:
+        therapist_id: ID of the therapist
+        cursor: Cursor of the last booking already returned
+        start_from: Only bookings starting at or after this time
+        start_to: Only bookings starting before this time
+        status: Only bookings with this status
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    booking = models.BookingModel
+    query = select(booking).where(booking.therapist_id == therapist_id)
+    if start_from is not None:
+        query = query.where(booking.start_time >= start_from)
+    if start_to is not None:
+        query = query.where(booking.start_time < start_to)
+    if status is not None:
+        query = query.where(booking.status == status)
+    if cursor is not None:
+        try:
+            last_start, last_id = decode_cursor(cursor)
+            last_start = datetime.fromisoformat(last_start)
+            last_id = int(last_id)
+        except (TypeError, ValueError) as e:
+            raise ValueError("Invalid cursor") from e
+        # The plain start_time bound keeps the seek on ix_bookings_therapist_time
+        query = query.where(
+            booking.start_time >= last_start,
+            or_(booking.start_time > last_start, booking.id > last_id)
+        )
+    return query.order_by(booking.start_time, booking.id)
+
+# Session.info key of the open UnitOfWork
+UNIT_OF_WORK = "unit_of_work"
+
+class UnitOfWork:
+    """
+    Groups the writes of several repository calls into one transaction.
+
+    Inside ``with UnitOfWork(db):`` repository methods flush instead of
+    committing, and their post-commit steps (schedule index and cache
+    updates) wait for the single commit when the block exits. An exception
+    rolls the whole unit back, as does a failed step: a repository method
+    that rolls back makes the unit fail even if its error was caught.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._after_commit: List[Callable[[], None]] = []
+        self._rolled_back = False
+
+    def _on_rollback(self, session) -> None:
+        self._rolled_back = True
+
+    def __enter__(self) -> "UnitOfWork":
+        if UNIT_OF_WORK in self.db.info:
+            raise RuntimeError("A unit of work is already open on this session")
+        self.db.info[UNIT_OF_WORK] = self
+        event.listen(self.db, "after_rollback", self._on_rollback)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        del self.db.info[UNIT_OF_WORK]
+        event.remove(self.db, "after_rollback", self._on_rollback)
+        if exc_type is not None:
+            self.db.rollback()
+            return
+        if self._rolled_back:
+            self.db.rollback()
+            raise RuntimeError("A step of the unit of work failed and rolled it back")
+        self.db.commit()
+        for callback in self._after_commit:
+            callback()
+
+def _commit(db: Session) -> None:
+    """Commit, or only flush while a UnitOfWork is open on the session."""
+    if UNIT_OF_WORK in db.info:
+        db.flush()
+    else:
+        db.commit()
+
+def _end_unchanged(db: Session) -> None:
+    """End a transaction that changed nothing, unless a UnitOfWork owns it."""
+    if UNIT_OF_WORK not in db.info:
+        db.rollback()
+
+def _after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """Run callback once the session's changes are committed."""
+    unit = db.info.get(UNIT_OF_WORK)
+    if unit is None:
+        callback()
+    else:
+        unit._after_commit.append(callback)
 
 class BookingRepository:
     def __init__(self, db: Session):
         self.db = db
 
     def create(self, booking: BookingCreate) -> Booking:
+        """
+        Insert a booking, rejecting it if it overlaps an active booking.
+
+        Raises:
+            BookingConflictError: If the therapist is already booked in that range
+            TherapistNotFoundError: If the therapist does not exist
+        """
+        if not self._enforced_by_constraint():
+            self._lock_therapist_schedule(booking.therapist_id)
+            conflict_id = self._conflict_id(
+                booking.therapist_id, booking.start_time, booking.end_time
+            )
+            if conflict_id is not None:
+                self.db.rollback()
+                raise BookingConflictError(conflict_id)
+
         db_booking = models.BookingModel(
             therapist_id=booking.therapist_id,
             client_name=booking.client_name,
             client_email=booking.client_email,
+            client_phone=booking.client_phone,
             start_time=booking.start_time,
             end_time=booking.end_time,
             status="pending"
         )
         self.db.add(db_booking)
-        self.db.commit()
-        self.db.refresh(db_booking)
-        return Booking.from_orm(db_booking)
+        with span("commit"):
+            try:
+                # The INSERT returns the generated columns (eager_defaults)
+                self.db.flush()
+                versions = self._bump_schedule_versions([booking.therapist_id])
+                if EVENT_PUBLISH_MODE == "outbox":
+                    outbox.enqueue(self.db, [booking_event(db_booking, "booking_created")])
+                # Read before the commit expires the instance, which would
+                # cost a reload
+                with span("from_orm"):
+                    created = Booking.from_orm(db_booking)
+                _commit(self.db)
+            except IntegrityError as e:
+                self.db.rollback()
+                if _is_exclusion_violation(e):
+                    raise BookingConflictError() from e
+                if _is_foreign_key_violation(e):
+                    raise TherapistNotFoundError(booking.therapist_id) from e
+                raise
+        if versions:
+            _after_commit(self.db, lambda: schedule_index.added(
+                created.therapist_id,
+                versions[created.therapist_id],
+                [(created.start_time, created.end_time, created.id)]
+            ))
+        return created
+
+    def create_many(
+        self,
+        bookings: List[BookingCreate],
+        all_or_nothing: bool = True
+    ) -> List[BookingBatchItemResult]:
+        """
+        Validate and insert a batch of bookings in one transaction.
+
+        Therapists are checked with a single query and overlaps set-wise,
+        against one query of the therapists' existing bookings in the batch's
+        time range and against earlier items of the batch. Accepted bookings
+        and their events are bulk-inserted with RETURNING.
+
+        Args:
+            bookings: Bookings to create, in priority order
+            all_or_nothing: Insert nothing if any item is rejected
+
+        Returns:
+            One result per item, in input order
+
+        Raises:
+            BookingConflictError: If the database rejects an overlap that
+                appeared concurrently (exclusion strategy only)
+        """
+        errors: Dict[int, str] = {}
+        for index, booking in enumerate(bookings):
+            if not booking.validate_times():
+                errors[index] = "End time must be after start time"
+            elif booking.end_time - booking.start_time > MAX_BOOKING_DURATION:
+                errors[index] = f"Bookings cannot be longer than {BOOKING_MAX_DURATION_HOURS:g} hours"
+
+        therapist_ids = sorted({booking.therapist_id for booking in bookings})
+        found = set(self.db.execute(
+            select(models.TherapistModel.id).where(models.TherapistModel.id.in_(therapist_ids))
+        ).scalars())
+        for therapist_id in found:
+            known_therapist_ids.set(therapist_id, True)
+        for index, booking in enumerate(bookings):
+            if index not in errors and booking.therapist_id not in found:
+                errors[index] = "Therapist not found"
+
+        candidates = defaultdict(list)
+        for index, booking in enumerate(bookings):
+            if index not in errors:
+                candidates[booking.therapist_id].append(index)
+
+        if not self._enforced_by_constraint():
+            # Sorted lock order keeps concurrent batches from deadlocking
+            for therapist_id in sorted(candidates):
+                self._lock_therapist_schedule(therapist_id)
+        schedules = self._schedules(bookings, candidates)
+        for therapist_id, indexes in candidates.items():
+            schedule = schedules[therapist_id]
+            for index in indexes:
+                booking = bookings[index]
+                conflict = schedule.overlapping(booking.start_time, booking.end_time)
+                if conflict is not None:
+                    errors[index] = f"Booking conflicts with an existing booking ({conflict[2]})"
+                else:
+                    schedule.add(booking.start_time, booking.end_time, f"item {index}")
+
+        accepted = [index for index in range(len(bookings)) if index not in errors]
+        if all_or_nothing and errors:
+            accepted = []
+        created: Dict[int, Booking] = {}
+        if accepted:
+            rows = [
+                dict(bookings[index].model_dump(), status="pending")
+                for index in accepted
+            ]
+            try:
+                db_bookings = self.db.scalars(
+                    insert(models.BookingModel).returning(
+                        models.BookingModel, sort_by_parameter_order=True
+                    ),
+                    rows
+                ).all()
+                versions = self._bump_schedule_versions(
+                    {db_booking.therapist_id for db_booking in db_bookings}
+                )
+                if EVENT_PUBLISH_MODE == "outbox":
+                    outbox.enqueue(
+                        self.db,
+                        [booking_event(db_booking, "booking_created") for db_booking in db_bookings]
+                    )
+                # Read before the commit expires the instances, which would
+                # cost a reload per booking
+                created = dict(zip(accepted, booking_list.validate_python(db_bookings, from_attributes=True)))
+                _commit(self.db)
+            except IntegrityError as e:
+                self.db.rollback()
+                if _is_exclusion_violation(e):
+                    raise BookingConflictError() from e
+                raise
+            added = defaultdict(list)
+            for item in created.values():
+                added[item.therapist_id].append((item.start_time, item.end_time, item.id))
+
+            def update_index():
+                for therapist_id, version in versions.items():
+                    schedule_index.added(therapist_id, version, added[therapist_id])
+
+            _after_commit(self.db, update_index)
+        else:
+            _end_unchanged(self.db)
+
+        results = []
+        for index in range(len(bookings)):
+            if index in created:
+                results.append(BookingBatchItemResult(
+                    index=index, status="created", booking=created[index]
+                ))
+            elif index in errors:
+                results.append(BookingBatchItemResult(
+                    index=index, status="rejected", error=errors[index]
+                ))
+            else:
+                results.append(BookingBatchItemResult(
+                    index=index, status="skipped", error="Batch rejected"
+                ))
+        return results
+
+    def _schedules(
+        self,
+        bookings: List[BookingCreate],
+        candidates: Dict[int, List[int]]
+    ) -> Dict[int, IntervalSet]:
+        """
+        Active bookings of each candidate therapist within the batch's range,
+        fetched with one query.
+        """
+        if not candidates:
+            return {}
+        if SCHEDULE_INDEX_ENABLED:
+            # Copies, since the caller adds the batch's items to them
+            return {
+                therapist_id: IntervalSet(schedule_index.between(
+                    self.db,
+                    therapist_id,
+                    min(bookings[i].start_time for i in indexes),
+                    max(bookings[i].end_time for i in indexes),
+                    max_staleness=0
+                ))
+                for therapist_id, indexes in candidates.items()
+            }
+        windows = []
+        for therapist_id, indexes in candidates.items():
+            earliest = min(as_utc_naive(bookings[i].start_time) for i in indexes)
+            windows.append(and_(
+                models.BookingModel.therapist_id == therapist_id,
+                # No booking is longer, and the bound lets PostgreSQL prune partitions
+                models.BookingModel.start_time > earliest - MAX_BOOKING_DURATION,
+                models.BookingModel.start_time < max(as_utc_naive(bookings[i].end_time) for i in indexes),
+                models.BookingModel.end_time > earliest,
+            ))
+        existing = self.db.execute(
+            select(
+                models.BookingModel.therapist_id,
+                models.BookingModel.start_time,
+                models.BookingModel.end_time,
+                models.BookingModel.id,
+            ).where(models.BookingModel.status != "cancelled", or_(*windows))
+        ).all()
+        grouped = defaultdict(list)
+        for therapist_id, start_time, end_time, booking_id in existing:
+            grouped[therapist_id].append((start_time, end_time, booking_id))
+        return {therapist_id: IntervalSet(grouped[therapist_id]) for therapist_id in candidates}
+
+    def transition(
+        self,
+        booking_id: int,
+        target: str,
+        expected_version: Optional[int] = None
+    ) -> Booking:
+        """
+        Move a booking to ``target`` with one conditional UPDATE ... RETURNING.
+
+        The allowed source statuses and, when given, the expected version are
+        part of the UPDATE's WHERE clause instead of being read first, so the
+        row is locked only by that statement until the commit right after it,
+        and of two concurrent transitions only one can match. The
+        booking_<target> event is written to the outbox in the same
+        transaction.
+
+        Args:
+            booking_id: ID of the booking
+            target: confirmed or cancelled
+            expected_version: Version the caller last read (If-Match)
+
+        Returns:
+            The updated booking
+
+        Raises:
+            BookingNotFoundError: If the booking does not exist
+            BookingVersionMismatchError: If its version is not expected_version
+            InvalidStatusTransitionError: If its status cannot move to target
+        """
+        booking = models.BookingModel
+        query = (
+            update(booking)
+            .where(booking.id == booking_id, booking.status.in_(STATUS_TRANSITIONS[target]))
+            .values(status=target, version=booking.version + 1)
+            .returning(booking)
+        )
+        if expected_version is not None:
+            query = query.where(booking.version == expected_version)
+        db_booking = self.db.scalars(query).one_or_none()
+        if db_booking is None:
+            self.db.rollback()
+            self._raise_transition_failure(booking_id, target, expected_version)
+
+        updated = Booking.from_orm(db_booking)
+        versions = self._bump_schedule_versions([updated.therapist_id]) if target == "cancelled" else {}
+        if EVENT_PUBLISH_MODE == "outbox":
+            outbox.enqueue(self.db, [booking_event(updated, f"booking_{target}")])
+        _commit(self.db)
+        if versions:
+            _after_commit(self.db, lambda: schedule_index.removed(
+                updated.therapist_id,
+                versions[updated.therapist_id],
+                [(updated.start_time, updated.end_time, updated.id)]
+            ))
+        return updated
+
+    def _raise_transition_failure(
+        self,
+        booking_id: int,
+        target: str,
+        expected_version: Optional[int]
+    ) -> None:
+        """Explain why a conditional transition matched no row."""
+        current = self.db.execute(
+            select(models.BookingModel.status, models.BookingModel.version)
+            .where(models.BookingModel.id == booking_id)
+        ).first()
+        self.db.rollback()
+        if current is None:
+            raise BookingNotFoundError(booking_id)
+        status, version = current
+        if expected_version is not None and version != expected_version:
+            raise BookingVersionMismatchError(booking_id, version)
+        raise InvalidStatusTransitionError(booking_id, status, target)
+
+    def cancel_range(
+        self,
+        therapist_id: int,
+        start_from: datetime,
+        start_to: datetime
+    ) -> List[Booking]:
+        """
+        Cancel a therapist's active bookings starting in [start_from, start_to).
+
+        One UPDATE ... RETURNING over ix_bookings_therapist_time cancels them
+        all, so each row is locked by that statement alone; bookings cancelled
+        concurrently are simply not matched. Their booking_cancelled events
+        are written to the outbox in the same transaction.
+
+        Returns:
+            The cancelled bookings, ordered by start time
+        """
+        booking = models.BookingModel
+        db_bookings = self.db.scalars(
+            update(booking)
+            .where(
+                booking.therapist_id == therapist_id,
+                booking.start_time >= start_from,
+                booking.start_time < start_to,
+                booking.status.in_(STATUS_TRANSITIONS["cancelled"]),
+            )
+            .values(status="cancelled", version=booking.version + 1)
+            .returning(booking)
+        ).all()
+        if not db_bookings:
+            _end_unchanged(self.db)
+            return []
+
+        cancelled = sorted(
+            booking_list.validate_python(db_bookings, from_attributes=True),
+            key=lambda item: (item.start_time, item.id)
+        )
+        versions = self._bump_schedule_versions([therapist_id])
+        if EVENT_PUBLISH_MODE == "outbox":
+            outbox.enqueue(self.db, [booking_event(item, "booking_cancelled") for item in cancelled])
+        _commit(self.db)
+        if versions:
+            _after_commit(self.db, lambda: schedule_index.removed(
+                therapist_id,
+                versions[therapist_id],
+                [(item.start_time, item.end_time, item.id) for item in cancelled]
+            ))
+        return cancelled
+
+    def _conflict_id(self, therapist_id: int, start_time: datetime, end_time: datetime) -> Optional[int]:
+        """ID of an active booking overlapping the range, from the index when enabled."""
+        if SCHEDULE_INDEX_ENABLED:
+            conflict = schedule_index.overlapping(
+                self.db, therapist_id, start_time, end_time, max_staleness=0
+            )
+            return conflict[2] if conflict is not None else None
+        conflict = self.find_conflict(therapist_id, start_time, end_time)
+        return conflict.id if conflict is not None else None
+
+    def _bump_schedule_versions(self, therapist_ids) -> Dict[int, int]:
+        """
+        Advance the schedule_version of therapists whose bookings this
+        transaction changes, so ScheduleIndex entries elsewhere reload.
+
+        Skipped without the schedule index: the UPDATE costs a round trip
+        and locks the therapist row, serializing the therapist's inserts
+        even under the exclusion constraint strategy.
+
+        Returns:
+            Therapist ID -> new version, empty when the index is disabled
+        """
+        if not SCHEDULE_INDEX_ENABLED:
+            return {}
+        therapist = models.TherapistModel
+        return dict(self.db.execute(
+            update(therapist)
+            .where(therapist.id.in_(sorted(therapist_ids)))
+            .values(schedule_version=therapist.schedule_version + 1)
+            .returning(therapist.id, therapist.schedule_version)
+            .execution_options(synchronize_session=False)
+        ).all())
+
+    def find_conflict(
+        self,
+        therapist_id: int,
+        start_time: datetime,
+        end_time: datetime
+    ) -> Optional[Booking]:
+        """
+        Find an active booking of the therapist overlapping [start_time, end_time).
+
+        Active bookings of one therapist never overlap, so ordered by start_time
+        they are also ordered by end_time. The latest booking starting before
+        end_time is then the only one that can overlap, which makes the check a
+        single backwards probe of ix_bookings_therapist_time instead of a scan
+        over the therapist's history. No booking is longer than
+        MAX_BOOKING_DURATION, so the probe stops there, and on a partitioned
+        bookings table only the partitions of that range are searched.
+        """
+        start_time, end_time = as_utc_naive(start_time), as_utc_naive(end_time)
+        latest = (
+            select(models.BookingModel)
+            .where(
+                models.BookingModel.therapist_id == therapist_id,
+                models.BookingModel.start_time > start_time - MAX_BOOKING_DURATION,
+                models.BookingModel.start_time < end_time,
+                models.BookingModel.status != "cancelled",
+            )
+            .order_by(models.BookingModel.start_time.desc())
+            .limit(1)
+            .subquery()
+        )
+        candidate = aliased(models.BookingModel, latest)
+        db_booking = self.db.execute(
+            select(candidate).where(candidate.end_time > start_time)
+        ).scalar_one_or_none()
+        return Booking.from_orm(db_booking) if db_booking else None
+
+    def busy_intervals(
+        self,
+        start: datetime,
+        end: datetime,
+        therapist_ids: Optional[List[int]] = None
+    ) -> Dict[int, List[Tuple[datetime, datetime]]]:
+        """
+        Active bookings overlapping [start, end), per therapist.
+
+        Bookings starting inside the window come from one range scan of
+        ix_bookings_therapist_time. Active bookings never overlap, so of the
+        bookings starting earlier only each therapist's latest one can reach
+        into the window; it is found with one backwards index probe per
+        therapist, reaching back at most MAX_BOOKING_DURATION.
+
+        Args:
+            start: Window start
+            end: Window end
+            therapist_ids: Only these therapists; all when None
+
+        With SCHEDULE_INDEX=true and explicit therapists, their bookings come
+        from the schedule index instead.
+
+        Returns:
+            Therapist ID -> (start, end) intervals sorted by start, as naive
+            UTC datetimes; therapists without bookings are omitted
+        """
+        start, end = as_utc_naive(start), as_utc_naive(end)
+        if SCHEDULE_INDEX_ENABLED and therapist_ids is not None:
+            indexed = {
+                therapist_id: [
+                    (max(busy_start, start), busy_end)
+                    for busy_start, busy_end, _ in schedule_index.between(self.db, therapist_id, start, end)
+                ]
+                for therapist_id in set(therapist_ids)
+            }
+            return {therapist_id: busy for therapist_id, busy in indexed.items() if busy}
+        booking = models.BookingModel
+        therapist = models.TherapistModel
+        previous_end = (
+            select(booking.end_time)
+            .where(
+                booking.therapist_id == therapist.id,
+                booking.start_time > start - MAX_BOOKING_DURATION,
+                booking.start_time < start,
+                booking.status != "cancelled",
+            )
+            .order_by(booking.start_time.desc())
+            .limit(1)
+            .correlate(therapist)
+            .scalar_subquery()
+        )
+        carried = select(therapist.id, previous_end).where(previous_end > start)
+        in_window = (
+            select(booking.therapist_id, booking.start_time, booking.end_time)
+            .where(
+                booking.start_time >= start,
+                booking.start_time < end,
+                booking.status != "cancelled",
+            )
+            .order_by(booking.therapist_id, booking.start_time)
+        )
+        if therapist_ids is not None:
+            carried = carried.where(therapist.id.in_(therapist_ids))
+            in_window = in_window.where(booking.therapist_id.in_(therapist_ids))
+
+        busy: Dict[int, List[Tuple[datetime, datetime]]] = defaultdict(list)
+        for therapist_id, end_time in self.db.execute(carried):
+            busy[therapist_id].append((start, as_utc_naive(end_time)))
+        for therapist_id, start_time, end_time in self.db.execute(in_window):
+            busy[therapist_id].append((as_utc_naive(start_time), as_utc_naive(end_time)))
+        return dict(busy)
+
+    def _enforced_by_constraint(self) -> bool:
+        return (
+            BOOKING_CONFLICT_STRATEGY == "exclusion"
+            and self.db.get_bind().dialect.name == "postgresql"
+        )
+
+    def _lock_therapist_schedule(self, therapist_id: int) -> None:
+        """
+        Serialize concurrent inserts for one therapist until the transaction ends.
+
+        Other therapists are unaffected. SQLite already serializes writers, so
+        the lock is only taken on PostgreSQL.
+        """
+        if self.db.get_bind().dialect.name == "postgresql":
+            self.db.execute(
+                text("SELECT pg_advisory_xact_lock(:namespace, :therapist_id)"),
+                {"namespace": BOOKING_LOCK_NAMESPACE, "therapist_id": therapist_id}
+            )
 
     def get_by_id(self, booking_id: int) -> Optional[Booking]:
+        """Booking by ID, from bookings_archive once the archival job moved it."""
         db_booking = self.db.query(models.BookingModel).filter(
             models.BookingModel.id == booking_id
         ).first()
+        if db_booking is None:
+            db_booking = self.db.get(models.ArchivedBookingModel, booking_id)
         return Booking.from_orm(db_booking) if db_booking else None
 
     def get_by_therapist(self, therapist_id: int) -> List[Booking]:
         db_bookings = self.db.query(models.BookingModel).filter(
             models.BookingModel.therapist_id == therapist_id
         ).all()
-        return [Booking.from_orm(booking) for booking in db_bookings]
+        return booking_list.validate_python(db_bookings, from_attributes=True)
+
+    def page_by_therapist(
+        self,
+        therapist_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+        status: Optional[str] = None
+    ) -> Page:
+        """
+        One keyset page of a therapist's bookings.
+
+        Rows are read as plain dicts with the fields of Booking, skipping ORM
+        instances and model validation, ready to be serialized.
+
+        Returns:
+            Page of booking dicts; next_cursor is None on the last page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = therapist_bookings_query(therapist_id, cursor, start_from, start_to, status)
+        rows = self.db.execute(
+            query.with_only_columns(*BOOKING_COLUMNS).limit(limit + 1)
+        ).mappings().all()
+        bookings = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(bookings[-1]["start_time"], bookings[-1]["id"])
+        return Page(bookings, next_cursor)
+
+    def iter_by_therapist(
+        self,
+        therapist_id: int,
+        cursor: Optional[str] = None,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+        status: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        Stream a therapist's bookings, as dicts, from a server-side cursor.
+
+        Rows are fetched STREAM_BATCH_SIZE at a time, so memory stays flat
+        regardless of how many bookings the therapist has. The query is built
+        before returning, so a malformed cursor raises here rather than
+        mid-stream.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = therapist_bookings_query(therapist_id, cursor, start_from, start_to, status)
+        return self._stream(query.with_only_columns(*BOOKING_COLUMNS))
+
+    def _stream(self, query: Select) -> Iterator[Dict]:
+        result = self.db.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        for row in result.mappings():
+            yield dict(row)
 
 class TherapistRepository:
     def __init__(self, db: Session):
@@ -45,9 +785,18 @@ class TherapistRepository:
             phone=therapist.phone
         )
         self.db.add(db_therapist)
-        self.db.commit()
-        self.db.refresh(db_therapist)
-        return Therapist.from_orm(db_therapist)
+        # The INSERT returns id and created_at (eager_defaults); read them
+        # before the commit expires the instance
+        self.db.flush()
+        created = Therapist.from_orm(db_therapist)
+        _commit(self.db)
+
+        def update_caches():
+            therapist_directory_cache.clear()
+            known_therapist_ids.set(created.id, True)
+
+        _after_commit(self.db, update_caches)
+        return created
 
     def get_by_id(self, therapist_id: int) -> Optional[Therapist]:
         db_therapist = self.db.query(models.TherapistModel).filter(
@@ -55,6 +804,132 @@ class TherapistRepository:
         ).first()
         return Therapist.from_orm(db_therapist) if db_therapist else None
 
+    def exists(self, therapist_id: int) -> bool:
+        """
+        Whether the therapist exists, answered from known_therapist_ids when possible.
+
+        A miss costs a primary-key probe that reads no therapist columns.
+        """
+        if known_therapist_ids.get(therapist_id):
+            return True
+        found = self.probe(therapist_id)
+        if found:
+            known_therapist_ids.set(therapist_id, True)
+        return found
+
+    def probe(self, therapist_id: int) -> bool:
+        """Whether the therapist exists, by primary key, bypassing known_therapist_ids."""
+        return self.db.execute(
+            select(models.TherapistModel.id).where(models.TherapistModel.id == therapist_id)
+        ).first() is not None
+
     def list_all(self) -> List[Therapist]:
         db_therapists = self.db.query(models.TherapistModel).all()
-        return [Therapist.from_orm(therapist) for therapist in db_therapists] 
\ No newline at end of file
+        return therapist_list.validate_python(db_therapists, from_attributes=True)
+
+    def list_page(self, limit: int, cursor: Optional[str] = None) -> Page:
+        """
+        One page of the therapist directory, ordered by ID.
+
+        Rows are read as dicts and serialized once into the page's body,
+        which the ETag is computed over. Pages are served from
+        therapist_directory_cache when present, so a repeated poll costs
+        neither a query nor serialization.
+
+        Returns:
+            Page of therapist dicts with its ETag and JSON body
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        page = therapist_directory_cache.get((limit, cursor))
+        if page is not None:
+            return page
+
+        query = select(*THERAPIST_COLUMNS).order_by(models.TherapistModel.id)
+        if cursor is not None:
+            try:
+                (last_id,) = decode_cursor(cursor)
+                query = query.where(models.TherapistModel.id > int(last_id))
+            except (TypeError, ValueError) as e:
+                raise ValueError("Invalid cursor") from e
+        rows = self.db.execute(query.limit(limit + 1)).mappings().all()
+        therapists = [dict(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(therapists[-1]["id"]) if len(rows) > limit else None
+
+        body = dumps(therapists)
+        page = Page(therapists, next_cursor, page_etag(body, next_cursor), body)
+        therapist_directory_cache.set((limit, cursor), page)
+        return page
+
+class WorkingHoursRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def replace(self, therapist_id: int, hours: List[WorkingHours]) -> List[WorkingHours]:
+        """
+        Replace a therapist's weekly working hours in one transaction.
+
+        Raises:
+            TherapistNotFoundError: If the therapist does not exist
+        """
+        try:
+            self.db.execute(
+                delete(models.WorkingHoursModel)
+                .where(models.WorkingHoursModel.therapist_id == therapist_id)
+            )
+            if hours:
+                self.db.execute(insert(models.WorkingHoursModel), [
+                    {"therapist_id": therapist_id, **entry.model_dump()} for entry in hours
+                ])
+            _commit(self.db)
+        except IntegrityError as e:
+            self.db.rollback()
+            if _is_foreign_key_violation(e):
+                raise TherapistNotFoundError(therapist_id) from e
+            raise
+        # The stored rows are exactly the input, so they are not read back
+        return sorted(hours, key=lambda entry: (entry.weekday, entry.start_time))
+
+    def get_by_therapist(self, therapist_id: int) -> List[WorkingHours]:
+        db_hours = self.db.execute(
+            select(models.WorkingHoursModel)
+            .where(models.WorkingHoursModel.therapist_id == therapist_id)
+            .order_by(models.WorkingHoursModel.weekday, models.WorkingHoursModel.start_time)
+        ).scalars().all()
+        return working_hours_list.validate_python(db_hours, from_attributes=True)
+
+    def weekly_hours(
+        self,
+        therapist_ids: Optional[List[int]] = None,
+        after: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Dict[int, List[Tuple[int, time, time]]]:
+        """
+        Working hours as (weekday, start, end) rows per therapist.
+
+        Args:
+            therapist_ids: Only these therapists; all when None
+            after: Only therapists with a greater ID
+            limit: Only the first limit therapists with hours, by ID
+
+        Returns:
+            Therapist ID -> rows; therapists without hours are omitted
+        """
+        hours = models.WorkingHoursModel
+        filters = []
+        if therapist_ids is not None:
+            filters.append(hours.therapist_id.in_(therapist_ids))
+        if after is not None:
+            filters.append(hours.therapist_id > after)
+        if limit is not None:
+            page = (
+                select(hours.therapist_id).distinct().where(*filters)
+                .order_by(hours.therapist_id).limit(limit)
+            )
+            filters = [hours.therapist_id.in_(page.scalar_subquery())]
+        query = select(hours.therapist_id, hours.weekday, hours.start_time, hours.end_time).where(*filters)
+        weekly: Dict[int, List[Tuple[int, time, time]]] = defaultdict(list)
+        for therapist_id, weekday, start_time, end_time in self.db.execute(query):
+            weekly[therapist_id].append((weekday, start_time, end_time))
+        return dict(weekly)
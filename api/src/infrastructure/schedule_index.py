@@ -0,0 +1,245 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+from . import models
+from .database import MAX_BOOKING_DURATION
+from ..core.intervals import IntervalSet, as_utc_naive
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class _Schedule:
+    __slots__ = ("intervals", "version", "checked_at", "floor")
+
+    def __init__(self, intervals: IntervalSet, version: int, checked_at: float, floor: datetime):
+        self.intervals = intervals
+        self.version = version
+        self.checked_at = checked_at
+        # Holds every active booking ending after floor
+        self.floor = floor
+
+class ScheduleIndex:
+    """
+    In-process index of active bookings per therapist.
+
+    Each therapist's active bookings are held in an IntervalSet, loaded on
+    first use, so overlap, range and next-free queries are O(log n) in memory.
+    Entries carry the therapist's schedule_version, which every booking
+    write bumps in its transaction: writes from this process are applied to
+    the entry incrementally, and a version moved by another process makes
+    the entry reload. The version is re-read when an entry was last checked
+    more than ``max_staleness`` seconds ago (callers that must not see stale
+    data pass 0), so within that bound hot therapists are served without
+    touching the database. At most ``maxsize`` therapists are kept, least
+    recently used first out.
+
+    Only bookings ending less than ``history`` ago or later are held, so a
+    load reads the therapist's current schedule rather than their whole
+    history, and entries drop bookings as they fall out of that window.
+    Queries reaching further back are answered from the database.
+    """
+
+    def __init__(self, maxsize: int = 1000, max_staleness: float = 0.0, history: timedelta = MAX_BOOKING_DURATION):
+        self.maxsize = maxsize
+        self.max_staleness = max_staleness
+        self.history = history
+        self._entries: "OrderedDict[int, _Schedule]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def _load(self, db: Session, therapist_id: int, floor: datetime) -> Optional[Tuple[int, IntervalSet]]:
+        """Schedule version and active bookings ending after floor, or None if the therapist does not exist."""
+        # Version and bookings come from one statement, so they are read from
+        # the same snapshot even while another transaction commits. No
+        # booking is longer than MAX_BOOKING_DURATION, which bounds the scan
+        # of ix_bookings_therapist_time (and the partitions read)
+        booking = models.BookingModel
+        therapist = models.TherapistModel
+        rows = db.execute(
+            select(therapist.schedule_version, booking.start_time, booking.end_time, booking.id)
+            .select_from(therapist)
+            .outerjoin(booking, and_(
+                booking.therapist_id == therapist.id,
+                booking.status != "cancelled",
+                booking.start_time > floor - MAX_BOOKING_DURATION,
+                booking.end_time > floor,
+            ))
+            .where(therapist.id == therapist_id)
+        ).all()
+        if not rows:
+            return None
+        bookings = [(start, end, booking_id) for _, start, end, booking_id in rows if booking_id is not None]
+        return rows[0][0], IntervalSet(bookings)
+
+    def _trim(self, entry: _Schedule, floor: datetime) -> None:
+        # Called with the lock held. Rebuilt once per ``history``, not per call
+        if floor - entry.floor >= self.history:
+            entry.intervals = IntervalSet([item for item in entry.intervals if item[1] > floor])
+            entry.floor = floor
+
+    def _current(self, db: Session, therapist_id: int, max_staleness: Optional[float]) -> Optional[_Schedule]:
+        """Fresh entry for the therapist, or None if the therapist does not exist."""
+        max_staleness = self.max_staleness if max_staleness is None else max_staleness
+        now = time.monotonic()
+        floor = _utcnow() - self.history
+        with self._lock:
+            entry = self._entries.get(therapist_id)
+            if entry is not None:
+                self._entries.move_to_end(therapist_id)
+                if now - entry.checked_at <= max_staleness:
+                    self._trim(entry, floor)
+                    self.hits += 1
+                    return entry
+
+        version = db.execute(
+            select(models.TherapistModel.schedule_version)
+            .where(models.TherapistModel.id == therapist_id)
+        ).scalar_one_or_none()
+        if version is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(therapist_id)
+            if entry is not None and entry.version == version:
+                entry.checked_at = now
+                self._trim(entry, floor)
+                self.hits += 1
+                return entry
+
+        loaded = self._load(db, therapist_id, floor)
+        if loaded is None:
+            return None
+        version, intervals = loaded
+        entry = _Schedule(intervals, version, now, floor)
+        with self._lock:
+            current = self._entries.get(therapist_id)
+            # Keep an entry another thread moved further ahead meanwhile
+            if current is None or current.version <= version:
+                self._entries[therapist_id] = entry
+                self._entries.move_to_end(therapist_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            self.loads += 1
+        return entry
+
+    def _intervals(
+        self,
+        db: Session,
+        therapist_id: int,
+        start: datetime,
+        max_staleness: Optional[float]
+    ) -> Optional[IntervalSet]:
+        """Bookings ending after ``start``, among others; None if the therapist does not exist."""
+        start = as_utc_naive(start)
+        if start < _utcnow() - self.history:
+            # Before the window entries hold: read once, without caching
+            loaded = self._load(db, therapist_id, start)
+            return loaded[1] if loaded is not None else None
+        entry = self._current(db, therapist_id, max_staleness)
+        return entry.intervals if entry is not None else None
+
+    def overlapping(
+        self,
+        db: Session,
+        therapist_id: int,
+        start: datetime,
+        end: datetime,
+        max_staleness: Optional[float] = None
+    ) -> Optional[Tuple[datetime, datetime, Any]]:
+        """
+        An active booking overlapping [start, end) as (start, end, booking_id).
+        """
+        intervals = self._intervals(db, therapist_id, start, max_staleness)
+        if intervals is None:
+            return None
+        with self._lock:
+            return intervals.overlapping(start, end)
+
+    def between(
+        self,
+        db: Session,
+        therapist_id: int,
+        start: datetime,
+        end: datetime,
+        max_staleness: Optional[float] = None
+    ) -> List[Tuple[datetime, datetime, Any]]:
+        """Active bookings overlapping [start, end), in order."""
+        intervals = self._intervals(db, therapist_id, start, max_staleness)
+        if intervals is None:
+            return []
+        with self._lock:
+            return intervals.between(start, end)
+
+    def next_free(
+        self,
+        db: Session,
+        therapist_id: int,
+        after: datetime,
+        duration: timedelta,
+        max_staleness: Optional[float] = None
+    ) -> Optional[datetime]:
+        """
+        Earliest time at or after ``after`` with no booking for ``duration``,
+        ignoring working hours; None if the therapist does not exist.
+        """
+        intervals = self._intervals(db, therapist_id, after, max_staleness)
+        if intervals is None:
+            return None
+        with self._lock:
+            return intervals.next_free(after, duration)
+
+    def apply(self, therapist_id: int, version: int, change: Callable[[IntervalSet], None]) -> None:
+        """
+        Apply a committed write that moved the schedule to ``version``.
+
+        The change is applied in place only if the entry is at the version
+        just before; otherwise a write was missed and the entry is dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(therapist_id)
+            if entry is None:
+                return
+            if entry.version == version - 1:
+                change(entry.intervals)
+                entry.version = version
+            elif entry.version < version:
+                del self._entries[therapist_id]
+
+    def added(self, therapist_id: int, version: int, bookings: List[Tuple[datetime, datetime, Any]]) -> None:
+        """Apply bookings, as (start, end, booking_id), created at ``version``."""
+        def change(intervals: IntervalSet) -> None:
+            for start, end, booking_id in bookings:
+                intervals.add(start, end, booking_id)
+        self.apply(therapist_id, version, change)
+
+    def removed(self, therapist_id: int, version: int, bookings: List[Tuple[datetime, datetime, Any]]) -> None:
+        """Apply bookings, as (start, end, booking_id), cancelled at ``version``."""
+        def change(intervals: IntervalSet) -> None:
+            for start, _, booking_id in bookings:
+                intervals.remove(booking_id, start)
+        self.apply(therapist_id, version, change)
+
+    def invalidate(self, therapist_id: int) -> None:
+        with self._lock:
+            self._entries.pop(therapist_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "therapists": len(self._entries),
+                "bookings": sum(len(entry.intervals) for entry in self._entries.values()),
+                "hits": self.hits,
+                "loads": self.loads,
+            }
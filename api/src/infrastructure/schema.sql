@@ -1,5 +1,7 @@
-DROP TABLE IF EXISTS bookings;
-DROP TABLE IF EXISTS therapists;
+-- Schema of migration 0001_baseline, as first deployed. It is not changed
+-- again: later tables and columns are Alembic revisions. New databases are
+-- created with `alembic upgrade head` (see api/migrations); after applying
+-- this file, run `alembic stamp 0001_baseline` and `alembic upgrade head`.
 
 CREATE TABLE IF NOT EXISTS therapists (
     id SERIAL PRIMARY KEY,
@@ -0,0 +1,16 @@
+import os
+
+def running_in_lambda() -> bool:
+    """Whether this process is a Lambda execution environment."""
+    return "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
+def load_environment() -> None:
+    """
+    Load a local .env file into the environment.
+
+    Lambda functions are configured through their environment, so there the
+    search for a .env file up the directory tree is skipped.
+    """
+    if not running_in_lambda():
+        from dotenv import load_dotenv
+        load_dotenv()
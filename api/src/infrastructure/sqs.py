@@ -1,20 +1,75 @@
-import json
-import boto3
 import os
-from typing import Any, Dict
-from dotenv import load_dotenv
+import threading
+from typing import Any, Dict, List, Sequence, Union
+from booking_events.envelope import encode_batch, encode_event
+from .settings import load_environment
+from .metrics import sqs_call
+from ..core.serialization import encode_message
 
-load_dotenv()
+load_environment()
+
+# SendMessageBatch accepts at most 10 entries
+MAX_BATCH_SIZE = 10
+
+# Queue message encoding:
+#   json    - one JSON object per event (default), which every consumer reads
+#   msgpack - versioned binary envelope, see booking_events.envelope; the
+#             events of one write share a message, EVENT_BATCH_SIZE at most.
+#             Bodies are about a third of the size, but encoding one event
+#             takes several times longer than orjson (see
+#             benchmarks/bench_envelope.py). Switch once every consumer
+#             decodes the envelope
+EVENT_ENCODING = os.getenv("EVENT_ENCODING", "json")
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "100"))
+
+def encode_body(message: Dict[str, Any]) -> str:
+    """Queue message body of one event, in EVENT_ENCODING."""
+    return encode_event(message) if EVENT_ENCODING == "msgpack" else encode_message(message)
+
+def encode_bodies(messages: Sequence[Dict[str, Any]]) -> List[str]:
+    """
+    Queue message bodies of the events of one write.
+
+    With msgpack encoding, events are grouped into batch envelopes of up to
+    EVENT_BATCH_SIZE, so a batch of bookings costs a few messages instead
+    of one per booking.
+    """
+    if EVENT_ENCODING != "msgpack":
+        return [encode_message(message) for message in messages]
+    if len(messages) == 1:
+        return [encode_event(messages[0])]
+    return [
+        encode_batch(messages[start:start + EVENT_BATCH_SIZE])
+        for start in range(0, len(messages), EVENT_BATCH_SIZE)
+    ]
 
 class SQSClient:
+    """
+    SQS sender for the notification queue.
+
+    boto3 is imported and its client built on the first send rather than at
+    import, which keeps both off the cold start of requests that never
+    publish (reads, and writes in outbox mode).
+    """
+
     def __init__(self):
-        self.sqs = boto3.client(
-            'sqs',
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
-        )
         self.queue_url = os.getenv('SQS_QUEUE_URL')
+        self._sqs = None
+        self._lock = threading.Lock()
+
+    @property
+    def sqs(self):
+        if self._sqs is None:
+            with self._lock:
+                if self._sqs is None:
+                    import boto3
+                    self._sqs = boto3.client(
+                        'sqs',
+                        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                        region_name=os.getenv('AWS_REGION', 'us-east-1')
+                    )
+        return self._sqs
 
     def send_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -27,12 +82,40 @@ class SQSClient:
             Dict containing the response from SQS
         """
         try:
-            response = self.sqs.send_message(
-                QueueUrl=self.queue_url,
-                MessageBody=json.dumps(message)
-            )
+            with sqs_call("send_message"):
+                response = self.sqs.send_message(
+                    QueueUrl=self.queue_url,
+                    MessageBody=encode_body(message)
+                )
             return response
         except Exception as e:
             # In a production environment, you would want to log this error
             # and possibly retry the operation
-            raise Exception(f"Failed to send message to SQS: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Failed to send message to SQS: {str(e)}") 
+
+    def send_message_batch(self, messages: Dict[str, Union[Dict[str, Any], str]]) -> Dict[str, Any]:
+        """
+        Send up to 10 messages to the SQS queue in one SendMessageBatch call.
+        
+        Args:
+            messages: Message data keyed by batch entry ID; strings are
+                bodies encoded already (e.g. outbox payloads) and sent as is
+            
+        Returns:
+            Dict containing the response from SQS, with Successful and
+            Failed entries
+        """
+        if len(messages) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} messages per batch")
+        try:
+            entries = [
+                {
+                    "Id": entry_id,
+                    "MessageBody": message if isinstance(message, str) else encode_body(message),
+                }
+                for entry_id, message in messages.items()
+            ]
+            with sqs_call("send_message_batch"):
+                return self.sqs.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+        except Exception as e:
+            raise Exception(f"Failed to send message batch to SQS: {str(e)}")
\ No newline at end of file
@@ -1,87 +1,269 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+import asyncio
+from fastapi import BackgroundTasks, FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import os
+from datetime import datetime, timedelta, timezone
 
-from .infrastructure.database import get_db
-from .infrastructure.repository import BookingRepository, TherapistRepository
-from .infrastructure.sqs import SQSClient
-from .core.models import Booking, BookingCreate, Therapist
+from .infrastructure.database import (
+    BOOKING_MAX_DURATION_HOURS,
+    DB_POOL_PROFILE,
+    EVENT_PUBLISH_MODE,
+    THERAPIST_CHECK_MODE,
+    DatabaseSession,
+    MAX_BOOKING_DURATION,
+    READ_YOUR_WRITES_WINDOW,
+    SessionLocal,
+    get_read_session,
+    get_session,
+    replica_snapshot,
+    replicas_enabled,
+)
+from .infrastructure.outbox import OutboxRelay
+from .infrastructure.metrics import METRICS_ENABLED, MetricsMiddleware, metrics, span
+from .infrastructure.pool import pool_metrics
+from .infrastructure.replicas import PrimaryPinMiddleware
+from .infrastructure.async_repository import (
+    AsyncBookingRepository,
+    AsyncTherapistRepository,
+    AsyncWorkingHoursRepository,
+)
+from .infrastructure.sqs import MAX_BATCH_SIZE, SQSClient, encode_bodies
+from .core.availability import (
+    MAX_AVAILABILITY_WINDOW,
+    MAX_SEARCH_THERAPISTS,
+    MAX_SEARCH_WINDOW,
+    earliest_slot_start,
+    first_free_slots,
+    free_intervals,
+    therapist_schedules,
+    working_intervals,
+)
+from .core.events import booking_event
+from .core.exceptions import (
+    BookingConflictError,
+    BookingNotFoundError,
+    BookingVersionMismatchError,
+    InvalidStatusTransitionError,
+    TherapistNotFoundError,
+)
+from .core.intervals import as_utc_naive
+from .core.models import (
+    Availability,
+    AvailableSlot,
+    Booking,
+    BookingBatchCreate,
+    BookingBatchResult,
+    BookingCreate,
+    Therapist,
+    TimeSlot,
+    WorkingHours,
+)
+from .core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .core.serialization import dumps
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson.
+
+    Routes that already hold plain rows return it directly, which skips
+    FastAPI's response-model validation and encoding as well.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
 
 app = FastAPI(
     title="Therapist Booking API",
     description="API for managing therapist bookings",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
+app.add_middleware(PrimaryPinMiddleware, window=READ_YOUR_WRITES_WINDOW, enabled=replicas_enabled)
+if METRICS_ENABLED:
+    # Added last, so it is the outermost middleware and times the others
+    app.add_middleware(MetricsMiddleware, routes=lambda: app.routes)
 
 sqs_client = SQSClient()
+outbox_relay = OutboxRelay(SessionLocal, sqs_client)
+_relay_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_outbox_relay():
+    """
+    Run the outbox relay in the background of this worker.
+    
+    Not under the Lambda adapter: its loop only runs during invocations, so
+    lambda_handler drains the outbox itself.
+    """
+    global _relay_task
+    if _lambda_adapter is not None:
+        return
+    if EVENT_PUBLISH_MODE == "outbox" and os.getenv("OUTBOX_RELAY_ENABLED", "true") == "true":
+        interval = float(os.getenv("OUTBOX_RELAY_INTERVAL", "1"))
+        _relay_task = asyncio.create_task(outbox_relay.run(interval))
+
+@app.on_event("shutdown")
+async def stop_outbox_relay():
+    """Stop the relay; undelivered messages stay in the outbox."""
+    if _relay_task is not None:
+        _relay_task.cancel()
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+@app.get("/health/pool")
+async def pool_health():
+    """Connection pool profile and checkout/connection metrics, with read replica state."""
+    return {"profile": DB_POOL_PROFILE, **pool_metrics.snapshot(), "replicas": replica_snapshot()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Request, query and SQS metrics in the Prometheus text format."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/bookings", response_model=Booking)
 async def create_booking(
     booking: BookingCreate,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: DatabaseSession = Depends(get_session)
 ):
     """
     Create a new booking.
     
     Args:
         booking: Booking details
+        background_tasks: Tasks run after the response is sent
         db: Database session
         
     Returns:
         Created booking
     """
     # Validate booking times
-    if not booking.validate_times():
+    with span("validate"):
+        valid = booking.validate_times()
+    if not valid:
         raise HTTPException(
             status_code=400,
             detail="End time must be after start time"
         )
+    if booking.end_time - booking.start_time > MAX_BOOKING_DURATION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Bookings cannot be longer than {BOOKING_MAX_DURATION_HOURS:g} hours"
+        )
     
-    # Check if therapist exists
-    therapist_repo = TherapistRepository(db)
-    therapist = therapist_repo.get_by_id(booking.therapist_id)
-    if not therapist:
+    # Check if therapist exists; in foreign_key mode the insert itself does
+    if THERAPIST_CHECK_MODE != "foreign_key":
+        therapist_repo = AsyncTherapistRepository(db)
+        with span("therapist_check"):
+            exists = await therapist_repo.exists(booking.therapist_id)
+        if not exists:
+            raise HTTPException(
+                status_code=404,
+                detail="Therapist not found"
+            )
+    
+    # Create booking
+    booking_repo = AsyncBookingRepository(db)
+    try:
+        with span("create"):
+            created_booking = await booking_repo.create(booking)
+    except BookingConflictError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=str(e)
+        )
+    except TherapistNotFoundError as e:
         raise HTTPException(
             status_code=404,
-            detail="Therapist not found"
+            detail=str(e)
         )
     
-    # Create booking
-    booking_repo = BookingRepository(db)
-    created_booking = booking_repo.create(booking)
-    
-    # Send notification via SQS
-    message = {
-        "booking_id": created_booking.id,
-        "therapist_id": created_booking.therapist_id,
-        "client_email": created_booking.client_email,
-        "start_time": created_booking.start_time.isoformat(),
-        "end_time": created_booking.end_time.isoformat(),
-        "event_type": "booking_created"
-    }
+    # Notify the consumer: the outbox row was committed with the booking,
+    # so in outbox mode only the relay needs a nudge
+    if EVENT_PUBLISH_MODE == "outbox":
+        outbox_relay.notify()
+    else:
+        background_tasks.add_task(_publish, booking_event(created_booking, "booking_created"))
+    
+    return created_booking
+
+@app.post("/bookings/batch", response_model=BookingBatchResult)
+async def create_bookings_batch(
+    batch: BookingBatchCreate,
+    background_tasks: BackgroundTasks,
+    db: DatabaseSession = Depends(get_session)
+):
+    """
+    Create many bookings in one transaction.
     
+    Every item gets a result: created, rejected (with the reason) or
+    skipped. With all_or_nothing (the default) a single rejected item
+    means nothing is created and the response status is 422; otherwise
+    valid items are created and the rest reported.
+    
+    Args:
+        batch: Bookings to create and the failure mode
+        background_tasks: Tasks run after the response is sent
+        db: Database session
+        
+    Returns:
+        Per-item results
+    """
+    booking_repo = AsyncBookingRepository(db)
+    try:
+        results = await booking_repo.create_many(batch.items, batch.all_or_nothing)
+    except BookingConflictError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=str(e)
+        )
+    
+    created = [result.booking for result in results if result.status == "created"]
+    if created:
+        if EVENT_PUBLISH_MODE == "outbox":
+            outbox_relay.notify()
+        else:
+            background_tasks.add_task(
+                _publish_batch, [booking_event(booking, "booking_created") for booking in created]
+            )
+    
+    result = BookingBatchResult(created=len(created), results=results)
+    if batch.all_or_nothing and len(created) < len(results):
+        return FastJSONResponse(status_code=422, content=result.model_dump())
+    return result
+
+def _publish(message: Dict[str, Any]) -> None:
     try:
         sqs_client.send_message(message)
     except Exception as e:
         # Log the error but don't fail the request
         print(f"Failed to send SQS message: {str(e)}")
-    
-    return created_booking
+
+def _publish_batch(messages: List[Dict[str, Any]]) -> None:
+    bodies = encode_bodies(messages)
+    for start in range(0, len(bodies), MAX_BATCH_SIZE):
+        chunk = bodies[start:start + MAX_BATCH_SIZE]
+        try:
+            sqs_client.send_message_batch({str(i): body for i, body in enumerate(chunk)})
+        except Exception as e:
+            print(f"Failed to send SQS message batch: {str(e)}")
 
 @app.get("/bookings/{booking_id}", response_model=Booking)
 async def get_booking(
     booking_id: int,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: DatabaseSession = Depends(get_read_session)
 ):
     """
     Get booking by ID.
     
+    The ETag response header holds the booking's version, to send back in
+    If-Match when confirming or cancelling it.
+    
     Args:
         booking_id: ID of the booking to retrieve
         db: Database session
@@ -89,8 +271,8 @@ async def get_booking(
     Returns:
         Booking details
     """
-    booking_repo = BookingRepository(db)
-    booking = booking_repo.get_by_id(booking_id)
+    booking_repo = AsyncBookingRepository(db)
+    booking = await booking_repo.get_by_id(booking_id)
     
     if not booking:
         raise HTTPException(
@@ -98,30 +280,214 @@ async def get_booking(
             detail="Booking not found"
         )
     
+    response.headers["ETag"] = _booking_etag(booking)
+    return booking
+
+@app.post("/bookings/{booking_id}/confirm", response_model=Booking)
+async def confirm_booking(
+    booking_id: int,
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: DatabaseSession = Depends(get_session)
+):
+    """
+    Confirm a pending booking.
+    
+    With If-Match the booking is only confirmed if its version still
+    matches (412 otherwise).
+    
+    Args:
+        booking_id: ID of the booking
+        background_tasks: Tasks run after the response is sent
+        db: Database session
+        
+    Returns:
+        Confirmed booking
+    """
+    return await _transition_booking(booking_id, "confirmed", request, response, background_tasks, db)
+
+@app.post("/bookings/{booking_id}/cancel", response_model=Booking)
+async def cancel_booking(
+    booking_id: int,
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: DatabaseSession = Depends(get_session)
+):
+    """
+    Cancel a pending or confirmed booking.
+    
+    With If-Match the booking is only cancelled if its version still
+    matches (412 otherwise).
+    
+    Args:
+        booking_id: ID of the booking
+        background_tasks: Tasks run after the response is sent
+        db: Database session
+        
+    Returns:
+        Cancelled booking
+    """
+    return await _transition_booking(booking_id, "cancelled", request, response, background_tasks, db)
+
+async def _transition_booking(
+    booking_id: int,
+    target: str,
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: DatabaseSession
+) -> Booking:
+    expected_version = _if_match_version(request.headers.get("if-match"))
+    booking_repo = AsyncBookingRepository(db)
+    try:
+        booking = await booking_repo.transition(booking_id, target, expected_version)
+    except BookingNotFoundError as e:
+        raise HTTPException(
+            status_code=404,
+            detail=str(e)
+        )
+    except BookingVersionMismatchError as e:
+        raise HTTPException(
+            status_code=412,
+            detail=str(e)
+        )
+    except InvalidStatusTransitionError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=str(e)
+        )
+    
+    if EVENT_PUBLISH_MODE == "outbox":
+        outbox_relay.notify()
+    else:
+        background_tasks.add_task(_publish, booking_event(booking, f"booking_{target}"))
+    
+    response.headers["ETag"] = _booking_etag(booking)
     return booking
 
+def _booking_etag(booking: Booking) -> str:
+    return f'"{booking.version}"'
+
+def _if_match_version(if_match: Optional[str]) -> Optional[int]:
+    """Version required by an If-Match header; None if absent or *."""
+    if not if_match or if_match.strip() == "*":
+        return None
+    tag = if_match.strip().removeprefix("W/").strip('"')
+    if not tag.isdigit():
+        raise HTTPException(
+            status_code=412,
+            detail="If-Match does not match the booking's version"
+        )
+    return int(tag)
+
 @app.get("/therapists/{therapist_id}/bookings", response_model=List[Booking])
 async def get_therapist_bookings(
     therapist_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    status: Optional[str] = Query(None, pattern="^(pending|confirmed|cancelled)$"),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    db: DatabaseSession = Depends(get_read_session)
 ):
     """
-    Get all bookings for a therapist.
+    Get bookings for a therapist, ordered by start time.
+    
+    Results are paginated by keyset: when more bookings follow, the
+    X-Next-Cursor response header holds the cursor of the next page.
+    Requesting NDJSON (format=ndjson or Accept: application/x-ndjson)
+    instead streams every matching booking after the cursor, one per line.
     
     Args:
         therapist_id: ID of the therapist
+        limit: Maximum number of bookings per page
+        cursor: Cursor from a previous page's X-Next-Cursor header
+        start_from: Only bookings starting at or after this time
+        start_to: Only bookings starting before this time
+        status: Only bookings with this status
+        format: json (default) or ndjson
         db: Database session
         
     Returns:
         List of bookings
     """
-    booking_repo = BookingRepository(db)
-    return booking_repo.get_by_therapist(therapist_id)
+    booking_repo = AsyncBookingRepository(db)
+    wants_ndjson = format == "ndjson" or (
+        format is None and "application/x-ndjson" in request.headers.get("accept", "")
+    )
+    try:
+        if wants_ndjson:
+            rows = booking_repo.iter_by_therapist(
+                therapist_id, cursor, start_from, start_to, status
+            )
+            return StreamingResponse(_ndjson_lines(rows), media_type="application/x-ndjson")
+        page = await booking_repo.page_by_therapist(
+            therapist_id, limit, cursor, start_from, start_to, status
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    
+    headers = {"X-Next-Cursor": page.next_cursor} if page.next_cursor else None
+    return FastJSONResponse(page.items, headers=headers)
+
+@app.post("/therapists/{therapist_id}/bookings/cancel", response_model=List[Booking])
+async def cancel_therapist_bookings(
+    therapist_id: int,
+    start_from: datetime,
+    start_to: datetime,
+    background_tasks: BackgroundTasks,
+    db: DatabaseSession = Depends(get_session)
+):
+    """
+    Cancel every pending or confirmed booking of a therapist starting in a range.
+    
+    Args:
+        therapist_id: ID of the therapist
+        start_from: Cancel bookings starting at or after this time
+        start_to: Cancel bookings starting before this time
+        background_tasks: Tasks run after the response is sent
+        db: Database session
+        
+    Returns:
+        The cancelled bookings, ordered by start time
+    """
+    if as_utc_naive(start_to) <= as_utc_naive(start_from):
+        raise HTTPException(
+            status_code=400,
+            detail="start_to must be after start_from"
+        )
+    therapist_repo = AsyncTherapistRepository(db)
+    if not await therapist_repo.exists(therapist_id):
+        raise HTTPException(
+            status_code=404,
+            detail="Therapist not found"
+        )
+    
+    cancelled = await AsyncBookingRepository(db).cancel_range(therapist_id, start_from, start_to)
+    if cancelled:
+        if EVENT_PUBLISH_MODE == "outbox":
+            outbox_relay.notify()
+        else:
+            background_tasks.add_task(
+                _publish_batch, [booking_event(booking, "booking_cancelled") for booking in cancelled]
+            )
+    return cancelled
+
+async def _ndjson_lines(bookings: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    async for booking in bookings:
+        yield dumps(booking) + b"\n"
 
 @app.post("/therapists", response_model=Therapist)
 async def create_therapist(
     therapist: Therapist,
-    db: Session = Depends(get_db)
+    db: DatabaseSession = Depends(get_session)
 ):
     """
     Create a new therapist.
@@ -133,29 +499,58 @@ async def create_therapist(
     Returns:
         Created therapist
     """
-    therapist_repo = TherapistRepository(db)
-    return therapist_repo.create(therapist)
+    therapist_repo = AsyncTherapistRepository(db)
+    return await therapist_repo.create(therapist)
 
 @app.get("/therapists", response_model=List[Therapist])
 async def list_therapists(
-    db: Session = Depends(get_db)
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: DatabaseSession = Depends(get_read_session)
 ):
     """
-    List all therapists.
+    List therapists, ordered by ID.
+    
+    When more therapists follow, the X-Next-Cursor response header holds the
+    cursor of the next page. Responses carry an ETag; sending it back in
+    If-None-Match returns 304 while the page is unchanged.
     
     Args:
+        limit: Maximum number of therapists per page
+        cursor: Cursor from a previous page's X-Next-Cursor header
         db: Database session
         
     Returns:
         List of therapists
     """
-    therapist_repo = TherapistRepository(db)
-    return therapist_repo.list_all()
+    therapist_repo = AsyncTherapistRepository(db)
+    try:
+        page = await therapist_repo.list_page(limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    
+    if _etag_matches(request.headers.get("if-none-match"), page.etag):
+        return Response(status_code=304, headers={"ETag": page.etag})
+    
+    headers = {"ETag": page.etag}
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    return Response(page.body, media_type="application/json", headers=headers)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
 
 @app.get("/therapists/{therapist_id}", response_model=Therapist)
 async def get_therapist(
     therapist_id: int,
-    db: Session = Depends(get_db)
+    db: DatabaseSession = Depends(get_read_session)
 ):
     """
     Get therapist by ID.
@@ -167,8 +562,8 @@ async def get_therapist(
     Returns:
         Therapist details
     """
-    therapist_repo = TherapistRepository(db)
-    therapist = therapist_repo.get_by_id(therapist_id)
+    therapist_repo = AsyncTherapistRepository(db)
+    therapist = await therapist_repo.get_by_id(therapist_id)
     
     if not therapist:
         raise HTTPException(
@@ -176,4 +571,222 @@ async def get_therapist(
             detail="Therapist not found"
         )
     
-    return therapist 
\ No newline at end of file
+    return therapist
+
+@app.put("/therapists/{therapist_id}/working-hours", response_model=List[WorkingHours])
+async def set_working_hours(
+    therapist_id: int,
+    hours: List[WorkingHours],
+    db: DatabaseSession = Depends(get_session)
+):
+    """
+    Replace a therapist's weekly working hours.
+    
+    Hours are in UTC; weekday 0 is Monday. A shift past midnight is given
+    as two entries.
+    
+    Args:
+        therapist_id: ID of the therapist
+        hours: The complete weekly schedule
+        db: Database session
+        
+    Returns:
+        Stored working hours
+    """
+    if not all(entry.validate_times() for entry in hours):
+        raise HTTPException(
+            status_code=400,
+            detail="End time must be after start time"
+        )
+    
+    hours_repo = AsyncWorkingHoursRepository(db)
+    try:
+        return await hours_repo.replace(therapist_id, hours)
+    except TherapistNotFoundError as e:
+        raise HTTPException(
+            status_code=404,
+            detail=str(e)
+        )
+
+@app.get("/therapists/{therapist_id}/working-hours", response_model=List[WorkingHours])
+async def get_working_hours(
+    therapist_id: int,
+    db: DatabaseSession = Depends(get_read_session)
+):
+    """
+    Get a therapist's weekly working hours.
+    
+    Args:
+        therapist_id: ID of the therapist
+        db: Database session
+        
+    Returns:
+        Working hours ordered by weekday and start time
+    """
+    therapist_repo = AsyncTherapistRepository(db)
+    if not await therapist_repo.exists(therapist_id):
+        raise HTTPException(
+            status_code=404,
+            detail="Therapist not found"
+        )
+    return await AsyncWorkingHoursRepository(db).get_by_therapist(therapist_id)
+
+@app.get("/therapists/{therapist_id}/availability", response_model=Availability)
+async def get_therapist_availability(
+    therapist_id: int,
+    start: datetime,
+    end: datetime,
+    min_duration: int = Query(1, ge=1, le=24 * 60),
+    db: DatabaseSession = Depends(get_read_session)
+):
+    """
+    Free time of a therapist within their working hours.
+    
+    The gaps are computed server-side from the working hours and the active
+    bookings overlapping the window, so no booking rows leave the API.
+    
+    Args:
+        therapist_id: ID of the therapist
+        start: Window start
+        end: Window end, at most a year after start
+        min_duration: Shortest free interval to return, in minutes
+        db: Database session
+        
+    Returns:
+        Free intervals in UTC, in order
+    """
+    _validate_window(start, end, MAX_AVAILABILITY_WINDOW)
+    therapist_repo = AsyncTherapistRepository(db)
+    if not await therapist_repo.exists(therapist_id):
+        raise HTTPException(
+            status_code=404,
+            detail="Therapist not found"
+        )
+    
+    hours = await AsyncWorkingHoursRepository(db).weekly_hours([therapist_id])
+    busy = await AsyncBookingRepository(db).busy_intervals(start, end, [therapist_id])
+    free = free_intervals(
+        working_intervals(hours.get(therapist_id, []), start, end),
+        busy.get(therapist_id, []),
+        timedelta(minutes=min_duration)
+    )
+    return Availability(
+        therapist_id=therapist_id,
+        slots=[TimeSlot(start_time=_utc(slot_start), end_time=_utc(slot_end)) for slot_start, slot_end in free]
+    )
+
+@app.get("/availability/search", response_model=List[AvailableSlot])
+async def search_availability(
+    start: datetime,
+    end: datetime,
+    duration: int = Query(..., ge=1, le=24 * 60),
+    limit: int = Query(10, ge=1, le=100),
+    therapist_id: Optional[List[int]] = Query(None),
+    db: DatabaseSession = Depends(get_read_session)
+):
+    """
+    The earliest free slots of a given length across therapists.
+    
+    Therapists with working hours are searched in pages of
+    MAX_SEARCH_THERAPISTS, by ID, and each page's slots are merged into the
+    result. Bookings are only read for therapists whose working hours alone
+    could beat the slots found so far, and the search stops early once
+    every slot found starts at the window start.
+    
+    Args:
+        start: Window start
+        end: Window end, at most 31 days after start
+        duration: Slot length in minutes
+        limit: Number of slots to return
+        therapist_id: Only these therapists (repeatable); all by default
+        db: Database session
+        
+    Returns:
+        Slots ordered by start time, then therapist ID
+    """
+    _validate_window(start, end, MAX_SEARCH_WINDOW)
+    slot_length = timedelta(minutes=duration)
+    hours_repo = AsyncWorkingHoursRepository(db)
+    booking_repo = AsyncBookingRepository(db)
+    found: List[Tuple[int, datetime, datetime]] = []
+    after = None
+    while True:
+        hours = await hours_repo.weekly_hours(therapist_id, after, MAX_SEARCH_THERAPISTS)
+        if not hours:
+            break
+        after = max(hours)
+        schedules = therapist_schedules(hours, {}, start, end)
+        # Later pages have greater IDs, so they only win on an earlier start
+        cutoff = found[-1][1] if len(found) == limit else None
+        candidates = [
+            candidate for candidate, (working, _) in sorted(schedules.items())
+            if (earliest := earliest_slot_start(working, slot_length)) is not None
+            and (cutoff is None or earliest < cutoff)
+        ]
+        if candidates:
+            busy = await booking_repo.busy_intervals(start, end, candidates)
+            found = sorted(
+                found + first_free_slots(
+                    {candidate: (schedules[candidate][0], busy.get(candidate, [])) for candidate in candidates},
+                    slot_length, limit
+                ),
+                key=lambda slot: (slot[1], slot[0])
+            )[:limit]
+        # No slot starts before the window, so a full result at its start is final
+        if len(hours) < MAX_SEARCH_THERAPISTS or (
+            len(found) == limit and found[-1][1] <= as_utc_naive(start)
+        ):
+            break
+    return [
+        AvailableSlot(therapist_id=candidate, start_time=_utc(slot_start), end_time=_utc(slot_end))
+        for candidate, slot_start, slot_end in found
+    ]
+
+def _validate_window(start: datetime, end: datetime, max_window: timedelta) -> None:
+    start, end = as_utc_naive(start), as_utc_naive(end)
+    if end <= start:
+        raise HTTPException(
+            status_code=400,
+            detail="End must be after start"
+        )
+    if end - start > max_window:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Window must not exceed {max_window.days} days"
+        )
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc)
+
+_lambda_adapter = None
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    AWS Lambda entry point: serves API Gateway proxy events with the app.
+    
+    The adapter, like the database engine and SQS client, is created on first
+    use so the container's init phase only imports the application.
+    
+    In outbox mode, messages written by the request are relayed before
+    returning: a frozen container runs no background relay, and one that is
+    reclaimed never would. Messages whose sending fails are backed off and
+    left to the scheduled relay (outbox.lambda_handler).
+    
+    Args:
+        event: API Gateway REST or HTTP API proxy event
+        context: Lambda context
+        
+    Returns:
+        API Gateway proxy response
+    """
+    global _lambda_adapter
+    if _lambda_adapter is None:
+        from .infrastructure.lambda_adapter import LambdaAdapter
+        _lambda_adapter = LambdaAdapter(app)
+    response = _lambda_adapter(event, context)
+    if EVENT_PUBLISH_MODE == "outbox" and outbox_relay.pending:
+        try:
+            outbox_relay.drain()
+        except Exception as e:
+            print(f"Outbox relay error: {str(e)}")
+    return response
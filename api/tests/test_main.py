@@ -1,31 +1,89 @@
 import pytest
+import pytest_asyncio
+from unittest.mock import MagicMock
+import httpx
 from fastapi.testclient import TestClient
-from datetime import datetime, timedelta
-from sqlalchemy import create_engine
+from alembic import command
+from alembic.config import Config
+from datetime import datetime, time, timedelta, timezone
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
+import json
+import re
+import shutil
+import subprocess
 import sys
+import sysconfig
+import threading
 import os
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.main import app
-from src.infrastructure.database import Base, get_db
-from src.infrastructure.models import TherapistModel, BookingModel
+from booking_events.envelope import COMPRESS_MIN_BYTES, decode, encode_batch, encode_event
+import src.main
+import src.infrastructure.database
+from src.main import app, lambda_handler
+from src.infrastructure.database import Base, check_conflict_strategy, enable_sqlite_foreign_keys, get_db
+from src.infrastructure.models import ArchivedBookingModel, TherapistModel, BookingModel, OutboxMessageModel
+from src.infrastructure.outbox import OutboxRelay
+from src.infrastructure.partitions import (
+    add_months,
+    ensure_partitions,
+    is_partitioned,
+    maintain,
+    month_start,
+    partition_name,
+    partition_of,
+)
+from src.infrastructure.sqs import SQSClient, encode_bodies
+from src.infrastructure.async_repository import (
+    AsyncBookingRepository,
+    AsyncTherapistRepository,
+    AsyncUnitOfWork,
+)
+from src.infrastructure.metrics import db_queries_per_request, http_requests, sqs_request_failures
+from src.infrastructure.pool import create_pooled_engine, engine_options, pool_metrics
+from src.infrastructure.pool import InstrumentedNullPool
+from src.infrastructure.replicas import PRIMARY_PIN_COOKIE, ReplicaRouter
+from src.infrastructure.schedule_index import ScheduleIndex
+from src.infrastructure.cache import TTLCache
+from src.infrastructure.repository import (
+    BookingRepository,
+    TherapistRepository,
+    UnitOfWork,
+    WorkingHoursRepository,
+    known_therapist_ids,
+    schedule_index,
+    therapist_directory_cache,
+)
+from src.core.availability import first_free_slots, free_intervals, working_intervals
+from src.core.exceptions import BookingConflictError, TherapistNotFoundError
+from src.core.intervals import IntervalSet
+from src.core.models import BookingCreate, Therapist, WorkingHours
 
 # Create in-memory SQLite database for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# Throwaway PostgreSQL database for the tests of the PostgreSQL-only paths,
+# which reset its public schema; they are skipped without it
+POSTGRES_TEST_URL = os.getenv("POSTGRES_TEST_URL", "")
+postgres_only = pytest.mark.skipif(not POSTGRES_TEST_URL, reason="POSTGRES_TEST_URL is not set")
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+enable_sqlite_foreign_keys(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 @pytest.fixture
 def db_session():
     Base.metadata.create_all(bind=engine)
+    therapist_directory_cache.clear()
+    known_therapist_ids.clear()
+    schedule_index.clear()
     db = TestingSessionLocal()
     try:
         yield db
@@ -33,6 +91,15 @@ def db_session():
         db.close()
         Base.metadata.drop_all(bind=engine)
 
+@pytest_asyncio.fixture
+async def async_db_session():
+    async_engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(async_engine, autoflush=False) as db:
+        yield db
+    await async_engine.dispose()
+
 @pytest.fixture
 def client(db_session):
     def override_get_db():
@@ -48,7 +115,8 @@ def client(db_session):
 def test_therapist(db_session):
     therapist = TherapistModel(
         name="Test Therapist",
-        email="therapist@test.com"
+        email="therapist@test.com",
+        phone="+15555550100"
     )
     db_session.add(therapist)
     db_session.commit()
@@ -60,6 +128,108 @@ def test_health_check(client):
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
 
+def test_pool_health(client):
+    response = client.get("/health/pool")
+    assert response.status_code == 200
+    assert "checkout_wait_seconds_max" in response.json()
+
+def test_pool_profiles(tmp_path):
+    assert engine_options("lambda")["poolclass"] is InstrumentedNullPool
+    assert engine_options("pgbouncer", is_async=True)["connect_args"] == {"statement_cache_size": 0}
+    with pytest.raises(ValueError):
+        engine_options("unknown")
+
+    pool_metrics.reset()
+    pooled_engine = create_pooled_engine(f"sqlite:///{tmp_path / 'pool.db'}", "server")
+    with pooled_engine.connect():
+        assert pool_metrics.snapshot()["checked_out"] == 1
+    pooled_engine.dispose()
+
+    snapshot = pool_metrics.snapshot()
+    assert snapshot["checkouts"] == 1
+    assert snapshot["checked_out"] == 0
+    assert snapshot["connections_open"] == 0
+    assert sum(snapshot["checkout_wait_buckets"].values()) == 1
+
+def _replica_files(tmp_path, names):
+    urls = []
+    for name in names:
+        url = f"sqlite:///{tmp_path / name}.db"
+        replica_engine = create_engine(url)
+        Base.metadata.create_all(bind=replica_engine)
+        with TestingSessionLocal(bind=replica_engine) as db:
+            db.add(TherapistModel(id=1, name=name, email=f"{name}@test.com", phone="+15555550100"))
+            db.commit()
+        replica_engine.dispose()
+        urls.append(url)
+    return urls
+
+def test_replica_router_selection(tmp_path):
+    urls = _replica_files(tmp_path, ["a", "b", "c"])
+    lags = {urls[0]: 0.0, urls[1]: 0.5, urls[2]: 30.0}
+    router = ReplicaRouter(
+        urls,
+        create_engine,
+        max_lag=5,
+        lag_check_interval=60,
+        lag_probe=lambda connection: lags[str(connection.engine.url)]
+    )
+    # The lagging replica is skipped; the others alternate
+    picked = [router.select().url for _ in range(4)]
+    assert picked == [urls[0], urls[1], urls[0], urls[1]]
+    assert router.snapshot()["replicas"][2]["lag"] == 30.0
+
+    router.selection = "least_connections"
+    with router.replicas[0].engine.connect():
+        assert [router.select().url for _ in range(3)] == [urls[1]] * 3
+    assert router.replicas[0].in_use == 0
+
+    # No replica within the limit: the primary serves the read
+    lags.update({urls[0]: 10.0, urls[1]: 10.0})
+    router.refresh_lag()
+    assert router.select() is None
+    assert router.snapshot()["primary_fallbacks"] == 1
+
+    def unreachable(connection):
+        raise RuntimeError("connection refused")
+    router.lag_probe = unreachable
+    router.refresh_lag()
+    assert all(replica.lag is None for replica in router.replicas)
+
+    with pytest.raises(ValueError):
+        ReplicaRouter(urls, create_engine, selection="random")
+
+def test_reads_routed_to_replica(client, test_therapist, tmp_path, monkeypatch):
+    router = ReplicaRouter(_replica_files(tmp_path, ["replica"]), create_engine)
+    monkeypatch.setattr(src.infrastructure.database, "replica_router", router)
+
+    assert client.get("/therapists/1").json()["name"] == "replica"
+    assert client.get("/health/pool").json()["replicas"]["replicas"][0]["selected"] == 1
+
+    # A write pins the client to the primary for the read-your-writes window
+    response = client.post("/therapists", json={
+        "name": "New Therapist", "email": "new@test.com", "phone": "+15555550101"
+    })
+    assert response.status_code == 200
+    assert PRIMARY_PIN_COOKIE in response.cookies
+    assert client.get("/therapists/1").json()["name"] == "Test Therapist"
+
+    client.cookies.clear()
+    assert client.get("/therapists/1").json()["name"] == "replica"
+
+    # Writes still go to the primary
+    response = client.post("/bookings", json={
+        "therapist_id": test_therapist.id,
+        "client_name": "Client",
+        "client_email": "client@test.com",
+        "start_time": (datetime.now() + timedelta(days=1)).isoformat(),
+        "end_time": (datetime.now() + timedelta(days=1, hours=1)).isoformat()
+    })
+    assert response.status_code == 200
+    assert client.get(f"/bookings/{response.json()['id']}").status_code == 200
+    client.cookies.clear()
+    assert client.get(f"/bookings/{response.json()['id']}").status_code == 404
+
 def test_create_booking(client, test_therapist, db_session):
     start_time = datetime.now() + timedelta(days=1)
     end_time = start_time + timedelta(hours=1)
@@ -81,6 +251,41 @@ def test_create_booking(client, test_therapist, db_session):
     assert data["client_email"] == "client@test.com"
     assert data["status"] == "pending"
 
+def test_request_metrics(client, test_therapist):
+    start_time = datetime.now() + timedelta(days=2)
+    requests_before = http_requests.value("POST", "/bookings", "200")
+    queries_before = db_queries_per_request.count("/bookings")
+    response = client.post("/bookings", json={
+        "therapist_id": test_therapist.id,
+        "client_name": "Test Client",
+        "client_email": "client@test.com",
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(hours=1)).isoformat()
+    })
+    assert response.status_code == 200
+    timing = dict(
+        (entry.split(";")[0], entry) for entry in response.headers["server-timing"].split(", ")
+    )
+    assert {"validate", "therapist_check", "create", "commit", "from_orm", "db", "total"} <= set(timing)
+    assert "queries" in timing["db"]
+    assert http_requests.value("POST", "/bookings", "200") == requests_before + 1
+    assert db_queries_per_request.count("/bookings") == queries_before + 1
+
+    # Unknown paths share one label
+    client.get("/no/such/path")
+    body = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{method="POST",route="/bookings",le="+Inf"}' in body
+    assert "# TYPE db_query_duration_seconds histogram" in body
+
+    sqs = SQSClient()
+    sqs._sqs = MagicMock()
+    sqs._sqs.send_message.side_effect = RuntimeError("throttled")
+    failures_before = sqs_request_failures.value("send_message")
+    with pytest.raises(Exception):
+        sqs.send_message({"booking_id": 1})
+    assert sqs_request_failures.value("send_message") == failures_before + 1
+
 def test_create_booking_invalid_times(client, test_therapist):
     start_time = datetime.now() + timedelta(days=1)
     end_time = start_time - timedelta(hours=1)  # End time before start time
@@ -169,4 +374,1132 @@ def test_get_therapist_bookings(client, test_therapist, db_session):
     
     data = response.json()
     assert len(data) == 3
-    assert all(b["therapist_id"] == test_therapist.id for b in data) 
\ No newline at end of file
+    assert all(b["therapist_id"] == test_therapist.id for b in data) 
+
+def test_create_booking_overlap_conflict(client, test_therapist):
+    start_time = datetime.now() + timedelta(days=1)
+    first = {
+        "therapist_id": test_therapist.id,
+        "client_name": "First Client",
+        "client_email": "first@test.com",
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(hours=1)).isoformat()
+    }
+    overlapping = dict(
+        first,
+        client_name="Second Client",
+        client_email="second@test.com",
+        start_time=(start_time + timedelta(minutes=30)).isoformat(),
+        end_time=(start_time + timedelta(hours=2)).isoformat()
+    )
+
+    assert client.post("/bookings", json=first).status_code == 200
+    response = client.post("/bookings", json=overlapping)
+    assert response.status_code == 409
+    assert "conflicts" in response.json()["detail"]
+
+def test_find_conflict_normalizes_aware_times(test_therapist, db_session):
+    day = (datetime.now(timezone.utc) + timedelta(days=1)).replace(tzinfo=None)
+    start_time = day.replace(hour=10, minute=0, second=0, microsecond=0)
+    db_session.add(BookingModel(
+        therapist_id=test_therapist.id,
+        client_name="Test Client",
+        client_email="client@test.com",
+        start_time=start_time,
+        end_time=start_time + timedelta(hours=1),
+        status="pending"
+    ))
+    db_session.commit()
+
+    # 11:30-12:30 at +02:00 is 09:30-10:30 UTC, overlapping the stored booking
+    offset = timezone(timedelta(hours=2))
+    start = (start_time + timedelta(hours=1, minutes=30)).replace(tzinfo=offset)
+    conflict = BookingRepository(db_session).find_conflict(test_therapist.id, start, start + timedelta(hours=1))
+    assert conflict is not None and conflict.start_time == start_time
+    # 13:00-14:00 at +02:00 is 11:00-12:00 UTC, right after it
+    start = (start_time + timedelta(hours=3)).replace(tzinfo=offset)
+    assert BookingRepository(db_session).find_conflict(test_therapist.id, start, start + timedelta(hours=1)) is None
+
+def test_create_booking_adjacent_and_earlier_allowed(client, test_therapist):
+    start_time = datetime.now() + timedelta(days=1)
+    slots = [
+        (start_time, start_time + timedelta(hours=1)),
+        (start_time + timedelta(hours=1), start_time + timedelta(hours=2)),
+        (start_time - timedelta(hours=2), start_time - timedelta(hours=1)),
+    ]
+
+    for i, (start, end) in enumerate(slots):
+        response = client.post("/bookings", json={
+            "therapist_id": test_therapist.id,
+            "client_name": f"Client {i}",
+            "client_email": f"client{i}@test.com",
+            "start_time": start.isoformat(),
+            "end_time": end.isoformat()
+        })
+        assert response.status_code == 200
+
+def test_create_booking_over_cancelled_booking(client, test_therapist, db_session):
+    start_time = datetime.now() + timedelta(days=1)
+    end_time = start_time + timedelta(hours=1)
+    db_session.add(BookingModel(
+        therapist_id=test_therapist.id,
+        client_name="Cancelled Client",
+        client_email="cancelled@test.com",
+        start_time=start_time,
+        end_time=end_time,
+        status="cancelled"
+    ))
+    db_session.commit()
+
+    response = client.post("/bookings", json={
+        "therapist_id": test_therapist.id,
+        "client_name": "Test Client",
+        "client_email": "client@test.com",
+        "start_time": start_time.isoformat(),
+        "end_time": end_time.isoformat()
+    })
+    assert response.status_code == 200
+
+@pytest.fixture
+def therapist_schedule(test_therapist, db_session):
+    start_time = datetime(2030, 1, 1, 9)
+    for i in range(5):
+        db_session.add(BookingModel(
+            therapist_id=test_therapist.id,
+            client_name=f"Test Client {i}",
+            client_email=f"client{i}@test.com",
+            start_time=start_time + timedelta(hours=i),
+            end_time=start_time + timedelta(hours=i, minutes=50),
+            status="cancelled" if i == 2 else "pending"
+        ))
+    db_session.commit()
+    return start_time
+
+def test_get_therapist_bookings_keyset_pages(client, test_therapist, therapist_schedule):
+    url = f"/therapists/{test_therapist.id}/bookings"
+    response = client.get(url, params={"limit": 2})
+    assert response.status_code == 200
+    names = [b["client_name"] for b in response.json()]
+
+    while "X-Next-Cursor" in response.headers:
+        response = client.get(url, params={"limit": 2, "cursor": response.headers["X-Next-Cursor"]})
+        assert response.status_code == 200
+        names += [b["client_name"] for b in response.json()]
+
+    assert names == [f"Test Client {i}" for i in range(5)]
+
+def test_get_therapist_bookings_filters(client, test_therapist, therapist_schedule):
+    response = client.get(f"/therapists/{test_therapist.id}/bookings", params={
+        "start_from": (therapist_schedule + timedelta(hours=1)).isoformat(),
+        "start_to": (therapist_schedule + timedelta(hours=4)).isoformat(),
+        "status": "pending"
+    })
+    assert response.status_code == 200
+    assert [b["client_name"] for b in response.json()] == ["Test Client 1", "Test Client 3"]
+
+def test_get_therapist_bookings_invalid_cursor(client, test_therapist):
+    response = client.get(f"/therapists/{test_therapist.id}/bookings", params={"cursor": "nope"})
+    assert response.status_code == 400
+
+def test_stream_therapist_bookings_ndjson(client, test_therapist, therapist_schedule):
+    response = client.get(
+        f"/therapists/{test_therapist.id}/bookings",
+        params={"limit": 1},
+        headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [b["client_name"] for b in lines] == [f"Test Client {i}" for i in range(5)]
+
+def test_list_therapists_pages(client):
+    for i in range(3):
+        client.post("/therapists", json={
+            "name": f"Therapist {i}",
+            "email": f"therapist{i}@test.com",
+            "phone": "+15555550100"
+        })
+
+    response = client.get("/therapists", params={"limit": 2})
+    assert [t["name"] for t in response.json()] == ["Therapist 0", "Therapist 1"]
+    response = client.get("/therapists", params={"limit": 2, "cursor": response.headers["X-Next-Cursor"]})
+    assert [t["name"] for t in response.json()] == ["Therapist 2"]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_list_therapists_etag_and_cache(client, test_therapist, db_session):
+    response = client.get("/therapists")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get("/therapists", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Writes outside the repository are only seen once the entry expires
+    db_session.add(TherapistModel(name="Direct", email="direct@test.com", phone="+15555550102"))
+    db_session.commit()
+    assert client.get("/therapists", headers={"If-None-Match": etag}).status_code == 304
+
+    # Creating through the repository invalidates the cached directory
+    client.post("/therapists", json={
+        "name": "Another Therapist",
+        "email": "another@test.com",
+        "phone": "+15555550103"
+    })
+    response = client.get("/therapists", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+    assert response.headers["ETag"] != etag
+
+def test_ttl_cache_expiry_and_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache.set("short", 4, ttl=0)
+    assert cache.get("short") is None
+
+def test_therapist_exists_is_cached(test_therapist, db_session):
+    therapist_repo = TherapistRepository(db_session)
+    assert therapist_repo.exists(test_therapist.id)
+    assert not therapist_repo.exists(999)
+
+    # Once known, the ID is answered without touching the database
+    db_session.delete(test_therapist)
+    db_session.commit()
+    assert therapist_repo.exists(test_therapist.id)
+
+def test_create_booking_foreign_key_rejects_unknown_therapist(db_session):
+    start_time = datetime.now() + timedelta(days=1)
+    with pytest.raises(TherapistNotFoundError):
+        BookingRepository(db_session).create(BookingCreate(
+            therapist_id=999,
+            client_name="Test Client",
+            client_email="client@test.com",
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=1)
+        ))
+
+def test_create_booking_foreign_key_mode(client, monkeypatch):
+    monkeypatch.setattr("src.main.THERAPIST_CHECK_MODE", "foreign_key")
+    start_time = datetime.now() + timedelta(days=1)
+    response = client.post("/bookings", json={
+        "therapist_id": 999,
+        "client_name": "Test Client",
+        "client_email": "client@test.com",
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(hours=1)).isoformat()
+    })
+    assert response.status_code == 404
+    assert "Therapist not found" in response.json()["detail"]
+
+def test_create_booking_writes_outbox(client, test_therapist, db_session):
+    start_time = datetime.now() + timedelta(days=1)
+    response = client.post("/bookings", json={
+        "therapist_id": test_therapist.id,
+        "client_name": "Test Client",
+        "client_email": "client@test.com",
+        "client_phone": "+15555550123",
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(hours=1)).isoformat()
+    })
+    assert response.status_code == 200
+
+    messages = db_session.query(OutboxMessageModel).all()
+    assert len(messages) == 1
+    [payload] = decode(messages[0].payload)
+    assert payload["booking_id"] == response.json()["id"]
+    assert payload["event_type"] == "booking_created"
+    # The consumer's SMS channel texts the client at this number
+    assert payload["client_phone"] == response.json()["client_phone"] == "+15555550123"
+
+def test_outbox_relay_batches_and_retries(db_session):
+    db_session.add_all(
+        OutboxMessageModel(payload=json.dumps({"booking_id": i}), available_at=datetime(2000, 1, 1))
+        for i in range(12)
+    )
+    db_session.commit()
+    failed_id = str(db_session.query(OutboxMessageModel).first().id)
+
+    sqs = MagicMock()
+    sqs.send_message_batch.side_effect = lambda messages: {
+        "Failed": [{"Id": failed_id, "Code": "Throttled"}] if failed_id in messages else []
+    }
+    relay = OutboxRelay(TestingSessionLocal, sqs)
+
+    assert relay.drain_once() == 11
+    assert [len(call.args[0]) for call in sqs.send_message_batch.call_args_list] == [10, 2]
+
+    db_session.expire_all()
+    remaining = db_session.query(OutboxMessageModel).all()
+    assert len(remaining) == 1
+    assert remaining[0].attempts == 1
+    assert remaining[0].last_error == "Throttled"
+
+def test_event_envelope(monkeypatch):
+    def event(booking_id, event_type="booking_created"):
+        start = datetime(2030, 1, 7, 9) + timedelta(hours=booking_id)
+        return {
+            "event_type": event_type,
+            "booking_id": booking_id,
+            "therapist_id": 1,
+            "client_email": f"client{booking_id}@test.com",
+            "start_time": start,
+            "end_time": start + timedelta(minutes=50),
+            "client_phone": "+15555550100" if booking_id % 2 else None,
+        }
+
+    def as_json(message):
+        # Version 1 shape: naive times are UTC
+        return {
+            **message,
+            "start_time": message["start_time"].replace(tzinfo=timezone.utc).isoformat(),
+            "end_time": message["end_time"].replace(tzinfo=timezone.utc).isoformat(),
+        }
+
+    single = event(1, "booking_rescheduled")
+    body = encode_event(single)
+    assert decode(body) == [as_json(single)]
+    assert len(body) < len(json.dumps(as_json(single)))
+
+    events = [event(n) for n in range(50)]
+    compressed, plain = encode_batch(events), encode_batch(events, compress=False)
+    assert len(compressed) < len(plain)
+    assert decode(compressed) == decode(plain) == [as_json(message) for message in events]
+    assert len(encode_batch(events[:2])) < COMPRESS_MIN_BYTES
+
+    # Bodies of the previous version still decode
+    assert decode(json.dumps({"booking_id": 1})) == [{"booking_id": 1}]
+    with pytest.raises(ValueError):
+        decode("kgMA")  # msgpack [3, 0]
+
+    # JSON until every consumer decodes the envelope
+    bodies = encode_bodies(events[:2])
+    assert [json.loads(body)["booking_id"] for body in bodies] == [0, 1]
+    monkeypatch.setattr("src.infrastructure.sqs.EVENT_ENCODING", "msgpack")
+    monkeypatch.setattr("src.infrastructure.sqs.EVENT_BATCH_SIZE", 20)
+    assert [len(decode(body)) for body in encode_bodies(events)] == [20, 20, 10]
+
+def _batch_items(therapist_id, start_time):
+    def item(offset_hours, hours=1, therapist=therapist_id):
+        start = start_time + timedelta(hours=offset_hours)
+        return {
+            "therapist_id": therapist,
+            "client_name": "Batch Client",
+            "client_email": "batch@test.com",
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=hours)).isoformat()
+        }
+    return [
+        item(0),                 # created
+        item(0.5),               # overlaps item 0
+        item(2),                 # overlaps the existing booking
+        item(4, therapist=999),  # unknown therapist
+        item(5, hours=-1),       # ends before it starts
+        item(6),                 # created
+    ]
+
+def test_create_bookings_batch_partial(client, test_therapist, db_session, monkeypatch):
+    monkeypatch.setattr("src.infrastructure.sqs.EVENT_ENCODING", "msgpack")
+    start_time = datetime(2030, 1, 1, 9)
+    db_session.add(BookingModel(
+        therapist_id=test_therapist.id,
+        client_name="Existing Client",
+        client_email="existing@test.com",
+        start_time=start_time + timedelta(hours=2),
+        end_time=start_time + timedelta(hours=3),
+        status="pending"
+    ))
+    db_session.commit()
+
+    response = client.post("/bookings/batch", json={
+        "items": _batch_items(test_therapist.id, start_time),
+        "all_or_nothing": False
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert [r["status"] for r in data["results"]] == [
+        "created", "rejected", "rejected", "rejected", "rejected", "created"
+    ]
+    assert "Therapist not found" in data["results"][3]["error"]
+    assert db_session.query(BookingModel).count() == 3
+    # The batch's events share one batch envelope
+    [message] = db_session.query(OutboxMessageModel).all()
+    assert [event["booking_id"] for event in decode(message.payload)] == [
+        r["booking"]["id"] for r in data["results"] if r["status"] == "created"
+    ]
+
+def test_create_bookings_batch_all_or_nothing(client, test_therapist, db_session):
+    response = client.post("/bookings/batch", json={
+        "items": _batch_items(test_therapist.id, datetime(2030, 1, 1, 9))
+    })
+    assert response.status_code == 422
+    statuses = [r["status"] for r in response.json()["results"]]
+    assert statuses[0] == "skipped"
+    assert statuses[1] == "rejected"
+    assert db_session.query(BookingModel).count() == 0
+
+    response = client.post("/bookings/batch", json={
+        "items": [_batch_items(test_therapist.id, datetime(2030, 1, 1, 9))[0]]
+    })
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+
+@pytest.mark.asyncio
+async def test_async_repositories(async_db_session):
+    therapist = await AsyncTherapistRepository(async_db_session).create(Therapist(
+        name="Async Therapist",
+        email="async@test.com",
+        phone="+15555550101"
+    ))
+    start_time = datetime.now() + timedelta(days=1)
+    booking = BookingCreate(
+        therapist_id=therapist.id,
+        client_name="Async Client",
+        client_email="client@test.com",
+        start_time=start_time,
+        end_time=start_time + timedelta(hours=1)
+    )
+
+    booking_repo = AsyncBookingRepository(async_db_session)
+    created = await booking_repo.create(booking)
+    assert (await booking_repo.get_by_id(created.id)).client_name == "Async Client"
+    assert len(await booking_repo.get_by_therapist(therapist.id)) == 1
+
+    with pytest.raises(BookingConflictError):
+        await booking_repo.create(booking)
+
+    streamed = [b async for b in booking_repo.iter_by_therapist(therapist.id)]
+    assert [b["id"] for b in streamed] == [created.id]
+
+@pytest.mark.asyncio
+async def test_async_exists_keeps_shared_cache_off_the_event_loop(async_db_session, monkeypatch):
+    class SharedCache:
+        # Stands in for RedisCache, whose calls block on the network
+        def __init__(self):
+            self.entries, self.threads = {}, []
+
+        def get(self, key, default=None):
+            self.threads.append(threading.get_ident())
+            return self.entries.get(key, default)
+
+        def set(self, key, value, ttl=None):
+            self.threads.append(threading.get_ident())
+            self.entries[key] = value
+
+    cache = SharedCache()
+    monkeypatch.setattr("src.infrastructure.async_repository.known_therapist_ids", cache)
+    therapist_repo = AsyncTherapistRepository(async_db_session)
+    therapist = await therapist_repo.create(Therapist(
+        name="Cached Therapist", email="cached@test.com", phone="+15555550102"
+    ))
+
+    assert await therapist_repo.exists(therapist.id)
+    assert await therapist_repo.exists(therapist.id)
+    assert not await therapist_repo.exists(therapist.id + 1)
+    assert cache.entries == {therapist.id: True}
+    # Miss and set, hit, miss: none of them on the event loop's thread
+    assert len(cache.threads) == 4
+    assert threading.get_ident() not in cache.threads
+
+def test_writes_skip_refresh_and_share_unit_of_work(db_session):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0])
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        therapist = TherapistRepository(db_session).create(Therapist(
+            name="Unit Therapist", email="unit@test.com", phone="+15555550101"
+        ))
+        assert statements == ["INSERT"]
+        assert therapist.id is not None and therapist.created_at is not None
+
+        start_time = datetime(2030, 3, 4, 9)
+        booking = BookingCreate(
+            therapist_id=therapist.id,
+            client_name="Client",
+            client_email="client@test.com",
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=1)
+        )
+        statements.clear()
+        created = BookingRepository(db_session).create(booking)
+        # Conflict probe, INSERT ... RETURNING, outbox row; no refresh, and
+        # no schedule version bump without the schedule index
+        assert statements == ["SELECT", "INSERT", "INSERT"]
+        assert created.version == 1 and created.created_at is not None
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    known_therapist_ids.clear()
+    with UnitOfWork(db_session):
+        second = TherapistRepository(db_session).create(Therapist(
+            name="Second Therapist", email="second@test.com", phone="+15555550102"
+        ))
+        WorkingHoursRepository(db_session).replace(second.id, [
+            WorkingHours(weekday=0, start_time=time(9), end_time=time(17))
+        ])
+        # Post-commit steps wait for the unit's commit
+        assert known_therapist_ids.get(second.id) is None
+    assert known_therapist_ids.get(second.id)
+    assert len(WorkingHoursRepository(db_session).get_by_therapist(second.id)) == 1
+
+    # A failed step rolls back every write of the unit
+    with pytest.raises(BookingConflictError):
+        with UnitOfWork(db_session):
+            TherapistRepository(db_session).create(Therapist(
+                name="Third Therapist", email="third@test.com", phone="+15555550103"
+            ))
+            BookingRepository(db_session).create(booking)
+    assert db_session.query(TherapistModel).filter_by(email="third@test.com").first() is None
+
+    with pytest.raises(RuntimeError):
+        with UnitOfWork(db_session):
+            try:
+                BookingRepository(db_session).create(booking)
+            except BookingConflictError:
+                pass
+
+@pytest.mark.asyncio
+async def test_async_unit_of_work(async_db_session):
+    async with AsyncUnitOfWork(async_db_session):
+        therapist = await AsyncTherapistRepository(async_db_session).create(Therapist(
+            name="Async Unit", email="async-unit@test.com", phone="+15555550104"
+        ))
+        start_time = datetime(2030, 3, 4, 9)
+        created = await AsyncBookingRepository(async_db_session).create(BookingCreate(
+            therapist_id=therapist.id,
+            client_name="Client",
+            client_email="client@test.com",
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=1)
+        ))
+    await async_db_session.rollback()
+    assert (await AsyncBookingRepository(async_db_session).get_by_id(created.id)).therapist_id == therapist.id
+
+@pytest.mark.asyncio
+async def test_routes_with_async_session(async_db_session):
+    async def override_get_db():
+        yield async_db_session
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+            response = await async_client.post("/therapists", json={
+                "name": "Async Therapist",
+                "email": "async@test.com",
+                "phone": "+15555550101"
+            })
+            assert response.status_code == 200
+            therapist_id = response.json()["id"]
+
+            response = await async_client.get(f"/therapists/{therapist_id}")
+            assert response.status_code == 200
+            assert response.json()["name"] == "Async Therapist"
+    finally:
+        app.dependency_overrides.clear()
+
+def test_free_intervals_sweep():
+    day = datetime(2030, 1, 7)
+    working = working_intervals([(0, time(9), time(12)), (0, time(13), time(17))], day, day + timedelta(days=7))
+    busy = [
+        (day.replace(hour=8), day.replace(hour=9, minute=30)),
+        (day.replace(hour=10), day.replace(hour=11)),
+        (day.replace(hour=10, minute=30), day.replace(hour=13, minute=15)),
+    ]
+
+    assert list(free_intervals(working, busy)) == [
+        (day.replace(hour=9, minute=30), day.replace(hour=10)),
+        (day.replace(hour=13, minute=15), day.replace(hour=17)),
+    ]
+    assert list(free_intervals(working, busy, timedelta(hours=1))) == [
+        (day.replace(hour=13, minute=15), day.replace(hour=17)),
+    ]
+
+    slots = first_free_slots({
+        1: (working, busy),
+        2: (working_intervals([(0, time(14), time(16))], day, day + timedelta(days=1)), []),
+    }, timedelta(hours=1), 4)
+    assert [(therapist_id, start.hour, start.minute) for therapist_id, start, _ in slots] == [
+        (1, 13, 15), (2, 14, 0), (1, 14, 15), (2, 15, 0)
+    ]
+
+def test_therapist_availability(client, test_therapist, db_session):
+    response = client.put(f"/therapists/{test_therapist.id}/working-hours", json=[
+        {"weekday": weekday, "start_time": "09:00:00", "end_time": "17:00:00"} for weekday in range(5)
+    ])
+    assert response.status_code == 200
+    assert len(client.get(f"/therapists/{test_therapist.id}/working-hours").json()) == 5
+
+    monday = datetime(2030, 1, 7)
+    for start_time, end_time, status in [
+        (monday - timedelta(hours=1), monday + timedelta(hours=9, minutes=30), "confirmed"),
+        (monday.replace(hour=10), monday.replace(hour=11), "pending"),
+        (monday.replace(hour=12), monday.replace(hour=13), "cancelled"),
+    ]:
+        db_session.add(BookingModel(
+            therapist_id=test_therapist.id, client_name="Client", client_email="client@test.com",
+            start_time=start_time, end_time=end_time, status=status
+        ))
+    db_session.commit()
+
+    response = client.get(f"/therapists/{test_therapist.id}/availability", params={
+        "start": monday.isoformat(), "end": (monday + timedelta(days=1)).isoformat()
+    })
+    assert response.status_code == 200
+    assert [(slot["start_time"], slot["end_time"]) for slot in response.json()["slots"]] == [
+        ("2030-01-07T09:30:00Z", "2030-01-07T10:00:00Z"),
+        ("2030-01-07T11:00:00Z", "2030-01-07T17:00:00Z"),
+    ]
+
+    response = client.get(f"/therapists/{test_therapist.id}/availability", params={
+        "start": monday.isoformat(), "end": (monday + timedelta(days=7)).isoformat(), "min_duration": 60
+    })
+    assert len(response.json()["slots"]) == 5
+
+    response = client.get("/availability/search", params={
+        "start": monday.isoformat(), "end": (monday + timedelta(days=7)).isoformat(),
+        "duration": 60, "limit": 2
+    })
+    assert response.status_code == 200
+    assert [slot["start_time"] for slot in response.json()] == ["2030-01-07T11:00:00Z", "2030-01-07T12:00:00Z"]
+
+def test_availability_validation(client, test_therapist):
+    monday = datetime(2030, 1, 7)
+    response = client.get(f"/therapists/{test_therapist.id}/availability", params={
+        "start": monday.isoformat(), "end": monday.isoformat()
+    })
+    assert response.status_code == 400
+    response = client.get("/availability/search", params={
+        "start": monday.isoformat(), "end": (monday + timedelta(days=60)).isoformat(), "duration": 30
+    })
+    assert response.status_code == 400
+    response = client.get("/therapists/999/availability", params={
+        "start": monday.isoformat(), "end": (monday + timedelta(days=1)).isoformat()
+    })
+    assert response.status_code == 404
+    response = client.put("/therapists/999/working-hours", json=[
+        {"weekday": 0, "start_time": "09:00:00", "end_time": "17:00:00"}
+    ])
+    assert response.status_code == 404
+    response = client.put(f"/therapists/{test_therapist.id}/working-hours", json=[
+        {"weekday": 0, "start_time": "17:00:00", "end_time": "09:00:00"}
+    ])
+    assert response.status_code == 400
+
+def test_availability_search_pages_therapists(client, db_session, monkeypatch):
+    monkeypatch.setattr("src.main.MAX_SEARCH_THERAPISTS", 2)
+    therapists = [
+        TherapistModel(name=f"Therapist {n}", email=f"therapist{n}@test.com", phone="+15555550100")
+        for n in range(5)
+    ]
+    db_session.add_all(therapists)
+    db_session.commit()
+    # The second therapist has no working hours and is not counted
+    for therapist, opens in zip(therapists, ("09:00:00", None, "09:00:00", "07:00:00", "12:00:00")):
+        if opens:
+            response = client.put(f"/therapists/{therapist.id}/working-hours", json=[
+                {"weekday": 0, "start_time": opens, "end_time": "17:00:00"}
+            ])
+            assert response.status_code == 200
+
+    pages, queries = [], []
+    weekly_hours = WorkingHoursRepository.weekly_hours
+    monkeypatch.setattr(
+        "src.infrastructure.repository.WorkingHoursRepository.weekly_hours",
+        lambda self, *args: pages.append(args[1]) or weekly_hours(self, *args)
+    )
+    monkeypatch.setattr(
+        "src.infrastructure.repository.BookingRepository.busy_intervals",
+        lambda self, start, end, therapist_ids=None: queries.append(therapist_ids) or {}
+    )
+    monday = datetime(2030, 1, 7)
+    params = {"end": (monday + timedelta(days=1)).isoformat(), "duration": 60, "limit": 2}
+
+    # The second page holds the earliest slots; the last therapist opens too
+    # late to beat them, so its bookings are not read
+    response = client.get("/availability/search", params={**params, "start": monday.isoformat()})
+    assert response.status_code == 200
+    assert [(slot["therapist_id"], slot["start_time"]) for slot in response.json()] == [
+        (therapists[3].id, "2030-01-07T07:00:00Z"), (therapists[3].id, "2030-01-07T08:00:00Z")
+    ]
+    assert "X-Next-Cursor" not in response.headers
+    assert queries == [[therapists[0].id, therapists[2].id], [therapists[3].id]]
+    assert pages == [None, therapists[2].id, therapists[4].id]
+
+    # Slots at the window start cannot be beaten, so later pages are not read
+    pages.clear()
+    response = client.get("/availability/search", params={**params, "start": monday.replace(hour=9).isoformat()})
+    assert [(slot["therapist_id"], slot["start_time"]) for slot in response.json()] == [
+        (therapists[0].id, "2030-01-07T09:00:00Z"), (therapists[2].id, "2030-01-07T09:00:00Z")
+    ]
+    assert pages == [None]
+
+def test_interval_set_range_and_next_free():
+    day = datetime(2030, 1, 7)
+    intervals = IntervalSet([
+        (day.replace(hour=9), day.replace(hour=10), 1),
+        (day.replace(hour=10), day.replace(hour=11), 2),
+        (day.replace(hour=12), day.replace(hour=13), 3),
+    ])
+    assert [value for _, _, value in intervals.between(day.replace(hour=9, minute=30), day.replace(hour=12))] == [1, 2]
+    assert intervals.next_free(day.replace(hour=9, minute=15), timedelta(minutes=30)) == day.replace(hour=11)
+    assert intervals.next_free(day.replace(hour=9), timedelta(hours=2)) == day.replace(hour=13)
+    assert intervals.remove(2, day.replace(hour=10))
+    assert intervals.next_free(day.replace(hour=9), timedelta(hours=2)) == day.replace(hour=10)
+
+def test_schedule_version_untouched_without_index(client, test_therapist, db_session):
+    start_time = datetime(2030, 1, 7, 10)
+    response = client.post("/bookings", json={
+        "therapist_id": test_therapist.id,
+        "client_name": "Test Client",
+        "client_email": "client@test.com",
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(hours=1)).isoformat()
+    })
+    assert response.status_code == 200
+    response = client.post(f"/bookings/{response.json()['id']}/cancel")
+    assert response.status_code == 200
+    db_session.expire_all()
+    assert db_session.get(TherapistModel, test_therapist.id).schedule_version == 0
+
+def test_schedule_index(client, test_therapist, db_session, monkeypatch):
+    monkeypatch.setattr("src.infrastructure.repository.SCHEDULE_INDEX_ENABLED", True)
+    start_time = datetime(2030, 1, 7, 10)
+    booking_data = {
+        "therapist_id": test_therapist.id,
+        "client_name": "Test Client",
+        "client_email": "client@test.com",
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(hours=1)).isoformat()
+    }
+    first = client.post("/bookings", json=booking_data).json()
+    assert schedule_index.snapshot()["loads"] == 1
+
+    # Applied incrementally: the conflict is found without reloading
+    response = client.post("/bookings", json=booking_data)
+    assert response.status_code == 409
+    assert str(first["id"]) in response.json()["detail"]
+    assert schedule_index.snapshot()["loads"] == 1
+
+    # A write from another process moves the version and forces a reload
+    other = TestingSessionLocal()
+    other.add(BookingModel(
+        therapist_id=test_therapist.id, client_name="Other", client_email="other@test.com",
+        start_time=start_time + timedelta(hours=2), end_time=start_time + timedelta(hours=3), status="pending"
+    ))
+    other.query(TherapistModel).filter(TherapistModel.id == test_therapist.id).update(
+        {TherapistModel.schedule_version: TherapistModel.schedule_version + 1}
+    )
+    other.commit()
+    other.close()
+    response = client.post("/bookings", json={
+        **booking_data,
+        "start_time": (start_time + timedelta(hours=2, minutes=30)).isoformat(),
+        "end_time": (start_time + timedelta(hours=4)).isoformat()
+    })
+    assert response.status_code == 409
+    assert schedule_index.snapshot()["loads"] == 2
+
+    busy = BookingRepository(db_session).busy_intervals(
+        start_time, start_time + timedelta(days=1), [test_therapist.id, 999]
+    )
+    assert busy == {test_therapist.id: [
+        (start_time, start_time + timedelta(hours=1)),
+        (start_time + timedelta(hours=2), start_time + timedelta(hours=3)),
+    ]}
+
+def test_schedule_index_holds_recent_bookings_only(test_therapist, db_session, monkeypatch):
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    for days in (-30, -10, 0.5, 3):
+        start = now + timedelta(days=days)
+        db_session.add(BookingModel(
+            therapist_id=test_therapist.id, client_name="Client", client_email="client@test.com",
+            start_time=start, end_time=start + timedelta(hours=1), status="pending"
+        ))
+    db_session.commit()
+
+    index = ScheduleIndex(history=timedelta(days=1))
+    assert index.next_free(db_session, test_therapist.id, now, timedelta(hours=1)) == now
+    # The load skipped the history
+    assert index.snapshot()["bookings"] == 2
+    # Older ranges are read from the database, and not kept
+    month_ago = now - timedelta(days=31)
+    assert len(index.between(db_session, test_therapist.id, month_ago, now)) == 2
+    assert index.snapshot() == {"therapists": 1, "bookings": 2, "hits": 0, "loads": 1}
+
+    # Bookings that fall out of the window are dropped from the entry
+    monkeypatch.setattr("src.infrastructure.schedule_index._utcnow", lambda: now + timedelta(days=2))
+    assert index.overlapping(db_session, test_therapist.id, now + timedelta(days=3), now + timedelta(days=4))
+    assert index.snapshot()["bookings"] == 1
+
+def test_booking_status_transitions(client, test_therapist, db_session):
+    start_time = datetime(2030, 1, 7, 10)
+    booking_data = {
+        "therapist_id": test_therapist.id,
+        "client_name": "Test Client",
+        "client_email": "client@test.com",
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(hours=1)).isoformat()
+    }
+    booking_id = client.post("/bookings", json=booking_data).json()["id"]
+    etag = client.get(f"/bookings/{booking_id}").headers["etag"]
+    assert etag == '"1"'
+
+    response = client.post(f"/bookings/{booking_id}/confirm", headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["status"] == "confirmed"
+    assert response.headers["etag"] == '"2"'
+
+    # A stale version or an impossible transition changes nothing
+    assert client.post(f"/bookings/{booking_id}/cancel", headers={"If-Match": etag}).status_code == 412
+    assert client.post(f"/bookings/{booking_id}/confirm").status_code == 409
+    assert client.post("/bookings/999/confirm").status_code == 404
+
+    response = client.post(f"/bookings/{booking_id}/cancel", headers={"If-Match": '"2"'})
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+    # The freed slot can be booked again
+    assert client.post("/bookings", json=booking_data).status_code == 200
+
+    events = [decode(message.payload)[0]["event_type"] for message in db_session.query(OutboxMessageModel)]
+    assert events == ["booking_created", "booking_confirmed", "booking_cancelled", "booking_created"]
+
+def test_cancel_therapist_bookings_in_range(client, test_therapist, db_session, monkeypatch):
+    monkeypatch.setattr("src.infrastructure.repository.SCHEDULE_INDEX_ENABLED", True)
+    day = datetime(2030, 1, 7)
+    for hour in (9, 11, 13):
+        client.post("/bookings", json={
+            "therapist_id": test_therapist.id,
+            "client_name": "Test Client",
+            "client_email": "client@test.com",
+            "start_time": day.replace(hour=hour).isoformat(),
+            "end_time": day.replace(hour=hour + 1).isoformat()
+        })
+    loads = schedule_index.snapshot()["loads"]
+
+    response = client.post(f"/therapists/{test_therapist.id}/bookings/cancel", params={
+        "start_from": day.replace(hour=10).isoformat(), "start_to": day.replace(hour=14).isoformat()
+    })
+    assert response.status_code == 200
+    assert [booking["start_time"][:19] for booking in response.json()] == [
+        "2030-01-07T11:00:00", "2030-01-07T13:00:00"
+    ]
+    assert all(booking["status"] == "cancelled" for booking in response.json())
+
+    # The index dropped the cancelled bookings without reloading
+    busy = BookingRepository(db_session).busy_intervals(day, day + timedelta(days=1), [test_therapist.id])
+    assert busy == {test_therapist.id: [(day.replace(hour=9), day.replace(hour=10))]}
+    assert schedule_index.snapshot()["loads"] == loads
+
+    response = client.post(f"/therapists/{test_therapist.id}/bookings/cancel", params={
+        "start_from": day.isoformat(), "start_to": day.isoformat()
+    })
+    assert response.status_code == 400
+
+def test_create_booking_longer_than_max_duration(client, test_therapist):
+    def booking(hours):
+        start_time = datetime(2031, 4, 1)
+        return {
+            "therapist_id": test_therapist.id,
+            "client_name": "Test Client",
+            "client_email": "client@test.com",
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + timedelta(hours=hours)).isoformat()
+        }
+
+    # Overlap probes rely on the maximum duration to stop looking back
+    response = client.post("/bookings", json=booking(25))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Bookings cannot be longer than 24 hours"
+    response = client.post("/bookings/batch", json={"items": [booking(25)], "all_or_nothing": False})
+    assert response.json()["results"][0]["error"] == "Bookings cannot be longer than 24 hours"
+    assert client.post("/bookings", json=booking(24)).status_code == 200
+
+def test_archive_past_bookings(client, test_therapist, db_session):
+    def booking(start_time, hours=1):
+        return {
+            "therapist_id": test_therapist.id,
+            "client_name": "Test Client",
+            "client_email": "client@test.com",
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + timedelta(hours=hours)).isoformat()
+        }
+
+    old_id = client.post("/bookings", json=booking(datetime(2030, 1, 7, 10))).json()["id"]
+    recent_id = client.post("/bookings", json=booking(datetime(2031, 3, 3, 10))).json()["id"]
+
+    summary = maintain(engine, now=datetime(2031, 6, 15, tzinfo=timezone.utc))
+    assert summary == {
+        "created": [],
+        "archived": {"cutoff": "2030-06-01T00:00:00+00:00", "partitions": [], "rows": 1},
+    }
+    db_session.expire_all()
+    assert [row.id for row in db_session.query(BookingModel)] == [recent_id]
+    assert [row.id for row in db_session.query(ArchivedBookingModel)] == [old_id]
+
+    # Archived bookings stay readable by ID
+    response = client.get(f"/bookings/{old_id}")
+    assert response.status_code == 200
+    assert response.json()["start_time"].startswith("2030-01-07T10:00:00")
+    assert client.post("/bookings", json=booking(datetime(2031, 3, 3, 10, 30))).status_code == 409
+
+def test_partition_months_and_migrations(tmp_path, monkeypatch):
+    month = month_start(datetime(2030, 12, 31, 23, tzinfo=timezone(-timedelta(hours=5))))
+    assert month == datetime(2031, 1, 1, tzinfo=timezone.utc)
+    assert add_months(month, -13) == datetime(2029, 12, 1, tzinfo=timezone.utc)
+    assert partition_of("bookings", month) == (
+        "CREATE TABLE bookings_y2031m01 PARTITION OF bookings "
+        "FOR VALUES FROM ('2031-01-01 00:00:00+00') TO ('2031-02-01 00:00:00+00')"
+    )
+
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    monkeypatch.setattr("src.infrastructure.database.DATABASE_URL", url)
+    config = Config()
+    config.set_main_option(
+        "script_location", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+    )
+    command.upgrade(config, "0001_baseline")
+    with create_engine(url).begin() as connection:
+        connection.execute(text("INSERT INTO therapists (name, email, phone) VALUES ('T', 't@test.com', '1')"))
+        connection.execute(text(
+            "INSERT INTO bookings (therapist_id, client_name, client_email, start_time, end_time, status) "
+            "VALUES (1, 'Client', 'client@test.com', '2030-01-07 10:00:00', '2030-01-08 11:00:00', 'pending')"
+        ))
+    # Overlap probes would miss the 25-hour booking
+    with pytest.raises(RuntimeError, match="longer than BOOKING_MAX_DURATION_HOURS"):
+        command.upgrade(config, "head")
+    with create_engine(url).begin() as connection:
+        connection.execute(text("UPDATE bookings SET status = 'cancelled'"))
+    command.upgrade(config, "head")
+    migrated = inspect(create_engine(url))
+    # The migrations create the tables of the models, column for column
+    for table in Base.metadata.sorted_tables:
+        assert {column["name"] for column in migrated.get_columns(table.name)} == set(table.columns.keys())
+    command.downgrade(config, "base")
+    assert inspect(create_engine(url)).get_table_names() == ["alembic_version"]
+
+def _schema_sql():
+    with open(os.path.join(os.path.dirname(src.infrastructure.database.__file__), "schema.sql")) as schema:
+        return schema.read()
+
+@postgres_only
+def test_partitioned_bookings_on_postgres(monkeypatch):
+    monkeypatch.setattr("src.infrastructure.database.DATABASE_URL", POSTGRES_TEST_URL)
+    config = Config()
+    config.set_main_option(
+        "script_location", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+    )
+    pg = create_engine(POSTGRES_TEST_URL)
+    with pg.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE; CREATE SCHEMA public"))
+        # A database deployed from schema.sql, before any migration
+        connection.exec_driver_sql(_schema_sql())
+    command.stamp(config, "0001_baseline")
+
+    now = datetime.now(timezone.utc)
+    current = month_start(now)
+    months = (-30, -14, -2, 0, 3, 40)
+    with pg.begin() as connection:
+        connection.execute(text("INSERT INTO therapists (name, email, phone) VALUES ('T', 't@test.com', '1')"))
+        for offset in months:
+            start = add_months(current, offset) + timedelta(days=3, hours=10)
+            connection.execute(text(
+                "INSERT INTO bookings (therapist_id, client_name, client_email, start_time, end_time) "
+                "VALUES (1, 'Client', 'client@test.com', :start, :end)"
+            ), {"start": start, "end": start + timedelta(hours=1)})
+        connection.execute(text(
+            "INSERT INTO bookings (therapist_id, client_name, client_email, start_time, end_time) "
+            "VALUES (1, 'Client', 'client@test.com', :start, :start + interval '25 hours')"
+        ), {"start": now})
+    with pytest.raises(Exception, match="longer than BOOKING_MAX_DURATION_HOURS"):
+        command.upgrade(config, "head")
+    with pg.begin() as connection:
+        connection.execute(text("DELETE FROM bookings WHERE id = 7"))
+    command.upgrade(config, "head")
+
+    def placement(table):
+        with pg.connect() as connection:
+            return connection.execute(
+                text(f"SELECT id, tableoid::regclass::text FROM {table} ORDER BY id")
+            ).all()
+
+    with pg.connect() as connection:
+        assert is_partitioned(connection)
+        assert inspect(connection).get_pk_constraint("bookings")["constrained_columns"] == ["id", "start_time"]
+    # Copied into monthly partitions; the far-off booking waits in DEFAULT
+    assert placement("bookings") == [
+        *((id_, partition_name("bookings", add_months(current, offset))) for id_, offset in zip(range(1, 6), months)),
+        (6, "bookings_default"),
+    ]
+
+    # A partition created later takes over its rows from DEFAULT
+    with pg.begin() as connection:
+        assert len(ensure_partitions(connection, now, ahead=40)) == 40 - 12
+    assert placement("bookings")[-1] == (6, partition_name("bookings", add_months(current, 40)))
+
+    summary = maintain(pg, now=now)
+    archived = [partition_name("bookings_archive", add_months(current, offset)) for offset in (-30, -14)]
+    assert summary["created"] == [] and summary["archived"]["rows"] == 0
+    assert set(archived) <= set(summary["archived"]["partitions"])
+    assert placement("bookings_archive") == [(1, archived[0]), (2, archived[1])]
+    assert [id_ for id_, _ in placement("bookings")] == [3, 4, 5, 6]
+    with pg.connect() as connection:
+        # Archived partitions only keep their primary key
+        assert inspect(connection).get_indexes(archived[0]) == []
+
+    # The application writes to and reads from the partitioned tables
+    Session = sessionmaker(bind=pg, autoflush=False)
+    with Session() as db:
+        start = (now + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+        booking = BookingCreate(
+            therapist_id=1, client_name="New", client_email="new@test.com",
+            start_time=start, end_time=start + timedelta(hours=1)
+        )
+        created = BookingRepository(db).create(booking)
+        with pytest.raises(BookingConflictError):
+            BookingRepository(db).create(booking)
+        assert BookingRepository(db).get_by_id(created.id).start_time == start
+        assert BookingRepository(db).get_by_id(1) is not None
+
+    # The exclusion strategy has no constraint to rely on any more
+    monkeypatch.setattr("src.infrastructure.database.BOOKING_CONFLICT_STRATEGY", "exclusion")
+    with pytest.raises(RuntimeError):
+        check_conflict_strategy(pg)
+    monkeypatch.setattr("src.infrastructure.database.BOOKING_CONFLICT_STRATEGY", "advisory")
+
+    command.downgrade(config, "base")
+    pg.dispose()
+
+def test_schema_sql_stamped_and_upgraded(tmp_path, monkeypatch):
+    sql = _schema_sql()
+    # Applying it to a live database must not lose data
+    assert not re.search(r"\b(DROP|DELETE|TRUNCATE)\b", sql, re.IGNORECASE)
+
+    def columns(url):
+        inspector = inspect(create_engine(url))
+        return {
+            table: {column["name"] for column in inspector.get_columns(table)}
+            for table in inspector.get_table_names() if table != "alembic_version"
+        }
+
+    config = Config()
+    config.set_main_option(
+        "script_location", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+    )
+    baseline_url = f"sqlite:///{tmp_path / 'baseline.db'}"
+    monkeypatch.setattr("src.infrastructure.database.DATABASE_URL", baseline_url)
+    command.upgrade(config, "0001_baseline")
+
+    url = f"sqlite:///{tmp_path / 'schema.db'}"
+    with create_engine(url).begin() as connection:
+        connection.connection.executescript(sql)
+    # schema.sql is the baseline revision, so stamping it skips nothing
+    assert columns(url) == columns(baseline_url)
+    monkeypatch.setattr("src.infrastructure.database.DATABASE_URL", url)
+    command.stamp(config, "0001_baseline")
+    command.upgrade(config, "head")
+    migrated = inspect(create_engine(url))
+    for table in Base.metadata.sorted_tables:
+        assert {column["name"] for column in migrated.get_columns(table.name)} == set(table.columns.keys())
+
+def test_lambda_functions_import_with_events_layer(tmp_path):
+    api_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    root = os.path.dirname(api_dir)
+    with open(os.path.join(root, "infrastructure", "template.yaml")) as template_file:
+        template = template_file.read()
+    # Every function gets the layer built from events/
+    assert "    Layers:\n      - !Ref BookingEventsLayer\n" in template.split("\nResources:")[0]
+    assert re.search(r"BookingEventsLayer:\n.*\n    Properties:\n      ContentUri: \.\./events\n", template)
+    handlers = re.findall(r"CodeUri: \.\./api\n      Handler: ([\w.]+)\.lambda_handler", template)
+    assert "src.main" in handlers
+
+    # The layer as SAM builds it: events/ under python/, its requirements
+    # installed alongside (here, the test interpreter's site-packages)
+    layer = tmp_path / "python"
+    shutil.copytree(
+        os.path.join(root, "events"), layer, ignore=shutil.ignore_patterns("*.egg-info", "__pycache__")
+    )
+    site_packages = sysconfig.get_paths()["purelib"]
+
+    def import_module(module, *paths):
+        # -S skips .pth files, so the editable install of events is not found
+        return subprocess.run(
+            [sys.executable, "-S", "-c", f"import {module}"], cwd=api_dir, capture_output=True, text=True,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(paths)}
+        )
+
+    missing = import_module("src.main", api_dir, site_packages)
+    assert missing.returncode != 0 and "booking_events" in missing.stderr
+    for module in handlers:
+        result = import_module(module, str(layer), api_dir, site_packages)
+        assert result.returncode == 0, result.stderr
+
+def test_lambda_handler(client, test_therapist, monkeypatch):
+    monkeypatch.setattr("src.main._lambda_adapter", None)
+
+    response = lambda_handler({
+        "httpMethod": "GET",
+        "path": f"/therapists/{test_therapist.id}",
+        "headers": {"Host": "api.example.com"},
+        "multiValueQueryStringParameters": None,
+        "body": None,
+        "isBase64Encoded": False,
+    }, None)
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["email"] == "therapist@test.com"
+
+    response = lambda_handler({
+        "version": "2.0",
+        "rawPath": "/therapists",
+        "rawQueryString": "limit=1",
+        "headers": {"content-type": "application/json"},
+        "requestContext": {"http": {"method": "POST", "sourceIp": "127.0.0.1"}},
+        "body": json.dumps({"name": "Second", "email": "second@test.com", "phone": "+15555550101"}),
+        "isBase64Encoded": False,
+    }, None)
+    assert response["statusCode"] == 200
+    assert response["headers"]["content-type"] == "application/json"
+    assert json.loads(response["body"])["name"] == "Second"
+    src.main._lambda_adapter.close()
+
+def test_lambda_handler_relays_outbox_before_returning(client, test_therapist, db_session, monkeypatch):
+    monkeypatch.setattr("src.main._lambda_adapter", None)
+    sqs = MagicMock()
+    sqs.send_message_batch.return_value = {}
+    monkeypatch.setattr(src.main.outbox_relay, "session_factory", TestingSessionLocal)
+    monkeypatch.setattr(src.main.outbox_relay, "sqs_client", sqs)
+
+    start_time = datetime(2030, 1, 1, 9)
+    response = lambda_handler({
+        "httpMethod": "POST",
+        "path": "/bookings",
+        "headers": {"Host": "api.example.com", "Content-Type": "application/json"},
+        "body": json.dumps({
+            "therapist_id": test_therapist.id,
+            "client_name": "Lambda Client",
+            "client_email": "lambda@test.com",
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + timedelta(hours=1)).isoformat()
+        }),
+        "isBase64Encoded": False,
+    }, None)
+    assert response["statusCode"] == 200
+    booking_id = json.loads(response["body"])["id"]
+
+    # Sent within the same invocation, with no relay task left behind
+    assert src.main._relay_task is None or src.main._relay_task.done()
+    [call] = sqs.send_message_batch.call_args_list
+    [body] = call.args[0].values()
+    assert decode(body)[0]["booking_id"] == booking_id
+    db_session.expire_all()
+    assert db_session.query(OutboxMessageModel).count() == 0
+    assert not src.main.outbox_relay.pending
+    src.main._lambda_adapter.close()
@@ -0,0 +1,164 @@
+"""
+Throughput benchmark of the consumer against an in-memory SQS stand-in.
+
+A queue pre-filled with --messages booking events is drained by
+NotificationService.start(), either the serial loop (--workers 1) or the
+ConcurrentPoller, delivering to a local keep-alive webhook server. Reports
+messages per second, p50/p99 time to handle a message and peak RSS.
+
+Usage:
+    cd consumer
+    python benchmarks/bench_consumer.py --messages 20000 --workers 8
+    python benchmarks/bench_consumer.py --workers 1 --json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+CONSUMER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CONSUMER_DIR)
+
+EPOCH = datetime(2030, 1, 7, 9)
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class FakeSQS:
+    """
+    Thread-safe stand-in for the SQS client calls the consumer makes.
+
+    Received messages stay in flight until deleted; an empty receive
+    returns after a short wait, like a long poll on an idle queue.
+    """
+
+    def __init__(self, bodies: List[str]):
+        self._queue = deque(
+            {"MessageId": str(i), "ReceiptHandle": str(i), "Body": body, "Attributes": {"ApproximateReceiveCount": "1"}}
+            for i, body in enumerate(bodies)
+        )
+        self._lock = threading.Lock()
+        self.in_flight: Dict[str, Dict[str, Any]] = {}
+        self.deleted = 0
+        self.drained = threading.Event()
+        self.total = len(bodies)
+
+    def receive_message(self, MaxNumberOfMessages=1, WaitTimeSeconds=0, **kwargs):
+        with self._lock:
+            count = min(MaxNumberOfMessages, len(self._queue))
+            messages = [self._queue.popleft() for _ in range(count)]
+            for message in messages:
+                self.in_flight[message["ReceiptHandle"]] = message
+        if not messages:
+            time.sleep(min(WaitTimeSeconds, 0.05))
+        return {"Messages": messages}
+
+    def _delete(self, receipt_handle: str) -> None:
+        with self._lock:
+            if self.in_flight.pop(receipt_handle, None) is not None:
+                self.deleted += 1
+                if self.deleted == self.total:
+                    self.drained.set()
+
+    def delete_message(self, ReceiptHandle, **kwargs):
+        self._delete(ReceiptHandle)
+        return {}
+
+    def delete_message_batch(self, Entries, **kwargs):
+        for entry in Entries:
+            self._delete(entry["ReceiptHandle"])
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    def change_message_visibility(self, **kwargs):
+        return {}
+
+    def change_message_visibility_batch(self, Entries, **kwargs):
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+def booking_bodies(count: int) -> List[str]:
+    return [
+        json.dumps({
+            "event_type": "booking_created",
+            "booking_id": i + 1,
+            "therapist_id": i % 1000 + 1,
+            "client_email": f"client{i}@example.com",
+            "start_time": (EPOCH + timedelta(hours=i)).isoformat(),
+            "end_time": (EPOCH + timedelta(hours=i, minutes=50)).isoformat(),
+        })
+        for i in range(count)
+    ]
+
+def run(messages: int, workers: int) -> Dict[str, Any]:
+    from src.delivery import DeliveryEngine, WebhookChannel
+    from src.idempotency import IdempotencyStore
+    from src.main import NotificationService
+    from tests.fakes import FakeHTTPServer
+
+    latencies: List[float] = []
+    with FakeHTTPServer() as server:
+        channel = WebhookChannel(server.url, concurrency=max(workers, 4))
+        service = NotificationService(delivery=DeliveryEngine([channel]), idempotency=IdempotencyStore())
+        sqs = service.sqs = FakeSQS(booking_bodies(messages))
+        handle = service.process_message
+
+        def timed(message):
+            started = time.perf_counter()
+            try:
+                return handle(message)
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+        service.process_message = timed
+        consumer = threading.Thread(target=service.start, kwargs={"workers": workers}, daemon=True)
+        started = time.perf_counter()
+        consumer.start()
+        if not sqs.drained.wait(timeout=600):
+            raise SystemExit(f"Only {sqs.deleted} of {messages} messages were acknowledged")
+        elapsed = time.perf_counter() - started
+        service.stop()
+        consumer.join()
+        service.delivery.close()
+
+    return {
+        "requests": messages,
+        "errors": messages - sqs.deleted,
+        "rps": messages / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=8, help="1 runs the serial loop")
+    parser.add_argument("--json", action="store_true", help="print the result as one JSON line")
+    args = parser.parse_args()
+
+    # The delivery log lines would dominate the measurement
+    sys.stdout = open(os.devnull, "w")
+    result = run(args.messages, args.workers)
+    sys.stdout = sys.__stdout__
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(
+        f"{args.messages} messages, {args.workers} workers: {result['rps']:.0f} msg/s, "
+        f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, "
+        f"peak RSS {result['peak_rss_mb']:.0f} MB"
+    )
+
+if __name__ == "__main__":
+    main()
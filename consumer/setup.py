@@ -7,6 +7,10 @@ setup(
     install_requires=[
         "boto3==1.29.3",
         "python-dotenv==1.0.0",
+        "sqlalchemy==2.0.23",
+        "psycopg2-binary==2.9.9",
+        "therapist-booking-events==0.1.0",
+        "urllib3>=1.25.4,<2.1",
         "pytest==7.4.3",
         "pytest-asyncio==0.21.1",
         "moto==4.1.14",
@@ -0,0 +1,449 @@
+import abc
+import hashlib
+import hmac
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from typing import Any, Callable, Container, Dict, List, Optional
+import urllib3
+from .digest import DIGEST_EVENT
+from .exceptions import DeliveryError, RetryableDeliveryError
+from .ratelimit import RateLimiter
+
+class ChannelMetrics:
+    """
+    Thread-safe delivery counters and recent latencies for one channel.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window)
+        self._first_send: Optional[float] = None
+        self.sent = 0
+        self.failed = 0
+        self.throttled = 0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            if self._first_send is None:
+                self._first_send = time.monotonic() - seconds
+            self._latencies.append(seconds)
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+
+    def record_throttled(self) -> None:
+        with self._lock:
+            self.throttled += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            elapsed = time.monotonic() - self._first_send if self._first_send else 0.0
+            sent, failed, throttled = self.sent, self.failed, self.throttled
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        return {
+            "sent": sent,
+            "failed": failed,
+            "throttled": throttled,
+            "throughput_per_s": round(sent / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+                "p50": round(percentile(0.50), 2),
+                "p99": round(percentile(0.99), 2),
+            },
+        }
+
+class Channel(abc.ABC):
+    """
+    Base class of a notification channel backend.
+
+    ``concurrency`` bounds the sends in flight on this channel, and backends
+    size their connection pools to match. Backends implement ``send``; one
+    that does not cannot be constructed.
+    """
+
+    name = "channel"
+
+    def __init__(self, concurrency: int = 4):
+        self.concurrency = concurrency
+
+    @abc.abstractmethod
+    def send(self, message: Dict[str, Any]) -> None:
+        """
+        Deliver one notification.
+
+        Raises:
+            RetryableDeliveryError: On transient failures worth retrying
+            DeliveryError: On permanent failures
+        """
+
+    def recipient_domain(self, message: Dict[str, Any]) -> Optional[str]:
+        """Domain rate limited per recipient, None when not applicable."""
+        return None
+
+    def close(self) -> None:
+        pass
+
+class LogChannel(Channel):
+    """Prints the notification; the default when no provider is configured."""
+
+    name = "log"
+
+    def send(self, message: Dict[str, Any]) -> None:
+        if message['event_type'] == DIGEST_EVENT:
+            print(f"Sending digest for bookings {message['booking_ids']}")
+        else:
+            print(f"Sending notification for booking {message['booking_id']}")
+        print(f"To: {message['client_email']}")
+        print(f"Event: {message['event_type']}")
+
+class SMTPChannel(Channel):
+    """
+    Email over SMTP with a pool of persistent connections.
+
+    Connections are opened on demand up to ``concurrency`` and kept for the
+    next message, so the TCP, TLS and login handshakes are paid once per
+    connection rather than once per email. A connection the server closed
+    while idle is replaced and the send retried once.
+    """
+
+    name = "email"
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 25,
+        sender: str = "bookings@example.com",
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = False,
+        timeout: float = 10.0,
+        concurrency: int = 4
+    ):
+        super().__init__(concurrency)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[smtplib.SMTP]" = queue.LifoQueue()
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password or "")
+        return connection
+
+    def _acquire(self) -> smtplib.SMTP:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _discard(self, connection: smtplib.SMTP) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def build_email(self, message: Dict[str, Any]) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message["client_email"]
+        if message["event_type"] == DIGEST_EVENT:
+            email["Subject"] = f"{len(message['events'])} booking updates"
+            email.set_content("".join(
+                f"Booking {event['booking_id']} {event['event_type'].replace('_', ' ')}: "
+                f"{event['start_time']} to {event['end_time']}\n"
+                for event in message["events"]
+            ))
+            return email
+        email["Subject"] = f"Booking {message['booking_id']}: {message['event_type'].replace('_', ' ')}"
+        email.set_content(
+            f"Booking {message['booking_id']} with therapist {message['therapist_id']}\n"
+            f"From {message['start_time']} to {message['end_time']}\n"
+        )
+        return email
+
+    def recipient_domain(self, message: Dict[str, Any]) -> Optional[str]:
+        return message["client_email"].rpartition("@")[2] or None
+
+    def send(self, message: Dict[str, Any]) -> None:
+        email = self.build_email(message)
+        connection = None
+        try:
+            connection = self._acquire()
+            try:
+                connection.send_message(email)
+            except smtplib.SMTPServerDisconnected:
+                self._discard(connection)
+                connection = self._connect()
+                connection.send_message(email)
+        except smtplib.SMTPResponseException as e:
+            # Keep the connection: the server answered, only this message failed
+            if connection is not None:
+                self._idle.put(connection)
+            if 400 <= e.smtp_code < 500:
+                raise RetryableDeliveryError(f"SMTP {e.smtp_code}: {e.smtp_error!r}") from e
+            raise DeliveryError(f"SMTP {e.smtp_code}: {e.smtp_error!r}") from e
+        except (smtplib.SMTPServerDisconnected, OSError) as e:
+            if connection is not None:
+                self._discard(connection)
+            raise RetryableDeliveryError(f"SMTP connection failed: {str(e)}") from e
+        except Exception:
+            if connection is not None:
+                self._discard(connection)
+            raise
+        self._idle.put(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                connection.quit()
+            except Exception:
+                self._discard(connection)
+
+class HTTPChannel(Channel):
+    """
+    Base for providers called over HTTP, sharing a keep-alive connection pool.
+    """
+
+    def __init__(self, url: str, timeout: float = 10.0, concurrency: int = 4):
+        super().__init__(concurrency)
+        self.url = url
+        self.http = urllib3.PoolManager(
+            maxsize=concurrency,
+            block=True,
+            retries=False,
+            timeout=urllib3.Timeout(connect=timeout, read=timeout)
+        )
+
+    def post(self, body: bytes, headers: Dict[str, str]) -> None:
+        """
+        POST a JSON body; 429 and 5xx responses and network errors are retryable.
+        """
+        try:
+            response = self.http.request(
+                "POST",
+                self.url,
+                body=body,
+                headers={"Content-Type": "application/json", **headers}
+            )
+        except urllib3.exceptions.HTTPError as e:
+            raise RetryableDeliveryError(f"{self.name} provider unreachable: {str(e)}") from e
+        if response.status == 429 or response.status >= 500:
+            retry_after = response.headers.get("Retry-After", "")
+            raise RetryableDeliveryError(
+                f"{self.name} provider returned HTTP {response.status}",
+                retry_after=float(retry_after) if retry_after.isdigit() else None
+            )
+        if response.status >= 400:
+            raise DeliveryError(f"{self.name} provider returned HTTP {response.status}")
+
+    def close(self) -> None:
+        self.http.clear()
+
+class SMSChannel(HTTPChannel):
+    """
+    Text message through an HTTP SMS gateway.
+
+    Sent to the client_phone given with the booking; bookings made without
+    one are skipped by this channel.
+    """
+
+    name = "sms"
+
+    def __init__(self, url: str, api_key: str = "", sender: str = "", **kwargs):
+        super().__init__(url, **kwargs)
+        self.api_key = api_key
+        self.sender = sender
+
+    def send(self, message: Dict[str, Any]) -> None:
+        if not message.get("client_phone"):
+            return
+        if message["event_type"] == DIGEST_EVENT:
+            text = f"{len(message['events'])} booking updates, see your email for details"
+        else:
+            text = (
+                f"Booking {message['booking_id']} {message['event_type'].replace('_', ' ')}: "
+                f"{message['start_time']}"
+            )
+        body = {"from": self.sender, "to": message["client_phone"], "text": text}
+        self.post(json.dumps(body).encode(), {"Authorization": f"Bearer {self.api_key}"})
+
+class WebhookChannel(HTTPChannel):
+    """
+    Posts the booking event as JSON, signed with HMAC-SHA256 when a secret is set.
+    """
+
+    name = "webhook"
+
+    def __init__(self, url: str, secret: str = "", **kwargs):
+        super().__init__(url, **kwargs)
+        self.secret = secret
+
+    def send(self, message: Dict[str, Any]) -> None:
+        body = json.dumps(message).encode()
+        headers = {}
+        if self.secret:
+            signature = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Signature-SHA256"] = signature
+        self.post(body, headers)
+
+class DeliveryEngine:
+    """
+    Fans a notification out to every channel in parallel.
+
+    Each channel has its own worker pool sized to its ``concurrency``, so a
+    slow provider cannot hold more than its share of threads or delay the
+    other channels. Sends over the rate limit fail as retryable instead of
+    waiting for a token.
+    """
+
+    def __init__(self, channels: List[Channel], limiter: Optional[RateLimiter] = None):
+        self.channels = channels
+        self.limiter = limiter or RateLimiter()
+        self.metrics = {channel.name: ChannelMetrics() for channel in channels}
+        self._executors = {
+            channel.name: ThreadPoolExecutor(
+                max_workers=channel.concurrency,
+                thread_name_prefix=f"deliver-{channel.name}"
+            )
+            for channel in channels
+        }
+
+    def _send(self, channel: Channel, message: Dict[str, Any]) -> None:
+        wait = self.limiter.acquire(channel.name, channel.recipient_domain(message))
+        if wait > 0:
+            self.metrics[channel.name].record_throttled()
+            raise RetryableDeliveryError(f"{channel.name} rate limited", retry_after=wait)
+        started = time.perf_counter()
+        ok = False
+        try:
+            channel.send(message)
+            ok = True
+        finally:
+            self.metrics[channel.name].record(time.perf_counter() - started, ok)
+
+    def deliver(
+        self,
+        message: Dict[str, Any],
+        skip: Container[str] = (),
+        on_sent: Optional[Callable[[str], None]] = None
+    ) -> None:
+        """
+        Send a notification on all channels and wait for them.
+
+        Args:
+            message: Booking event
+            skip: Names of channels not to send on, e.g. ones that delivered
+                the message before it was retried
+            on_sent: Called with the name of each channel as soon as it
+                delivered, so a retry can skip it even if another fails
+
+        Raises:
+            RetryableDeliveryError: If every failed channel may succeed on retry
+            DeliveryError: If any channel failed permanently; the others were
+                delivered
+        """
+        def send(channel: Channel) -> None:
+            self._send(channel, message)
+            if on_sent is not None:
+                on_sent(channel.name)
+
+        futures = [
+            (channel, self._executors[channel.name].submit(send, channel))
+            for channel in self.channels
+            if channel.name not in skip
+        ]
+        errors: Dict[str, Exception] = {}
+        for channel, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors[channel.name] = e
+        if not errors:
+            return
+        failed = {name: str(error) for name, error in errors.items()}
+        details = ", ".join(f"{name}: {error}" for name, error in failed.items())
+        if all(isinstance(error, RetryableDeliveryError) for error in errors.values()):
+            retry_after = max((error.retry_after or 0.0 for error in errors.values()), default=0.0)
+            raise RetryableDeliveryError(f"Delivery failed on {details}", failed, retry_after or None)
+        raise DeliveryError(f"Delivery failed on {details}", failed)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-channel throughput and latency."""
+        return {name: metrics.snapshot() for name, metrics in self.metrics.items()}
+
+    def close(self) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        for channel in self.channels:
+            channel.close()
+
+def _concurrency(name: str, default: int = 4) -> int:
+    return int(os.getenv(f"{name.upper()}_CONCURRENCY", str(default)))
+
+def build_channels(names: Optional[str] = None) -> List[Channel]:
+    """
+    Build the channels listed in NOTIFICATION_CHANNELS from the environment.
+
+    Args:
+        names: Comma-separated channel names (log, email, sms, webhook),
+            defaults to NOTIFICATION_CHANNELS
+
+    Returns:
+        Configured channel backends
+    """
+    names = names if names is not None else os.getenv("NOTIFICATION_CHANNELS", "log")
+    channels: List[Channel] = []
+    for name in (n.strip() for n in names.split(",") if n.strip()):
+        if name == "log":
+            channels.append(LogChannel(concurrency=_concurrency(name)))
+        elif name == "email":
+            channels.append(SMTPChannel(
+                os.getenv("SMTP_HOST", "localhost"),
+                int(os.getenv("SMTP_PORT", "25")),
+                sender=os.getenv("SMTP_SENDER", "bookings@example.com"),
+                username=os.getenv("SMTP_USERNAME"),
+                password=os.getenv("SMTP_PASSWORD"),
+                starttls=os.getenv("SMTP_STARTTLS", "false").lower() == "true",
+                concurrency=_concurrency(name)
+            ))
+        elif name == "sms":
+            channels.append(SMSChannel(
+                os.getenv("SMS_API_URL", ""),
+                api_key=os.getenv("SMS_API_KEY", ""),
+                sender=os.getenv("SMS_SENDER", ""),
+                concurrency=_concurrency(name)
+            ))
+        elif name == "webhook":
+            channels.append(WebhookChannel(
+                os.getenv("WEBHOOK_URL", ""),
+                secret=os.getenv("WEBHOOK_SECRET", ""),
+                concurrency=_concurrency(name)
+            ))
+        else:
+            raise ValueError(f"Unknown notification channel {name!r}")
+    return channels
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Seconds events for one recipient are buffered before a digest is sent
+# (0 disables coalescing), and the events that trigger an early digest
+DIGEST_WINDOW = float(os.getenv("DIGEST_WINDOW", "0"))
+DIGEST_MAX_SIZE = int(os.getenv("DIGEST_MAX_SIZE", "50"))
+
+DIGEST_EVENT = "booking_digest"
+
+def digest_key(message: Dict[str, Any]) -> Tuple[Any, str]:
+    """Recipient a booking event is coalesced for: the client of a therapist."""
+    return message["therapist_id"], message["client_email"]
+
+def digest_message(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine booking events of one recipient into a single notification.
+
+    Args:
+        events: Booking events with the same digest_key
+
+    Returns:
+        A booking_digest message listing the events
+    """
+    first = events[0]
+    message = {
+        "event_type": DIGEST_EVENT,
+        "therapist_id": first["therapist_id"],
+        "client_email": first["client_email"],
+        "booking_ids": [event["booking_id"] for event in events],
+        "events": events,
+    }
+    if first.get("client_phone"):
+        message["client_phone"] = first["client_phone"]
+    return message
+
+class DigestStage:
+    """
+    Buffers booking events per recipient and sends them as one digest.
+
+    A recipient's buffer is sent ``window`` seconds after its first event,
+    or as soon as it holds ``max_size`` events. add() returns a future that
+    completes once the digest containing the event was sent (or failed), so
+    callers acknowledge the coalesced messages together. ``window`` must be
+    well below the queue's visibility timeout unless the caller extends it.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List[Dict[str, Any]]], None],
+        window: float = DIGEST_WINDOW,
+        max_size: int = DIGEST_MAX_SIZE
+    ):
+        self.send = send
+        self.window = window
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stop = False
+        # recipient -> (deadline, [(event, future)])
+        self._groups: Dict[Tuple[Any, str], Tuple[float, List[Tuple[Dict[str, Any], Future]]]] = {}
+        self._thread = threading.Thread(target=self._run, name="digest-flush", daemon=True)
+        self.digests_sent = 0
+        self.events_coalesced = 0
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def add(self, message: Dict[str, Any]) -> Future:
+        """Buffer an event for its recipient's next digest."""
+        future: Future = Future()
+        key = digest_key(message)
+        full = None
+        with self._wakeup:
+            if key not in self._groups:
+                self._groups[key] = (time.monotonic() + self.window, [])
+                self._wakeup.notify()
+            entries = self._groups[key][1]
+            entries.append((message, future))
+            if len(entries) >= self.max_size or self._stop:
+                full = self._groups.pop(key)[1]
+        if full:
+            self._send(full)
+        return future
+
+    def flush(self) -> None:
+        """Send every buffered digest now."""
+        with self._lock:
+            groups = [entries for _, entries in self._groups.values()]
+            self._groups.clear()
+        for entries in groups:
+            self._send(entries)
+
+    def stop(self) -> None:
+        """
+        Send what is buffered without waiting for the window, and every later
+        event right away. Returns without waiting for the sends.
+        """
+        with self._wakeup:
+            self._stop = True
+            self._wakeup.notify()
+
+    def _send(self, entries: List[Tuple[Dict[str, Any], Future]]) -> None:
+        try:
+            self.send([event for event, _ in entries])
+        except Exception as e:
+            for _, future in entries:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.digests_sent += 1
+            self.events_coalesced += len(entries)
+        for _, future in entries:
+            future.set_result(None)
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                now = time.monotonic()
+                due = [
+                    key for key, (deadline, _) in self._groups.items()
+                    if deadline <= now or self._stop
+                ]
+                if self._stop and not due:
+                    return
+                if not due:
+                    next_deadline: Optional[float] = min(
+                        (deadline for deadline, _ in self._groups.values()), default=None
+                    )
+                    self._wakeup.wait(None if next_deadline is None else next_deadline - now)
+                    continue
+                groups = [self._groups.pop(key)[1] for key in due]
+            for entries in groups:
+                self._send(entries)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Digests sent and the events they replaced."""
+        with self._lock:
+            return {
+                "digests_sent": self.digests_sent,
+                "events_coalesced": self.events_coalesced,
+                "buffered": sum(len(entries) for _, entries in self._groups.values()),
+            }
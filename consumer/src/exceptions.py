@@ -0,0 +1,25 @@
+from typing import Dict, Optional
+
+class DeliveryError(Exception):
+    """Raised when a notification could not be delivered on one or more channels."""
+
+    def __init__(self, message: str, failed_channels: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.failed_channels = failed_channels or {}
+
+class RetryableDeliveryError(DeliveryError):
+    """
+    Raised for transient failures (throttling, provider errors, timeouts).
+
+    ``retry_after`` is the earliest retry the provider or rate limiter asked
+    for, in seconds.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        failed_channels: Optional[Dict[str, str]] = None,
+        retry_after: Optional[float] = None
+    ):
+        super().__init__(message, failed_channels)
+        self.retry_after = retry_after
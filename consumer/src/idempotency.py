@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy import Column, DateTime, MetaData, String, Table, create_engine, delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import NullPool
+
+# Keep keys as long as SQS may redeliver a message (the queue's retention)
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "1209600"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# sqlite:///path for a local file or the booking database URL; empty keeps
+# only the in-memory tier
+IDEMPOTENCY_DATABASE_URL = os.getenv("IDEMPOTENCY_DATABASE_URL", "")
+# Connections the long-running poller keeps open to the persistent tier.
+# Inside Lambda none are kept (NullPool), so idle containers hold no
+# connections on the booking database
+IDEMPOTENCY_POOL_SIZE = int(os.getenv("IDEMPOTENCY_POOL_SIZE", "2"))
+
+metadata = MetaData()
+
+processed_notifications = Table(
+    "processed_notifications",
+    metadata,
+    Column("key", String(200), primary_key=True),
+    Column("expires_at", DateTime(timezone=True), nullable=False, index=True),
+)
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """create_engine() options of the persistent tier at url."""
+    if url.startswith("sqlite"):
+        return {}
+    if "AWS_LAMBDA_FUNCTION_NAME" in os.environ:
+        return {"poolclass": NullPool}
+    return {"pool_size": IDEMPOTENCY_POOL_SIZE, "max_overflow": 0, "pool_pre_ping": True}
+
+def idempotency_key(message: Dict[str, Any], channel: Optional[str] = None) -> str:
+    """
+    Key identifying one notification: its booking and event type, and the
+    channel for its delivery on that channel alone.
+    """
+    key = f"{message['booking_id']}:{message['event_type']}"
+    return key if channel is None else f"{key}:{channel}"
+
+class ProcessedStore:
+    """
+    Persistent tier: processed keys in a database table, expired by time.
+
+    The table is created if missing, so a local SQLite file works without
+    setup; on the booking database it is created by the API's migration
+    0004_processed_notifications.
+    """
+
+    def __init__(self, url: str, purge_every: int = 1000):
+        self.engine = create_engine(url, **engine_options(url))
+        metadata.create_all(self.engine, tables=[processed_notifications])
+        self.purge_every = purge_every
+        self._marks = 0
+        self._lock = threading.Lock()
+
+    def contains(self, key: str) -> bool:
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(processed_notifications.c.key)
+                .where(processed_notifications.c.key == key)
+                .where(processed_notifications.c.expires_at > datetime.now(timezone.utc))
+            ).first() is not None
+
+    def add(self, key: str, ttl: float) -> None:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        with self.engine.begin() as connection:
+            updated = connection.execute(
+                update(processed_notifications)
+                .where(processed_notifications.c.key == key)
+                .values(expires_at=expires_at)
+            ).rowcount
+            if not updated:
+                try:
+                    with connection.begin_nested():
+                        connection.execute(
+                            processed_notifications.insert().values(key=key, expires_at=expires_at)
+                        )
+                except IntegrityError:
+                    # Marked concurrently by another consumer
+                    pass
+        with self._lock:
+            self._marks += 1
+            purge = self._marks % self.purge_every == 0
+        if purge:
+            self.purge()
+
+    def purge(self) -> int:
+        """Delete expired keys and return how many were removed."""
+        with self.engine.begin() as connection:
+            return connection.execute(
+                delete(processed_notifications)
+                .where(processed_notifications.c.expires_at <= datetime.now(timezone.utc))
+            ).rowcount
+
+class IdempotencyStore:
+    """
+    Remembers which notifications were already processed.
+
+    Lookups go to an in-process LRU first and only reach the persistent
+    store on a miss; keys found there are promoted to the LRU. Both tiers
+    expire keys after ``ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        persistent: Optional[ProcessedStore] = None,
+        maxsize: int = IDEMPOTENCY_CACHE_SIZE,
+        ttl: float = IDEMPOTENCY_TTL
+    ):
+        self.persistent = persistent
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._recent: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, expires_at: float) -> None:
+        self._recent[key] = expires_at
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.maxsize:
+            self._recent.popitem(last=False)
+
+    def seen(self, key: str) -> bool:
+        """Whether ``key`` was processed within the TTL."""
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._recent.get(key)
+            if expires_at is not None and expires_at > now:
+                self._recent.move_to_end(key)
+                self.memory_hits += 1
+                return True
+            self._recent.pop(key, None)
+
+        if self.persistent is not None and self.persistent.contains(key):
+            with self._lock:
+                # The remaining TTL is unknown here; the LRU bounds how long
+                # the promoted key stays
+                self._remember(key, now + self.ttl)
+                self.store_hits += 1
+            return True
+
+        with self._lock:
+            self.misses += 1
+        return False
+
+    def mark(self, key: str) -> None:
+        """Record ``key`` as processed in both tiers."""
+        if self.persistent is not None:
+            self.persistent.add(key, self.ttl)
+        with self._lock:
+            self._remember(key, time.monotonic() + self.ttl)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Lookup counts and hit rate per tier."""
+        with self._lock:
+            hits = self.memory_hits + self.store_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "cached_keys": len(self._recent),
+            }
+
+def build_idempotency_store(url: Optional[str] = None) -> IdempotencyStore:
+    """
+    Build the store for IDEMPOTENCY_DATABASE_URL.
+
+    Args:
+        url: Database URL of the persistent tier, defaults to
+            IDEMPOTENCY_DATABASE_URL; empty for the in-memory tier only
+
+    Returns:
+        IdempotencyStore
+    """
+    url = IDEMPOTENCY_DATABASE_URL if url is None else url
+    return IdempotencyStore(ProcessedStore(url) if url else None)
@@ -1,13 +1,61 @@
 import json
+import math
 import os
+import signal
+import threading
+import time
 import boto3
-from typing import Dict, Any
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
+from booking_events.envelope import decode
+from .delivery import DeliveryEngine, build_channels
+from .digest import DIGEST_WINDOW, DigestStage, digest_message
+from .idempotency import IdempotencyStore, build_idempotency_store, idempotency_key
+from .metrics import METRICS_LOG, digests, message_duration, messages, metrics, record_failure, serve_metrics
+from .poller import ConcurrentPoller
+from .ratelimit import build_rate_limiter, retry_delay
 
 load_dotenv()
 
+# Records of one Lambda batch processed concurrently
+MAX_WORKERS = int(os.getenv("CONSUMER_MAX_WORKERS", "10"))
+
+# Long-running consumer: worker threads and receive loops (1 worker keeps
+# the serial loop) and the visibility timeout requested on receive
+CONSUMER_WORKERS = int(os.getenv("CONSUMER_WORKERS", "1"))
+CONSUMER_POLLERS = int(os.getenv("CONSUMER_POLLERS", "2"))
+VISIBILITY_TIMEOUT = int(os.getenv("CONSUMER_VISIBILITY_TIMEOUT", "60"))
+# Messages the concurrent poller may hold while they wait in digests
+DIGEST_MAX_BUFFERED = int(os.getenv("DIGEST_MAX_BUFFERED", "1000"))
+
+def gather(futures: List[Future]) -> Future:
+    """Future that completes once all of futures did, failing with the first error."""
+    combined: Future = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            combined.set_exception(errors[0])
+        else:
+            combined.set_result(None)
+
+    for future in futures:
+        future.add_done_callback(done)
+    return combined
+
 class NotificationService:
-    def __init__(self):
+    def __init__(
+        self,
+        delivery: Optional[DeliveryEngine] = None,
+        idempotency: Optional[IdempotencyStore] = None
+    ):
         self.sqs = boto3.client(
             'sqs',
             aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
@@ -15,94 +63,362 @@ class NotificationService:
             region_name=os.getenv('AWS_REGION', 'us-east-1')
         )
         self.queue_url = os.getenv('SQS_QUEUE_URL')
+        self._stopping = threading.Event()
+        self._poller: Optional[ConcurrentPoller] = None
+        self._metrics_server = None
+        # Channels from NOTIFICATION_CHANNELS, reused across messages
+        if delivery is None:
+            channels = build_channels()
+            delivery = DeliveryEngine(channels, build_rate_limiter(c.name for c in channels))
+        self.delivery = delivery
+        # Notifications already sent, so redeliveries are acked without work
+        self.idempotency = idempotency or build_idempotency_store()
+        # Coalesces events per recipient when DIGEST_WINDOW is set
+        self.digest: Optional[DigestStage] = None
+        if DIGEST_WINDOW > 0:
+            self.digest = DigestStage(self.send_digest)
+            self.digest.start()
 
-    def send_notification(self, message: Dict[str, Any]) -> None:
+    def send_notification(
+        self,
+        message: Dict[str, Any],
+        events: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
         """
-        Send a notification based on the message type.
-        In a real implementation, this would send actual emails/SMS.
+        Send a notification on every configured channel in parallel.
+        
+        Each channel that delivers is marked for the events right away, and
+        channels already marked for all of them are skipped, so retrying
+        after one channel failed does not notify again on the others.
         
         Args:
             message: Dictionary containing the notification details
+            events: Booking events the notification announces, defaults to
+                the message itself (a digest announces several)
+            
+        Raises:
+            RetryableDeliveryError: If it was throttled or failed transiently
+            DeliveryError: If any channel failed to deliver it
         """
-        # This is a mock implementation
-        # In a real system, you would integrate with an email service (e.g., SES)
-        # or SMS service (e.g., SNS)
-        print(f"Sending notification for booking {message['booking_id']}")
-        print(f"To: {message['client_email']}")
-        print(f"Event: {message['event_type']}")
-
-    def process_message(self, message: Dict[str, Any]) -> None:
+        events = events or [message]
+        sent = {
+            channel.name
+            for channel in self.delivery.channels
+            if all(self.idempotency.seen(idempotency_key(event, channel.name)) for event in events)
+        }
+
+        def on_sent(channel: str) -> None:
+            for event in events:
+                self.idempotency.mark(idempotency_key(event, channel))
+
+        self.delivery.deliver(message, skip=sent, on_sent=on_sent)
+
+    def process_message(self, message: Dict[str, Any]) -> Optional[Future]:
         """
         Process a message from the SQS queue.
         
+        A message whose booking and event type were already notified is a
+        redelivery and returns without sending anything, so it is acked.
+        When DIGEST_WINDOW is set the message is added to its recipient's
+        digest instead of being sent on its own.
+        
         Args:
             message: Dictionary containing the message data
+            
+        Returns:
+            None once the message is done, or a Future that completes when
+            the digest containing it was sent; the message must only be
+            acked after that
+            
+        Raises:
+            Exception: If the notification could not be sent, so the message
+                is left on the queue to be retried (and eventually moved to
+                the DLQ)
         """
+        started = time.perf_counter()
+        outcome = "failed"
         try:
+            key = idempotency_key(message)
+            if self.idempotency.seen(key):
+                print(f"Skipping duplicate notification {key}")
+                outcome = "duplicate"
+                return None
+            if self.digest is not None:
+                outcome = "digested"
+                return self.digest.add(message)
             self.send_notification(message)
+            self.idempotency.mark(key)
+            outcome = "processed"
+            return None
         except Exception as e:
-            # In a production environment, you would want to log this error
-            # and possibly retry the operation or move the message to a DLQ
             print(f"Failed to process message: {str(e)}")
+            raise
+        finally:
+            messages.inc(outcome)
+            message_duration.observe(time.perf_counter() - started, outcome)
+
+    def process_events(self, events: List[Dict[str, Any]]) -> Optional[Future]:
+        """
+        Process the booking events of one queue message.
+        
+        A batch envelope carries several events. If one fails the message is
+        retried as a whole, and the events already notified are skipped as
+        duplicates then.
+        
+        Args:
+            events: Events decoded from the message body
+            
+        Returns:
+            None once all events are done, or a Future that completes when
+            the digests containing them were sent
+        """
+        if len(events) == 1:
+            return self.process_message(events[0])
+        digests = [future for future in map(self.process_message, events) if future is not None]
+        return gather(digests) if digests else None
+
+    def send_digest(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Send the booking events of one recipient as a single notification.
+        
+        Args:
+            messages: Buffered booking events with the same recipient
+            
+        Raises:
+            DeliveryError: If the digest could not be sent; none of the
+                events are marked as processed
+        """
+        events = list({idempotency_key(message): message for message in messages}.values())
+        try:
+            if len(events) == 1:
+                self.send_notification(events[0])
+            else:
+                self.send_notification(digest_message(events), events)
+        except Exception:
+            digests.inc("failed")
+            raise
+        digests.inc("sent")
+        for event in events:
+            self.idempotency.mark(idempotency_key(event))
 
-    def start(self) -> None:
+    def retry_later(self, receipt_handle: str, error: Exception, attempts: int) -> bool:
         """
-        Start listening for messages from the SQS queue.
+        Back off a failed message by extending its visibility timeout.
+        
+        The message is redelivered after a jittered exponential delay, so no
+        worker sleeps waiting for a throttled provider.
+        
+        Args:
+            receipt_handle: Receipt handle of the failed message
+            error: The failure
+            attempts: Deliveries of the message so far
+            
+        Returns:
+            Whether the message was deferred; non-retryable failures keep
+            their visibility timeout and are eventually moved to the DLQ
+        """
+        delay = retry_delay(error, attempts)
+        if delay is None:
+            return False
+        try:
+            self.sqs.change_message_visibility(
+                QueueUrl=self.queue_url,
+                ReceiptHandle=receipt_handle,
+                VisibilityTimeout=math.ceil(delay)
+            )
+        except Exception as e:
+            print(f"Error deferring message: {str(e)}")
+            return False
+        return True
+
+    def start(self, workers: Optional[int] = None, pollers: Optional[int] = None) -> None:
         """
-        while True:
+        Start listening for messages from the SQS queue until stop() is called.
+        
+        With more than one worker, messages are processed concurrently by a
+        ConcurrentPoller, which keeps messages waiting in a digest hidden
+        until it is sent; otherwise one batch at a time.
+        
+        Args:
+            workers: Worker threads, defaults to CONSUMER_WORKERS
+            pollers: Receive loops, defaults to CONSUMER_POLLERS
+        """
+        workers = workers or CONSUMER_WORKERS
+        if self._metrics_server is None:
+            self._metrics_server = serve_metrics()
+        if workers > 1:
+            self._poller = ConcurrentPoller(
+                self.sqs,
+                self.queue_url,
+                self.process_events,
+                workers=workers,
+                pollers=pollers or CONSUMER_POLLERS,
+                visibility_timeout=VISIBILITY_TIMEOUT,
+                backoff=retry_delay,
+                max_in_flight=workers + DIGEST_MAX_BUFFERED if self.digest else None
+            )
+            if self._stopping.is_set():
+                return
+            self._poller.start()
+            return
+
+        while not self._stopping.is_set():
             try:
                 response = self.sqs.receive_message(
                     QueueUrl=self.queue_url,
                     MaxNumberOfMessages=10,
-                    WaitTimeSeconds=20
+                    WaitTimeSeconds=20,
+                    AttributeNames=['ApproximateReceiveCount']
                 )
 
-                if 'Messages' in response:
-                    for message in response['Messages']:
-                        try:
-                            message_body = json.loads(message['Body'])
-                            self.process_message(message_body)
-                            
-                            # Delete the message from the queue
-                            self.sqs.delete_message(
-                                QueueUrl=self.queue_url,
-                                ReceiptHandle=message['ReceiptHandle']
-                            )
-                        except Exception as e:
-                            print(f"Error processing message: {str(e)}")
+                pending = []
+                for message in response.get('Messages', []):
+                    try:
+                        result = self.process_events(decode(message['Body']))
+                    except Exception as e:
+                        self._settle(message, e)
+                        continue
+                    if result is None:
+                        self._settle(message, None)
+                    else:
+                        pending.append((message, result))
+
+                # Digests of this batch are sent together instead of waiting
+                # out the window, which would stall the serial loop
+                if pending:
+                    self.digest.flush()
+                for message, result in pending:
+                    self._settle(message, result.exception())
                             
             except Exception as e:
                 print(f"Error receiving messages: {str(e)}")
 
+    def _settle(self, message: Dict[str, Any], error: Optional[BaseException]) -> None:
+        # A failed acknowledgement must not stop the rest of the batch from
+        # being settled; the message is simply redelivered later.
+        try:
+            if error is None:
+                # Delete the message from the queue
+                self.sqs.delete_message(
+                    QueueUrl=self.queue_url,
+                    ReceiptHandle=message['ReceiptHandle']
+                )
+                return
+            print(f"Error processing message: {str(error)}")
+            record_failure(error)
+            attempts = int(message.get('Attributes', {}).get('ApproximateReceiveCount', 1))
+            self.retry_later(message['ReceiptHandle'], error, attempts)
+        except Exception as e:
+            print(f"Error settling message {message.get('MessageId')}: {str(e)}")
+
+    def stop(self) -> None:
+        """
+        Stop listening. Messages already received are still processed and
+        acknowledged before start() returns; buffered digests are sent
+        without waiting for their window.
+        """
+        self._stopping.set()
+        if self._poller is not None:
+            self._poller.stop()
+        if self.digest is not None:
+            self.digest.stop()
+        if self._metrics_server is not None:
+            self._metrics_server.shutdown()
+
+# Reused by every invocation served by this container, so the boto3 client
+# and worker threads are only created on a cold start
+_notification_service: Optional[NotificationService] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_notification_service() -> NotificationService:
+    """Notification service shared across invocations."""
+    global _notification_service
+    if _notification_service is None:
+        _notification_service = NotificationService()
+    return _notification_service
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    return _executor
+
+def _process_record(service: NotificationService, record: Dict[str, Any]) -> Optional[Future]:
+    result = service.process_events(decode(record['body']))
+    return result if isinstance(result, Future) else None
+
+def _record_failed(service: NotificationService, record: Dict[str, Any], error: BaseException) -> Dict[str, str]:
+    print(f"Error processing message {record['messageId']}: {str(error)}")
+    record_failure(error)
+    if 'receiptHandle' in record:
+        attempts = int(record.get('attributes', {}).get('ApproximateReceiveCount', 1))
+        service.retry_later(record['receiptHandle'], error, attempts)
+    return {'itemIdentifier': record['messageId']}
+
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     AWS Lambda handler function.
     
+    Records are processed concurrently on a bounded worker pool. Failed
+    records are reported in batchItemFailures (the function uses
+    ReportBatchItemFailures), so SQS only redelivers those messages.
+    Digests are sent at the end of the batch.
+    
     Args:
         event: Lambda event
         context: Lambda context
         
     Returns:
-        Dict containing the response
+        Dict containing the response and the failed message IDs
     """
+    records = event.get('Records', [])
+    failures: List[Dict[str, str]] = []
     try:
-        # Process each record from the event
-        for record in event['Records']:
-            message_body = json.loads(record['body'])
-            notification_service = NotificationService()
-            notification_service.process_message(message_body)
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps('Messages processed successfully')
-        }
+        service = get_notification_service()
+        futures = [
+            (record, _get_executor().submit(_process_record, service, record))
+            for record in records
+        ]
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'body': json.dumps(f'Error processing messages: {str(e)}')
-        }
+        print(f"Error processing messages: {str(e)}")
+        futures = []
+        failures = [{'itemIdentifier': record['messageId']} for record in records]
+
+    pending = []
+    for record, future in futures:
+        try:
+            digest = future.result()
+        except Exception as e:
+            failures.append(_record_failed(service, record, e))
+            continue
+        if digest is not None:
+            pending.append((record, digest))
+
+    if pending:
+        service.digest.flush()
+    for record, digest in pending:
+        if digest.exception() is not None:
+            failures.append(_record_failed(service, record, digest.exception()))
+
+    if METRICS_LOG:
+        print(f"Consumer metrics: {json.dumps(metrics.snapshot())}")
+    if failures:
+        body = f'Error processing messages: {len(failures)} of {len(records)} failed'
+    else:
+        body = 'Messages processed successfully'
+    return {
+        'statusCode': 200,
+        'body': json.dumps(body),
+        'batchItemFailures': failures
+    }
 
 if __name__ == "__main__":
     # For local development
     notification_service = NotificationService()
-    notification_service.start() 
\ No newline at end of file
+    signal.signal(signal.SIGTERM, lambda signum, frame: notification_service.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: notification_service.stop())
+    notification_service.start()
+    print(f"Delivery metrics: {json.dumps(notification_service.delivery.snapshot())}")
+    print(f"Idempotency metrics: {json.dumps(notification_service.idempotency.snapshot())}")
+    print(f"Consumer metrics: {json.dumps(metrics.snapshot())}")
+    notification_service.delivery.close() 
\ No newline at end of file
@@ -0,0 +1,66 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from booking_events.metrics import MetricsRegistry
+from .exceptions import RetryableDeliveryError
+
+# Port of the /metrics endpoint of the long-running consumer (0 disables it)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Print the counters after every Lambda invocation, for log-based metrics
+METRICS_LOG = os.getenv("METRICS_LOG", "false").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+metrics = MetricsRegistry()
+
+# outcome: processed, duplicate, digested (waiting in a digest) or failed
+messages = metrics.counter(
+    "consumer_messages_total", "Booking event messages handled, by outcome", ("outcome",)
+)
+message_duration = metrics.histogram(
+    "consumer_message_duration_seconds", "Time to handle one message, by outcome", ("outcome",),
+    LATENCY_BUCKETS
+)
+# reason: retryable (deferred with backoff) or error (left for redelivery / the DLQ)
+message_failures = metrics.counter(
+    "consumer_message_failures_total", "Messages that were not acknowledged, by reason", ("reason",)
+)
+digests = metrics.counter(
+    "consumer_digests_total", "Digest notifications, by outcome", ("outcome",)
+)
+
+def record_failure(error: BaseException) -> None:
+    """Count a message left unacknowledged because of error."""
+    message_failures.inc("retryable" if isinstance(error, RetryableDeliveryError) else "error")
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_metrics(port: int = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics on a daemon thread.
+
+    Args:
+        port: Port to listen on; 0 or less serves nothing
+
+    Returns:
+        The server, to shut down, or None
+    """
+    if port <= 0:
+        return None
+    server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
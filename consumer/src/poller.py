@@ -0,0 +1,261 @@
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from booking_events.envelope import decode
+from .metrics import record_failure
+
+# SQS batch APIs accept at most 10 entries
+MAX_BATCH_SIZE = 10
+
+class AckBatcher:
+    """
+    Collects receipt handles and deletes them with DeleteMessageBatch.
+
+    A batch is sent as soon as 10 handles are pending, or by the flush
+    thread after ``flush_interval`` seconds.
+    """
+
+    def __init__(self, sqs: Any, queue_url: str, flush_interval: float = 1.0):
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.flush_interval = flush_interval
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ack-batcher", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def add(self, receipt_handle: str) -> None:
+        with self._lock:
+            self._pending.append(receipt_handle)
+            batch = self._take(full_only=True)
+        if batch:
+            self._delete(batch)
+
+    def flush(self) -> None:
+        while True:
+            with self._lock:
+                batch = self._take(full_only=False)
+            if not batch:
+                return
+            self._delete(batch)
+
+    def stop(self) -> None:
+        """Stop the flush thread and delete everything still pending."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+
+    def _take(self, full_only: bool) -> List[str]:
+        if len(self._pending) >= MAX_BATCH_SIZE or (self._pending and not full_only):
+            batch = self._pending[:MAX_BATCH_SIZE]
+            del self._pending[:MAX_BATCH_SIZE]
+            return batch
+        return []
+
+    def _delete(self, receipt_handles: List[str]) -> None:
+        try:
+            response = self.sqs.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {'Id': str(i), 'ReceiptHandle': handle}
+                    for i, handle in enumerate(receipt_handles)
+                ]
+            )
+            for failure in response.get('Failed', []):
+                print(f"Failed to delete message: {failure.get('Message', failure.get('Code'))}")
+        except Exception as e:
+            # The messages become visible again and are redelivered
+            print(f"Error deleting messages: {str(e)}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+class ConcurrentPoller:
+    """
+    Concurrent SQS consumer.
+
+    Several long-polling receive loops feed a shared worker pool. Successful
+    messages are acknowledged in DeleteMessageBatch calls, and messages still
+    being processed after half their visibility timeout have it extended, so
+    slow work is not redelivered to another worker. No more than
+    ``max_in_flight`` messages are held at once.
+
+    The handler gets the events decoded from a message body (see
+    booking_events.envelope). It may return a Future to finish the message later (for example
+    once a digest containing it is sent): the message then stays in flight,
+    with its visibility extended, and is acknowledged when the future
+    completes, without holding a worker.
+
+    When ``backoff`` returns a delay for a failure, the message's visibility
+    timeout is set to it so the retry waits in the queue, not in a worker.
+
+    stop() ends receiving, lets in-flight work finish and flushes the
+    pending acknowledgements before start() returns.
+    """
+
+    def __init__(
+        self,
+        sqs: Any,
+        queue_url: str,
+        handler: Callable[[List[Dict[str, Any]]], Optional[Future]],
+        workers: int = 8,
+        pollers: int = 2,
+        visibility_timeout: int = 60,
+        wait_time_seconds: int = 20,
+        backoff: Optional[Callable[[Exception, int], Optional[float]]] = None,
+        max_in_flight: Optional[int] = None
+    ):
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.handler = handler
+        self.workers = workers
+        self.pollers = pollers
+        self.visibility_timeout = visibility_timeout
+        self.wait_time_seconds = wait_time_seconds
+        self.backoff = backoff
+        self.max_in_flight = max_in_flight or workers + MAX_BATCH_SIZE
+        self.acks = AckBatcher(sqs, queue_url)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._capacity = threading.Condition(self._lock)
+        # message id -> [receipt handle, time the visibility runs out]
+        self._in_flight: Dict[str, List[Any]] = {}
+
+    def start(self) -> None:
+        """Consume messages until stop() is called."""
+        self.acks.start()
+        heartbeat = threading.Thread(target=self._heartbeat, name="visibility-heartbeat", daemon=True)
+        heartbeat.start()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="worker") as executor:
+            receivers = [
+                threading.Thread(target=self._receive_loop, args=(executor,), name=f"poller-{i}")
+                for i in range(self.pollers)
+            ]
+            for receiver in receivers:
+                receiver.start()
+            for receiver in receivers:
+                receiver.join()
+        # Leaving the executor block waited for in-flight work
+        heartbeat.join()
+        self.acks.stop()
+
+    def stop(self) -> None:
+        """Request a graceful shutdown."""
+        self._stop.set()
+        with self._capacity:
+            self._capacity.notify_all()
+
+    def _receive_loop(self, executor: ThreadPoolExecutor) -> None:
+        while not self._stop.is_set():
+            with self._capacity:
+                while len(self._in_flight) >= self.max_in_flight and not self._stop.is_set():
+                    self._capacity.wait()
+                room = min(MAX_BATCH_SIZE, self.max_in_flight - len(self._in_flight))
+            if self._stop.is_set():
+                return
+            try:
+                response = self.sqs.receive_message(
+                    QueueUrl=self.queue_url,
+                    MaxNumberOfMessages=room,
+                    WaitTimeSeconds=self.wait_time_seconds,
+                    VisibilityTimeout=self.visibility_timeout,
+                    AttributeNames=['ApproximateReceiveCount']
+                )
+            except Exception as e:
+                print(f"Error receiving messages: {str(e)}")
+                self._stop.wait(1)
+                continue
+
+            for message in response.get('Messages', []):
+                with self._lock:
+                    self._in_flight[message['MessageId']] = [
+                        message['ReceiptHandle'],
+                        time.monotonic() + self.visibility_timeout
+                    ]
+                executor.submit(self._process, message)
+
+    def _process(self, message: Dict[str, Any]) -> None:
+        try:
+            result = self.handler(decode(message['Body']))
+        except Exception as e:
+            self._settle(message, e)
+            return
+        if isinstance(result, Future):
+            result.add_done_callback(lambda future: self._settle(message, future.exception()))
+        else:
+            self._settle(message, None)
+
+    def _settle(self, message: Dict[str, Any], error: Optional[BaseException]) -> None:
+        try:
+            if error is None:
+                self.acks.add(message['ReceiptHandle'])
+            else:
+                # Not acknowledged: SQS redelivers it once the visibility expires
+                print(f"Error processing message: {str(error)}")
+                record_failure(error)
+        finally:
+            with self._capacity:
+                self._in_flight.pop(message['MessageId'], None)
+                self._capacity.notify()
+        if error is not None and self.backoff is not None:
+            self._defer(message, error)
+
+    def _defer(self, message: Dict[str, Any], error: Exception) -> None:
+        attempts = int(message.get('Attributes', {}).get('ApproximateReceiveCount', 1))
+        delay = self.backoff(error, attempts)
+        if delay is None:
+            return
+        try:
+            self.sqs.change_message_visibility(
+                QueueUrl=self.queue_url,
+                ReceiptHandle=message['ReceiptHandle'],
+                VisibilityTimeout=math.ceil(delay)
+            )
+        except Exception as e:
+            print(f"Error deferring message: {str(e)}")
+
+    def _heartbeat(self) -> None:
+        interval = max(self.visibility_timeout / 4, 1)
+        while not self._stop.wait(interval):
+            self.extend_visibility()
+        # Keep in-flight messages hidden while the pool drains
+        while self._in_flight:
+            self.extend_visibility()
+            time.sleep(0.5)
+
+    def extend_visibility(self) -> None:
+        """Extend messages with less than half their visibility timeout left."""
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                (message_id, entry[0]) for message_id, entry in self._in_flight.items()
+                if entry[1] - now < self.visibility_timeout / 2
+            ]
+        for start in range(0, len(due), MAX_BATCH_SIZE):
+            batch = due[start:start + MAX_BATCH_SIZE]
+            try:
+                self.sqs.change_message_visibility_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=[
+                        {
+                            'Id': str(i),
+                            'ReceiptHandle': receipt_handle,
+                            'VisibilityTimeout': self.visibility_timeout
+                        }
+                        for i, (_, receipt_handle) in enumerate(batch)
+                    ]
+                )
+            except Exception as e:
+                print(f"Error extending visibility: {str(e)}")
+                continue
+            with self._lock:
+                for message_id, _ in batch:
+                    if message_id in self._in_flight:
+                        self._in_flight[message_id][1] = now + self.visibility_timeout
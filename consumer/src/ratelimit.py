@@ -0,0 +1,143 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from .exceptions import RetryableDeliveryError
+
+# Jittered exponential backoff for retryable failures, in seconds
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "2"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "900"))
+
+# SQS caps a message's visibility timeout at 12 hours
+MAX_VISIBILITY_TIMEOUT = 43200
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second, holding up to ``burst``.
+
+    Not thread-safe on its own; RateLimiter serializes access.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst else max(rate, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float, tokens: float = 1.0) -> float:
+        """Seconds until ``tokens`` are available, 0 if they are now."""
+        self._refill(now)
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def take(self, tokens: float = 1.0) -> None:
+        self.tokens -= tokens
+
+class RateLimiter:
+    """
+    Token buckets per channel and per (channel, recipient domain), shared by
+    all worker threads of the process.
+
+    acquire() never blocks: when a bucket is empty it returns how long to
+    wait, and the caller defers the message instead of holding a worker.
+    """
+
+    def __init__(
+        self,
+        channel_limits: Optional[Dict[str, Tuple[float, Optional[float]]]] = None,
+        domain_limit: Optional[Tuple[float, Optional[float]]] = None,
+        max_domains: int = 10000
+    ):
+        self._lock = threading.Lock()
+        self._channels = {
+            name: TokenBucket(rate, burst)
+            for name, (rate, burst) in (channel_limits or {}).items()
+            if rate > 0
+        }
+        self.domain_limit = domain_limit if domain_limit and domain_limit[0] > 0 else None
+        self.max_domains = max_domains
+        self._domains: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def _domain_bucket(self, channel: str, domain: str) -> TokenBucket:
+        key = (channel, domain.lower())
+        bucket = self._domains.get(key)
+        if bucket is None:
+            bucket = TokenBucket(*self.domain_limit)
+            self._domains[key] = bucket
+            while len(self._domains) > self.max_domains:
+                self._domains.popitem(last=False)
+        else:
+            self._domains.move_to_end(key)
+        return bucket
+
+    def acquire(self, channel: str, domain: Optional[str] = None) -> float:
+        """
+        Take one token from the channel bucket and the domain bucket.
+
+        Tokens are only taken when both buckets have one.
+
+        Args:
+            channel: Channel name
+            domain: Recipient domain, when the channel has one
+
+        Returns:
+            0 if the send may go ahead, otherwise seconds until it may
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = []
+            if channel in self._channels:
+                buckets.append(self._channels[channel])
+            if domain and self.domain_limit:
+                buckets.append(self._domain_bucket(channel, domain))
+            wait = max((bucket.wait_time(now) for bucket in buckets), default=0.0)
+            if wait == 0:
+                for bucket in buckets:
+                    bucket.take()
+            return wait
+
+def _limit(prefix: str) -> Tuple[float, Optional[float]]:
+    rate = float(os.getenv(f"{prefix}_RATE_LIMIT", "0"))
+    burst = os.getenv(f"{prefix}_BURST")
+    return rate, float(burst) if burst else None
+
+def build_rate_limiter(channel_names: Iterable[str]) -> RateLimiter:
+    """
+    Build the limiter from <CHANNEL>_RATE_LIMIT/<CHANNEL>_BURST and
+    DOMAIN_RATE_LIMIT/DOMAIN_BURST (sends per second, 0 for no limit).
+    """
+    return RateLimiter(
+        {name: _limit(name.upper()) for name in channel_names},
+        _limit("DOMAIN")
+    )
+
+def retry_delay(
+    error: Exception,
+    attempts: int,
+    base: float = RETRY_BASE_DELAY,
+    max_delay: float = RETRY_MAX_DELAY
+) -> Optional[float]:
+    """
+    Backoff before the next delivery attempt of a failed message.
+
+    Args:
+        error: The failure
+        attempts: Deliveries of the message so far (ApproximateReceiveCount)
+        base: Delay ceiling of the first retry
+        max_delay: Largest delay ceiling
+
+    Returns:
+        Seconds to hide the message for, or None if the error is not
+        retryable and the message should follow the normal redrive path
+    """
+    if not isinstance(error, RetryableDeliveryError):
+        return None
+    delay = random.uniform(0, min(max_delay, base * 2 ** max(attempts - 1, 0)))
+    return min(max(delay, error.retry_after or 0.0), MAX_VISIBILITY_TIMEOUT)
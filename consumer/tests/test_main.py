@@ -1,14 +1,45 @@
 import pytest
 from unittest.mock import MagicMock, patch
+from sqlalchemy.pool import NullPool
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import json
+import re
+import shutil
+import subprocess
 import sys
+import sysconfig
 import os
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from booking_events.envelope import decode, encode_batch, encode_event
+from booking_events.metrics import MetricsRegistry
+import src.main
 from src.main import NotificationService, lambda_handler
+from src.delivery import (
+    Channel,
+    DeliveryEngine,
+    DeliveryError,
+    HTTPChannel,
+    SMSChannel,
+    SMTPChannel,
+    WebhookChannel,
+)
+from src.digest import DigestStage
+from src.exceptions import RetryableDeliveryError
+from src.idempotency import IdempotencyStore, ProcessedStore, engine_options
+from src.metrics import message_duration, message_failures, messages, metrics
+from src.poller import ConcurrentPoller
+from src.ratelimit import RateLimiter, retry_delay
+from tests.fakes import FakeHTTPServer, FakeSMTPServer
+
+@pytest.fixture(autouse=True)
+def reset_shared_service():
+    src.main._notification_service = None
+    yield
+    src.main._notification_service = None
 
 @pytest.fixture
 def mock_sqs():
@@ -66,6 +97,13 @@ def test_start_listening(notification_service, mock_sqs):
         ]
     }
     
+    # Stop after the first poll so start() returns
+    response = mock_sqs.receive_message.return_value
+    def receive_once(**kwargs):
+        notification_service.stop()
+        return response
+    mock_sqs.receive_message.side_effect = receive_once
+    
     # Start the service and let it process one message
     notification_service.start()
     
@@ -73,6 +111,62 @@ def test_start_listening(notification_service, mock_sqs):
     mock_sqs.receive_message.assert_called_once()
     mock_sqs.delete_message.assert_called_once()
 
+def test_start_settles_whole_batch_when_one_delete_fails(notification_service, mock_sqs):
+    body = json.dumps({
+        "booking_id": 1,
+        "therapist_id": 1,
+        "client_email": "test@example.com",
+        "start_time": datetime.now().isoformat(),
+        "end_time": datetime.now().isoformat(),
+        "event_type": "booking_created"
+    })
+    response = {
+        "Messages": [
+            {"MessageId": str(i), "ReceiptHandle": f"receipt-{i}", "Body": body}
+            for i in range(3)
+        ]
+    }
+    def receive_once(**kwargs):
+        notification_service.stop()
+        return response
+    mock_sqs.receive_message.side_effect = receive_once
+    mock_sqs.delete_message.side_effect = [Exception("throttled"), None, None]
+
+    notification_service.start()
+
+    # The first acknowledgement failed; the others were still sent
+    handles = [c.kwargs["ReceiptHandle"] for c in mock_sqs.delete_message.call_args_list]
+    assert handles == ["receipt-0", "receipt-1", "receipt-2"]
+
+def test_lambda_function_imports_with_events_layer(tmp_path):
+    consumer_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    root = os.path.dirname(consumer_dir)
+    with open(os.path.join(root, "infrastructure", "template.yaml")) as template_file:
+        template = template_file.read()
+    # The layer built from events/ is attached to every function in Globals
+    assert "    Layers:\n      - !Ref BookingEventsLayer\n" in template.split("\nResources:")[0]
+    [handler] = re.findall(r"CodeUri: \.\./consumer\n      Handler: ([\w.]+)\.lambda_handler", template)
+
+    # The layer as SAM builds it: events/ under python/, its requirements
+    # installed alongside (here, the test interpreter's site-packages)
+    layer = tmp_path / "python"
+    shutil.copytree(
+        os.path.join(root, "events"), layer, ignore=shutil.ignore_patterns("*.egg-info", "__pycache__")
+    )
+    site_packages = sysconfig.get_paths()["purelib"]
+
+    def import_module(module, *paths):
+        # -S skips .pth files, so the editable install of events is not found
+        return subprocess.run(
+            [sys.executable, "-S", "-c", f"import {module}"], cwd=consumer_dir, capture_output=True, text=True,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(paths)}
+        )
+
+    missing = import_module(handler, consumer_dir, site_packages)
+    assert missing.returncode != 0 and "booking_events" in missing.stderr
+    result = import_module(handler, str(layer), consumer_dir, site_packages)
+    assert result.returncode == 0, result.stderr
+
 def test_lambda_handler():
     # Create a mock event
     event = {
@@ -98,7 +192,7 @@ def test_lambda_handler():
         
         assert response["statusCode"] == 200
         assert "Messages processed successfully" in response["body"]
-        mock_instance.process_message.assert_called_once()
+        mock_instance.process_events.assert_called_once()
 
 def test_lambda_handler_error():
     # Create a mock event with invalid JSON
@@ -112,5 +206,380 @@ def test_lambda_handler_error():
     }
     
     response = lambda_handler(event, None)
-    assert response["statusCode"] == 500
-    assert "Error processing messages" in response["body"] 
\ No newline at end of file
+    assert response["batchItemFailures"] == [{"itemIdentifier": "1"}]
+    assert "Error processing messages" in response["body"]
+
+def test_lambda_handler_partial_batch_failure():
+    def record(message_id, booking_id):
+        return {
+            "messageId": message_id,
+            "body": json.dumps({
+                "booking_id": booking_id,
+                "therapist_id": 1,
+                "client_email": "test@example.com",
+                "start_time": datetime.now().isoformat(),
+                "end_time": datetime.now().isoformat(),
+                "event_type": "booking_created"
+            })
+        }
+
+    event = {"Records": [record(str(i), i) for i in range(5)]}
+
+    with patch('src.main.NotificationService') as mock_service:
+        def process(events):
+            if events[0]["booking_id"] == 3:
+                raise RuntimeError("provider down")
+        mock_service.return_value.process_events.side_effect = process
+
+        response = lambda_handler(event, None)
+        assert response["batchItemFailures"] == [{"itemIdentifier": "3"}]
+        assert mock_service.return_value.process_events.call_count == 5
+
+        # The service (and its boto3 client) is reused by later invocations
+        lambda_handler(event, None)
+        mock_service.assert_called_once()
+
+
+def test_concurrent_poller_batches_acks():
+    bodies = [{"booking_id": i} for i in range(25)]
+    batches = [bodies[i:i + 10] for i in range(0, 25, 10)]
+    sqs = MagicMock()
+    processed = []
+
+    def receive_message(**kwargs):
+        if not batches:
+            return {}
+        return {"Messages": [
+            {"MessageId": str(b["booking_id"]), "ReceiptHandle": f"r-{b['booking_id']}", "Body": json.dumps(b)}
+            for b in batches.pop(0)
+        ]}
+    sqs.receive_message.side_effect = receive_message
+    sqs.delete_message_batch.return_value = {}
+
+    def handler(events):
+        message, = events
+        if message["booking_id"] == 7:
+            raise RuntimeError("provider down")
+        processed.append(message["booking_id"])
+        if len(processed) == 24:
+            poller.stop()
+
+    poller = ConcurrentPoller(sqs, "queue", handler, workers=4, pollers=2, wait_time_seconds=0)
+    poller.start()
+
+    deleted = [
+        entry["ReceiptHandle"]
+        for call in sqs.delete_message_batch.call_args_list
+        for entry in call.kwargs["Entries"]
+    ]
+    assert all(len(call.kwargs["Entries"]) <= 10 for call in sqs.delete_message_batch.call_args_list)
+    assert sorted(deleted) == sorted(f"r-{i}" for i in range(25) if i != 7)
+
+def test_concurrent_poller_extends_visibility_of_slow_messages():
+    sqs = MagicMock()
+    poller = ConcurrentPoller(sqs, "queue", lambda message: None, visibility_timeout=30)
+    poller._in_flight = {"slow": ["r-slow", 0.0], "fresh": ["r-fresh", float("inf")]}
+
+    poller.extend_visibility()
+
+    entries = sqs.change_message_visibility_batch.call_args.kwargs["Entries"]
+    assert entries == [{"Id": "0", "ReceiptHandle": "r-slow", "VisibilityTimeout": 30}]
+
+
+def booking_message(booking_id, **extra):
+    return {
+        "booking_id": booking_id,
+        "therapist_id": 1,
+        "client_email": f"client{booking_id}@example.com",
+        "start_time": datetime.now().isoformat(),
+        "end_time": datetime.now().isoformat(),
+        "event_type": "booking_created",
+        **extra
+    }
+
+def test_delivery_fans_out_over_pooled_connections(mock_sqs):
+    with FakeSMTPServer() as smtp, FakeHTTPServer() as webhook, FakeHTTPServer() as sms:
+        engine = DeliveryEngine([
+            SMTPChannel("127.0.0.1", smtp.port, concurrency=2),
+            WebhookChannel(webhook.url, secret="s3cret", concurrency=2),
+            SMSChannel(sms.url, api_key="key", concurrency=2),
+        ])
+        service = NotificationService(delivery=engine)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(service.process_message, [booking_message(i, client_phone="+15555550100") for i in range(20)]))
+        engine.close()
+
+        assert sorted(m["to"][0] for m in smtp.messages) == sorted(f"client{i}@example.com" for i in range(20))
+        assert len(webhook.requests) == 20 and len(sms.requests) == 20
+        assert "X-Signature-SHA256" in webhook.requests[0]["headers"]
+        # Connections are reused rather than opened per message
+        assert smtp.connections <= 2 and webhook.connections <= 2 and sms.connections <= 2
+
+    metrics = engine.snapshot()
+    assert metrics["email"]["sent"] == 20 and metrics["email"]["failed"] == 0
+    assert metrics["webhook"]["throughput_per_s"] > 0
+
+def test_delivery_reports_failed_channels(mock_sqs):
+    with FakeSMTPServer() as smtp, FakeHTTPServer() as webhook:
+        webhook.responses = [503]
+        engine = DeliveryEngine([SMTPChannel("127.0.0.1", smtp.port), WebhookChannel(webhook.url)])
+        with pytest.raises(DeliveryError) as error:
+            NotificationService(delivery=engine).process_message(booking_message(1))
+        engine.close()
+
+        assert list(error.value.failed_channels) == ["webhook"]
+        assert len(smtp.messages) == 1
+    assert engine.snapshot()["webhook"]["failed"] == 1
+
+def test_channel_without_send_cannot_be_constructed():
+    class PushChannel(Channel):
+        name = "push"
+
+    with pytest.raises(TypeError):
+        PushChannel()
+    with pytest.raises(TypeError):
+        HTTPChannel("http://127.0.0.1")
+
+
+def test_rate_limiter_buckets_per_channel_and_domain():
+    limiter = RateLimiter({"email": (1, 3)}, domain_limit=(1, 2))
+
+    assert limiter.acquire("email", "gmail.com") == 0
+    assert limiter.acquire("email", "gmail.com") == 0
+    # gmail.com is out of tokens; the channel token is not spent either
+    assert limiter.acquire("email", "gmail.com") > 0
+    assert limiter.acquire("email", "example.com") == 0
+    assert limiter.acquire("email", "example.com") > 0
+    # Channels without a limit are never throttled
+    assert all(limiter.acquire("webhook") == 0 for _ in range(100))
+
+def test_throttled_delivery_is_retryable(mock_sqs):
+    with FakeHTTPServer() as webhook:
+        engine = DeliveryEngine([WebhookChannel(webhook.url)], RateLimiter({"webhook": (0.5, 1)}))
+        service = NotificationService(delivery=engine)
+        service.process_message(booking_message(1))
+        with pytest.raises(RetryableDeliveryError) as error:
+            service.process_message(booking_message(2))
+        engine.close()
+
+    assert len(webhook.requests) == 1
+    assert 0 < error.value.retry_after <= 2
+    assert engine.snapshot()["webhook"]["throttled"] == 1
+
+def test_retried_message_skips_delivered_channels(mock_sqs):
+    with FakeSMTPServer() as smtp, FakeHTTPServer() as webhook:
+        webhook.responses = [503]
+        engine = DeliveryEngine([SMTPChannel("127.0.0.1", smtp.port), WebhookChannel(webhook.url)])
+        service = NotificationService(delivery=engine)
+        message = booking_message(1)
+        with pytest.raises(RetryableDeliveryError):
+            service.process_message(message)
+        # The redelivery only goes to the channel that failed
+        service.process_message(message)
+        service.process_message(message)
+        engine.close()
+
+        assert len(smtp.messages) == 1
+        assert len(webhook.requests) == 2
+
+def test_retry_delay_backs_off_exponentially():
+    assert retry_delay(ValueError("bad payload"), 1) is None
+    for attempts in range(1, 8):
+        assert 0 <= retry_delay(RetryableDeliveryError("503"), attempts, base=2, max_delay=60) <= min(60, 2 ** attempts)
+    assert retry_delay(RetryableDeliveryError("429", retry_after=30), 1, base=2) >= 30
+
+def test_retryable_failures_extend_visibility(mock_sqs):
+    with FakeHTTPServer() as webhook:
+        webhook.responses = [429, 400]
+        service = NotificationService(delivery=DeliveryEngine([WebhookChannel(webhook.url)]))
+        poller = ConcurrentPoller(mock_sqs, "queue", service.process_events, backoff=retry_delay)
+        for booking_id in (1, 2):
+            poller._process({
+                "MessageId": str(booking_id),
+                "ReceiptHandle": f"r-{booking_id}",
+                "Body": json.dumps(booking_message(booking_id)),
+                "Attributes": {"ApproximateReceiveCount": "3"}
+            })
+        service.delivery.close()
+
+    # Only the throttled message is deferred; the rejected one keeps its
+    # visibility timeout and follows the redrive policy
+    mock_sqs.change_message_visibility.assert_called_once()
+    call = mock_sqs.change_message_visibility.call_args.kwargs
+    assert call["ReceiptHandle"] == "r-1" and 0 <= call["VisibilityTimeout"] <= 8
+    mock_sqs.delete_message_batch.assert_not_called()
+
+def test_lambda_handler_defers_retryable_records(mock_sqs):
+    src.main._notification_service = NotificationService()
+    with patch.object(NotificationService, "process_message", side_effect=RetryableDeliveryError("429", retry_after=10)):
+        response = lambda_handler({"Records": [{
+            "messageId": "1",
+            "receiptHandle": "r-1",
+            "body": json.dumps(booking_message(1)),
+            "attributes": {"ApproximateReceiveCount": "1"}
+        }]}, None)
+
+    assert response["batchItemFailures"] == [{"itemIdentifier": "1"}]
+    assert mock_sqs.change_message_visibility.call_args.kwargs["VisibilityTimeout"] >= 10
+
+
+def test_duplicate_messages_are_acked_without_work(mock_sqs, tmp_path):
+    url = f"sqlite:///{tmp_path / 'processed.db'}"
+    delivery = MagicMock()
+    service = NotificationService(delivery=delivery, idempotency=IdempotencyStore(ProcessedStore(url)))
+
+    service.process_message(booking_message(1))
+    service.process_message(booking_message(1))
+    service.process_message(booking_message(1, event_type="booking_cancelled"))
+    assert delivery.deliver.call_count == 2
+
+    # A fresh consumer (empty LRU) still finds the key in the persistent tier
+    restarted = NotificationService(delivery=delivery, idempotency=IdempotencyStore(ProcessedStore(url)))
+    restarted.process_message(booking_message(1))
+    assert delivery.deliver.call_count == 2
+
+    assert service.idempotency.snapshot()["memory_hits"] == 1
+    stats = restarted.idempotency.snapshot()
+    assert stats["store_hits"] == 1 and stats["hit_rate"] == 1.0
+
+def test_event_envelope_batches(mock_sqs):
+    delivery = MagicMock()
+    delivery.deliver.side_effect = lambda message, **kwargs: None if message["booking_id"] != 2 else 1 / 0
+    src.main._notification_service = NotificationService(delivery=delivery)
+    first = encode_event(booking_message(1))
+    response = lambda_handler({"Records": [
+        {"messageId": "1", "body": first},
+        {"messageId": "2", "body": encode_batch([booking_message(n) for n in range(2, 40)])},
+        {"messageId": "3", "body": encode_batch([booking_message(n) for n in range(40, 80)])},
+    ]}, None)
+
+    # A failed event fails its whole message; the others are done
+    assert response["batchItemFailures"] == [{"itemIdentifier": "2"}]
+    delivered = {call.args[0]["booking_id"]: call.args[0] for call in delivery.deliver.call_args_list}
+    assert set(delivered) >= {1, *range(40, 80)}
+    assert [delivered[1]] == decode(first)
+
+def test_failed_notifications_are_not_marked(mock_sqs):
+    delivery = MagicMock()
+    delivery.deliver.side_effect = [RetryableDeliveryError("503"), None]
+    service = NotificationService(delivery=delivery)
+
+    with pytest.raises(RetryableDeliveryError):
+        service.process_message(booking_message(1))
+    service.process_message(booking_message(1))
+    assert delivery.deliver.call_count == 2
+
+def test_message_metrics(mock_sqs):
+    delivery = MagicMock()
+    delivery.deliver.side_effect = [None, RetryableDeliveryError("503")]
+    service = NotificationService(delivery=delivery)
+    before = {outcome: messages.value(outcome) for outcome in ("processed", "duplicate", "failed")}
+    retryable_before = message_failures.value("retryable")
+    timed_before = message_duration.count("processed")
+
+    service.process_message(booking_message(1))
+    service.process_message(booking_message(1))
+    src.main._notification_service = service
+    lambda_handler({"Records": [{
+        "messageId": "2",
+        "receiptHandle": "r-2",
+        "body": json.dumps(booking_message(2)),
+        "attributes": {"ApproximateReceiveCount": "1"}
+    }]}, None)
+
+    assert messages.value("processed") == before["processed"] + 1
+    assert messages.value("duplicate") == before["duplicate"] + 1
+    assert messages.value("failed") == before["failed"] + 1
+    assert message_failures.value("retryable") == retryable_before + 1
+    assert message_duration.count("processed") == timed_before + 1
+
+    body = metrics.render()
+    assert 'consumer_messages_total{outcome="processed"}' in body
+    assert 'consumer_message_duration_seconds_bucket{outcome="processed",le="+Inf"}' in body
+
+def test_metrics_registry_escapes_labels_and_rejects_duplicates():
+    registry = MetricsRegistry()
+    errors = registry.counter("errors_total", "Errors by message", ("message",))
+    errors.inc('bad "value"\\n\nnext')
+    assert 'errors_total{message="bad \\"value\\"\\\\n\\nnext"} 1' in registry.render()
+    with pytest.raises(ValueError):
+        registry.histogram("errors_total", "Registered twice")
+
+def test_idempotency_keys_expire(tmp_path):
+    store = ProcessedStore(f"sqlite:///{tmp_path / 'processed.db'}")
+    idempotency = IdempotencyStore(store, ttl=-1)
+    idempotency.mark("1:booking_created")
+
+    assert not idempotency.seen("1:booking_created")
+    assert store.purge() == 1
+
+def test_idempotency_store_pooling(monkeypatch):
+    url = "postgresql://consumer@db.example.com/bookings"
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_NAME", raising=False)
+    assert engine_options(url) == {"pool_size": 2, "max_overflow": 0, "pool_pre_ping": True}
+    # Idle Lambda containers keep no connections on the booking database
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "notifications")
+    assert engine_options(url) == {"poolclass": NullPool}
+
+@pytest.fixture
+def digest_service(mock_sqs):
+    service = NotificationService(delivery=MagicMock())
+    service.digest = DigestStage(service.send_digest, window=0.3, max_size=50)
+    service.digest.start()
+    return service
+
+def test_digest_coalesces_events_per_recipient():
+    sent = []
+    stage = DigestStage(sent.append, window=0.1, max_size=10)
+    stage.start()
+    futures = [stage.add(booking_message(i, client_email="a@example.com")) for i in range(25)]
+    futures.append(stage.add(booking_message(99, client_email="b@example.com")))
+    for future in futures:
+        future.result(timeout=5)
+    stage.stop()
+
+    assert sorted(len(events) for events in sent) == [1, 5, 10, 10]
+    assert stage.snapshot() == {"digests_sent": 4, "events_coalesced": 26, "buffered": 0}
+
+def test_poller_acks_coalesced_messages_together(digest_service, mock_sqs):
+    batches = [[booking_message(i, client_email="import@example.com") for i in range(b, b + 10)] for b in (0, 10)]
+
+    def receive_message(**kwargs):
+        if not batches:
+            return {}
+        return {"Messages": [
+            {"MessageId": str(m["booking_id"]), "ReceiptHandle": f"r-{m['booking_id']}", "Body": json.dumps(m)}
+            for m in batches.pop(0)
+        ]}
+    mock_sqs.receive_message.side_effect = receive_message
+    mock_sqs.delete_message_batch.return_value = {}
+    digest_service.delivery.deliver.side_effect = lambda message, **kwargs: digest_service.stop()
+
+    digest_service.start(workers=4)
+
+    digest_service.delivery.deliver.assert_called_once()
+    digest = digest_service.delivery.deliver.call_args.args[0]
+    assert digest["event_type"] == "booking_digest" and sorted(digest["booking_ids"]) == list(range(20))
+    deleted = [
+        entry["ReceiptHandle"]
+        for call in mock_sqs.delete_message_batch.call_args_list
+        for entry in call.kwargs["Entries"]
+    ]
+    assert sorted(deleted) == sorted(f"r-{i}" for i in range(20))
+    assert mock_sqs.delete_message_batch.call_count == 2
+
+def test_lambda_handler_sends_digests_at_end_of_batch(digest_service):
+    src.main._notification_service = digest_service
+    records = [
+        {"messageId": str(i), "body": json.dumps(booking_message(i, client_email="import@example.com"))}
+        for i in range(5)
+    ]
+
+    response = lambda_handler({"Records": records}, None)
+
+    assert response["batchItemFailures"] == []
+    digest_service.delivery.deliver.assert_called_once()
+    assert len(digest_service.delivery.deliver.call_args.args[0]["events"]) == 5
+    # Every event of the digest is marked, so redeliveries are skipped
+    lambda_handler({"Records": records[:1]}, None)
+    digest_service.delivery.deliver.assert_called_once()
@@ -0,0 +1,125 @@
+import base64
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Sequence, Union
+import msgpack
+import orjson
+
+# Booking event envelope shared by the API, which encodes queue messages,
+# and the consumer, which decodes them. Both services install this package,
+# so they always agree on the format of the version they were built with.
+#
+# Versions of the message body:
+#   1 - a JSON object with ISO-8601 timestamps and no version (legacy)
+#   2 - base64 text of a msgpack array [2, kind, ...]:
+#       kind SINGLE: [2, 0, *event], one event as the EVENT_FIELDS values
+#       kind BATCH:  [2, 1, compressed, data], data being the msgpack array
+#                    of events, zlib-compressed when compressed is true
+#
+# Decoders read every version, so consumers are deployed before producers
+# switch to a new one. Within a version, fields are only ever appended:
+# older decoders ignore trailing values they do not know.
+
+ENVELOPE_VERSION = 2
+SINGLE = 0
+BATCH = 1
+
+EVENT_FIELDS = (
+    "event_type", "booking_id", "therapist_id", "client_email", "start_time", "end_time",
+    "client_phone",
+)
+TIMESTAMP_FIELDS = frozenset(("start_time", "end_time"))
+
+# Event types sent as their index; append only. Other types travel as strings
+EVENT_TYPES = ("booking_created", "booking_confirmed", "booking_cancelled")
+_EVENT_TYPE_CODES = {event_type: code for code, event_type in enumerate(EVENT_TYPES)}
+
+# Batches whose packed events are at least this large are compressed
+COMPRESS_MIN_BYTES = 512
+
+def _timestamp(value: Union[datetime, str]) -> datetime:
+    # msgpack Timestamps need an aware datetime; naive values are UTC
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+def _pack_event(event: Dict[str, Any]) -> List[Any]:
+    event_type = event["event_type"]
+    return [
+        _EVENT_TYPE_CODES.get(event_type, event_type),
+        event["booking_id"],
+        event["therapist_id"],
+        event["client_email"],
+        _timestamp(event["start_time"]),
+        _timestamp(event["end_time"]),
+        event.get("client_phone"),
+    ]
+
+def _unpack_event(values: Sequence[Any]) -> Dict[str, Any]:
+    event = dict(zip(EVENT_FIELDS, values))
+    if isinstance(event["event_type"], int):
+        event["event_type"] = EVENT_TYPES[event["event_type"]]
+    # Consumers get the version 1 shape: timestamps as ISO-8601 strings
+    for field in TIMESTAMP_FIELDS:
+        event[field] = event[field].isoformat()
+    return event
+
+def _frame(envelope: List[Any]) -> str:
+    # SQS bodies are text, so the msgpack bytes travel base64-encoded
+    return base64.b64encode(msgpack.packb(envelope, datetime=True)).decode("ascii")
+
+def encode_event(event: Dict[str, Any]) -> str:
+    """
+    Queue message body of one booking event.
+
+    Args:
+        event: event_type, booking_id, therapist_id, client_email,
+            start_time and end_time as datetimes (naive ones are UTC) or
+            ISO-8601 strings, and optionally client_phone
+
+    Returns:
+        Version 2 envelope
+    """
+    return _frame([ENVELOPE_VERSION, SINGLE, *_pack_event(event)])
+
+def encode_batch(events: Sequence[Dict[str, Any]], compress: bool = True) -> str:
+    """
+    Queue message body carrying several booking events.
+
+    Args:
+        events: Events as for encode_event
+        compress: zlib-compress the events when they take at least
+            COMPRESS_MIN_BYTES
+
+    Returns:
+        Version 2 batch envelope
+    """
+    data = msgpack.packb([_pack_event(event) for event in events], datetime=True)
+    compressed = compress and len(data) >= COMPRESS_MIN_BYTES
+    return _frame([ENVELOPE_VERSION, BATCH, compressed, zlib.compress(data) if compressed else data])
+
+def decode(body: Union[str, bytes]) -> List[Dict[str, Any]]:
+    """
+    Booking events of a queue message body, of any envelope version.
+
+    Returns:
+        The events as dicts with ISO-8601 timestamps, one per event of a batch
+
+    Raises:
+        ValueError: If the body is not a known envelope version
+    """
+    if isinstance(body, bytes):
+        body = body.decode("ascii")
+    if body.lstrip().startswith("{"):
+        return [orjson.loads(body)]
+    envelope = msgpack.unpackb(base64.b64decode(body, validate=True), timestamp=3)
+    if not isinstance(envelope, list) or not envelope or envelope[0] != ENVELOPE_VERSION:
+        version = envelope[0] if isinstance(envelope, list) and envelope else None
+        raise ValueError(f"Unsupported event envelope version {version!r}")
+    kind = envelope[1]
+    if kind == SINGLE:
+        return [_unpack_event(envelope[2:])]
+    if kind == BATCH:
+        data = zlib.decompress(envelope[3]) if envelope[2] else envelope[3]
+        return [_unpack_event(values) for values in msgpack.unpackb(data, timestamp=3)]
+    raise ValueError(f"Unknown event envelope kind {kind!r}")
@@ -0,0 +1,13 @@
+import os
+from setuptools import setup, find_packages
+
+# requirements.txt is also what the SAM build installs into the Lambda layer
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements.txt")) as requirements:
+    install_requires = requirements.read().split()
+
+setup(
+    name="therapist-booking-events",
+    version="0.1.0",
+    packages=find_packages(),
+    install_requires=install_requires,
+)